@@ -4,21 +4,104 @@ Provides unified interface with automatic fallback.
 """
 
 import os
+import json
+import time
 import logging
-from typing import Optional
+import threading
+from typing import Callable, Optional
+from config.settings import Settings
+from .job_context import current_job
+from .model_router import TASK_CLASSES, ModelRouter
+from .single_flight import SingleFlight, request_key
+from .token_sizer import TokenSizer
+from .token_estimator import MIN_OUTPUT_TOKENS, ContextWindowExceeded, cost_usd, estimate_call
+from .cancellation import Cancelled, check_cancelled, current_token
+from .metrics import metrics
+from .budget import call_timeout, current_budget, degrade, time_is_short
+from .load_shedder import is_cut, overload
+from .providers import LocalModelBackend, ProviderBackend
+from .cassette import cassette
 
 logger = logging.getLogger(__name__)
 
+CONTINUE_PROMPT = "Continúa exactamente donde quedaste. No repitas nada ni agregues texto extra."
+
+VARIANTS_PROMPT = """
+
+Genera {n} VARIANTES distintas de la respuesta pedida (ángulos y hooks diferentes, no simples reformulaciones).
+Responde SOLO con un JSON array de {n} elementos; cada elemento sigue exactamente el formato indicado arriba."""
+
+JSON_REPAIR_PROMPT = """Este texto debía ser JSON válido pero tiene errores de sintaxis (comillas, comas, llaves sin cerrar...).
+Corrígelo sin cambiar el contenido. Responde SOLO con el JSON corregido, sin markdown.
+
+{text}"""
+
+
+def parse_json_response(response: str):
+    """Parse a model response as JSON, tolerating markdown code fences."""
+    clean = response.strip()
+    if clean.startswith("```"):
+        clean = clean.split("```")[1]
+        if clean.startswith("json"):
+            clean = clean[4:]
+    return json.loads(clean.strip())
+
+
+def is_valid_json(response: str) -> bool:
+    """Validation hook for generate(): True when the response parses as JSON."""
+    try:
+        parse_json_response(response)
+        return True
+    except Exception:
+        return False
+
+
+def _openai_cached_tokens(usage) -> int:
+    """Prompt tokens served from OpenAI's prompt cache, when reported."""
+    details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    return getattr(details, "cached_tokens", 0) or 0
+
 
 class AIClient:
     """
     Unified AI client with Anthropic primary and OpenAI fallback.
     Credentials are read fresh on each initialization.
+
+    Further backends plug in with register_backend() (see agents.providers);
+    the tasks routed to one are tried there first.
     """
 
     def __init__(self):
         # Read credentials fresh - in case env was loaded after import
         self._refresh_credentials()
+        self.sizer = TokenSizer(
+            path=Settings.TOKEN_SIZING_FILE,
+            percentile=Settings.TOKEN_SIZING_PERCENTILE,
+            margin=Settings.TOKEN_SIZING_MARGIN
+        )
+        self.router = ModelRouter()
+        self.model_usage = {}
+        self.flights = SingleFlight()
+        self._usage_lock = threading.Lock()
+        self.backends = {}
+        self.task_routes = {}
+        if Settings.LOCAL_MODEL_ENABLED:
+            self.register_backend(
+                LocalModelBackend(Settings.LOCAL_MODEL_URL, Settings.LOCAL_MODEL_NAME,
+                                  context_window=Settings.LOCAL_MODEL_CONTEXT),
+                tasks=Settings.LOCAL_MODEL_TASKS
+            )
+
+    def register_backend(self, backend: ProviderBackend, tasks=()):
+        """
+        Plug in a provider backend. Calls for `tasks` (task names passed to
+        generate()) go to it first; with PRIMARY_AI set to its name it serves every call.
+        """
+        self.backends[backend.name] = backend
+        self.router.models[backend.name] = {task_class: backend.model for task_class in TASK_CLASSES}
+        for task in tasks:
+            self.task_routes[task] = backend.name
+        logger.info(f"Provider backend '{backend.name}' registered ({backend.model}) for {list(tasks) or 'no tasks'}")
 
     def _refresh_credentials(self):
         """Refresh credentials from environment."""
@@ -50,60 +133,521 @@ class AIClient:
             except Exception as e:
                 logger.warning(f"Failed to init OpenAI: {e}")
 
-    def generate(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.7) -> str:
+    def generate(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.7, task: str = None,
+                 task_class: str = "standard", validate: Callable[[str], bool] = None, prefix: str = None,
+                 on_text: Callable[[str], None] = None) -> str:
         """
         Generate text using configured AI.
         Tries primary first, falls back to secondary.
+
+        When `task` is given, max_tokens is sized from the observed output
+        lengths of that task and the declared value is only the cold-start default.
+        `task_class` (light/standard/heavy) selects the model; if `validate`
+        rejects the output, the call is retried once per stronger tier.
+
+        Identical concurrent calls share one provider request, except
+        streamed ones: a follower would get none of the chunks.
+
+        `prefix` is shared context placed before the prompt and marked for
+        provider prompt caching, so calls that share it pay for it once.
+
+        With `on_text`, the response is streamed and each text chunk is passed
+        to it as it arrives (see json_stream.JsonFieldStream).
         """
-        if self.primary == "anthropic" and self.anthropic_client:
+        def run():
+            return self._with_fallback(self._generate_with, prompt, max_tokens, temperature, task, task_class,
+                                       validate, prefix, on_text, preferred=self.task_routes.get(task))
+
+        if on_text:
+            return run()
+        key = request_key("generate", prefix, prompt, max_tokens, temperature, task, task_class)
+        return self.flights.do(key, run)
+
+    def generate_variants(self, prompt: str, n: int = 3, max_tokens: int = 1000, temperature: float = 0.9,
+                          task: str = None, task_class: str = "standard", validate: Callable[[str], bool] = None,
+                          prefix: str = None) -> list:
+        """
+        Generate up to `n` alternative responses to one prompt, paying for
+        the input once: OpenAI samples them natively (`n`), Anthropic
+        returns them as a JSON array from a single call.
+
+        `max_tokens` is per variant. Variants rejected by `validate` are dropped.
+        """
+        key = request_key("variants", prefix, prompt, n, max_tokens, temperature, task, task_class)
+        return self.flights.do(
+            key, lambda: self._with_fallback(self._variants_with, prompt, n, max_tokens, temperature, task,
+                                             task_class, validate, prefix)
+        )
+
+    def _providers(self, preferred: str = None) -> list:
+        """
+        Available providers in the order to try them: the backend the task
+        is routed to, the primary, then the cloud providers.
+        """
+        if self.primary == "anthropic":
+            order = [preferred, "anthropic", "openai"]
+        else:
+            order = [preferred, self.primary, "openai", "anthropic"]
+        providers = []
+        for provider in order:
+            if provider and provider not in providers and self._provider_available(provider):
+                providers.append(provider)
+        return providers
+
+    def _provider_available(self, provider: str) -> bool:
+        if provider == "anthropic":
+            return bool(self.anthropic_client)
+        if provider == "openai":
+            return bool(self.openai_client)
+        backend = self.backends.get(provider)
+        return bool(backend and backend.is_available())
+
+    def _with_fallback(self, call: Callable, *args, preferred: str = None):
+        """Run `call(provider, *args)` on the first available provider, falling back to the next ones."""
+        providers = self._providers(preferred)
+        if not providers:
+            raise ValueError("No AI client available. Configure ANTHROPIC_API_KEY or OPENAI_API_KEY")
+
+        for index, provider in enumerate(providers):
             try:
-                return self._anthropic_generate(prompt, max_tokens, temperature)
-            except Exception as e:
-                logger.warning(f"Anthropic failed: {e}, trying OpenAI...")
-                if self.openai_client:
-                    return self._openai_generate(prompt, max_tokens, temperature)
+                return call(provider, *args)
+            except Cancelled:
                 raise
+            except Exception as e:
+                if index == len(providers) - 1:
+                    raise
+                logger.warning(f"{provider} failed: {e}, trying {providers[index + 1]}...")
+
+    def _tracked(self, provider: str, request: Callable[[], dict]) -> dict:
+        """
+        Run one HTTP request to a provider in a slot of its concurrency
+        limit, reporting it to the overload controller. Only the request
+        holds the slot, not the continuations, repairs or escalations around it.
+        """
+        with overload.provider_call("chat", f"chat.{provider}") as tracked:
+            result = request()
+            # Latency is judged per ~100 output tokens, so long documents don't read as spikes
+            texts = result.get("texts") or [result.get("text") or ""]
+            tracked.units = sum(len(text) for text in texts if isinstance(text, str)) / 400
+            return result
 
-        elif self.openai_client:
+    def _generate_with(self, provider: str, prompt: str, max_tokens: int, temperature: float, task: str = None,
+                       task_class: str = "standard", validate: Callable[[str], bool] = None,
+                       prefix: str = None, on_text: Callable[[str], None] = None) -> str:
+        """
+        Generate with one provider, sizing max_tokens from history and
+        continuing the completion when it stops on the length limit.
+        """
+        check_cancelled("llm")
+        job = current_job()
+        route = job.route if job else None
+        limit = self.sizer.suggest(task, route, provider, max_tokens) if task else max_tokens
+        complete = self._completer(provider)
+        model = self.router.model_for(provider, "light" if is_cut("light_model") else task_class)
+
+        estimate = self._preflight(provider, model, prompt, prefix, limit)
+        limit = estimate["max_output_tokens"]
+        timeout = call_timeout(Settings.LLM_TIMEOUT_SECONDS)
+        limit = self._fit_to_time(model, limit, timeout)
+        on_text = self._cancellable(on_text, model)
+        started = time.time()
+
+        result = complete(prompt, limit, temperature, model=model, prefix=prefix, on_text=on_text, timeout=timeout)
+        text = result["text"]
+        input_tokens = result["input_tokens"]
+        cached_input_tokens = result["cached_input_tokens"]
+        output_tokens = result["output_tokens"]
+
+        continuations = 0
+        while result["truncated"] and continuations < Settings.MAX_CONTINUATIONS:
+            check_cancelled("llm")
+            if time_is_short():
+                degrade("continuation_skipped")
+                break
+            continuations += 1
+            logger.info(f"{provider} hit max_tokens={limit} on {task or 'untracked task'}, continuing ({continuations})")
+            text = text.rstrip()
+            result = complete(prompt, limit, temperature, model=model, partial=text, prefix=prefix, on_text=on_text,
+                              timeout=call_timeout(Settings.LLM_TIMEOUT_SECONDS))
+            text += result["text"]
+            input_tokens += result["input_tokens"]
+            cached_input_tokens += result["cached_input_tokens"]
+            output_tokens += result["output_tokens"]
+
+        self._record_usage(model, estimate["input_tokens"], input_tokens, output_tokens, time.time() - started,
+                           cached_input_tokens=cached_input_tokens)
+        if task:
+            self.sizer.record(task, route, provider, output_tokens, truncated=continuations > 0)
+
+        # Malformed JSON of short outputs goes to the cheap repair task first when one is routed;
+        # long or heavy documents are beyond what the small repair model can rewrite
+        repairable = (validate is is_valid_json and task != "json_repair" and "json_repair" in self.task_routes
+                      and task_class != "heavy" and len(text) <= Settings.JSON_REPAIR_MAX_CHARS)
+        if repairable and not validate(text):
+            text = self.repair_json(text) or text
+
+        if validate and not validate(text):
+            stronger = self.router.escalate(provider, task_class) if Settings.MODEL_ESCALATION else None
+            if stronger:
+                logger.warning(f"{model} output failed validation on {task or 'untracked task'}, escalating to {stronger}")
+                return self._generate_with(provider, prompt, max_tokens, temperature, task, stronger, validate,
+                                           prefix, on_text)
+            if provider in self.backends:
+                # One model serves every class of a backend: let _with_fallback try the next provider
+                raise ValueError(f"{model} output failed validation on {task or 'untracked task'}")
+        return text
+
+    def _variants_with(self, provider: str, prompt: str, n: int, max_tokens: int, temperature: float,
+                       task: str = None, task_class: str = "standard", validate: Callable[[str], bool] = None,
+                       prefix: str = None) -> list:
+        """Generate `n` variants with one provider call; see generate_variants()."""
+        check_cancelled("llm")
+        job = current_job()
+        route = job.route if job else None
+        limit = self.sizer.suggest(task, route, provider, max_tokens) if task else max_tokens
+        model = self.router.model_for(provider, "light" if is_cut("light_model") else task_class)
+        started = time.time()
+
+        timeout = call_timeout(Settings.LLM_TIMEOUT_SECONDS)
+        if provider == "openai":
+            estimate = self._preflight(provider, model, prompt, prefix, limit, samples=n)
+            max_output = self._fit_to_time(model, estimate["max_output_tokens"], timeout)
+            request = {"model": model, "prompt": prompt, "prefix": prefix, "n": n, "temperature": temperature}
+            result = cassette.call(
+                "chat_variants", request,
+                lambda: self._tracked(provider, lambda: self._openai_variants(prompt, n, max_output, temperature,
+                                                                             model, prefix, timeout))
+            )
+            texts = result["texts"]
+            input_tokens = result["input_tokens"]
+            cached_input_tokens = result["cached_input_tokens"]
+            output_tokens = result["output_tokens"]
+        else:
+            ask = prompt + VARIANTS_PROMPT.format(n=n)
+            estimate = self._preflight(provider, model, ask, prefix, limit * n)
+            result = self._completer(provider)(ask, self._fit_to_time(model, estimate["max_output_tokens"], timeout),
+                                               temperature, model=model, prefix=prefix, timeout=timeout)
             try:
-                return self._openai_generate(prompt, max_tokens, temperature)
-            except Exception as e:
-                logger.warning(f"OpenAI failed: {e}, trying Anthropic...")
-                if self.anthropic_client:
-                    return self._anthropic_generate(prompt, max_tokens, temperature)
-                raise
+                items = parse_json_response(result["text"])
+            except Exception:
+                items = []
+            texts = [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False)
+                     for item in (items if isinstance(items, list) else [])]
+            input_tokens = result["input_tokens"]
+            cached_input_tokens = result["cached_input_tokens"]
+            output_tokens = result["output_tokens"]
+
+        self._record_usage(model, estimate["input_tokens"], input_tokens, output_tokens, time.time() - started,
+                           cached_input_tokens=cached_input_tokens)
+
+        if validate:
+            texts = [text for text in texts if validate(text)]
+        if not texts:
+            stronger = self.router.escalate(provider, task_class) if Settings.MODEL_ESCALATION else None
+            if stronger:
+                logger.warning(f"{model} returned no usable variants on {task or 'untracked task'}, escalating to {stronger}")
+                return self._variants_with(provider, prompt, n, max_tokens, temperature, task, stronger,
+                                           validate, prefix)
+            if provider in self.backends:
+                raise ValueError(f"{model} returned no usable variants on {task or 'untracked task'}")
+        return texts
+
+    def repair_json(self, text: str) -> Optional[str]:
+        """Fix malformed JSON with a light model; None when it cannot be fixed."""
+        try:
+            fixed = self.generate(JSON_REPAIR_PROMPT.format(text=text), max_tokens=max(256, len(text) // 3),
+                                  temperature=0, task="json_repair", task_class="light")
+        except Cancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"JSON repair failed: {e}")
+            return None
+        if is_valid_json(fixed):
+            metrics.incr("json_repair.fixed")
+            return fixed
+        metrics.incr("json_repair.failed")
+        return None
+
+    def warm_prefix(self, prefix: str, task_class: str = "standard"):
+        """
+        Write `prefix` to the prompt cache of the provider and model that
+        `task_class` calls will use, with a one-token completion, so calls
+        fanned out right after read it from cache. Best effort.
+        """
+        provider = next(iter(self._providers()), None)
+        if not provider or provider in self.backends:
+            return
+        model = self.router.model_for(provider, "light" if is_cut("light_model") else task_class)
+        started = time.time()
+        try:
+            result = self._completer(provider)("ok", 1, 0, model=model, prefix=prefix,
+                                               timeout=call_timeout(Settings.LLM_TIMEOUT_SECONDS))
+        except Cancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Prompt cache warm-up failed: {e}")
+            return
+        self._record_usage(model, result["input_tokens"], result["input_tokens"], result["output_tokens"],
+                           time.time() - started, cached_input_tokens=result["cached_input_tokens"])
 
+    def _completer(self, provider: str) -> Callable:
+        """
+        Completion function of a provider, with the signature of _openai_generate().
+        Goes through the cassette when recording or replaying (see agents.cassette).
+        """
+        if provider == "anthropic":
+            request = self._anthropic_generate
+        elif provider == "openai":
+            request = self._openai_generate
         else:
-            raise ValueError("No AI client available. Configure ANTHROPIC_API_KEY or OPENAI_API_KEY")
+            backend = self.backends[provider]
 
-    def _anthropic_generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
-        """Generate using Anthropic Claude."""
-        response = self.anthropic_client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=max_tokens,
-            temperature=temperature,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.content[0].text
+            def request(prompt, max_tokens, temperature, model=None, partial="", prefix=None, on_text=None,
+                        timeout=None):
+                return backend.complete(self._chat_messages(prompt, partial, prefix), max_tokens, temperature,
+                                        model=model, on_text=on_text, timeout=timeout)
+
+        def complete(prompt, max_tokens, temperature, **kwargs):
+            return self._tracked(provider, lambda: request(prompt, max_tokens, temperature, **kwargs))
+        if not cassette.active:
+            return complete
+
+        def taped(prompt, max_tokens, temperature, model=None, partial="", prefix=None, on_text=None, timeout=None):
+            # max_tokens is left out of the key: it is sized from history and varies between runs
+            request = {"model": model, "prompt": prompt, "partial": partial, "prefix": prefix,
+                       "temperature": temperature}
+            return cassette.stream(
+                "chat", request,
+                lambda on_chunk: complete(prompt, max_tokens, temperature, model=model, partial=partial,
+                                          prefix=prefix, on_text=on_chunk, timeout=timeout),
+                on_text=on_text
+            )
+        return taped
+
+    @staticmethod
+    def _chat_messages(prompt: str, partial: str = "", prefix: str = None) -> list:
+        """OpenAI-style messages: the prefix leads the prompt, a partial answer is replayed and continued."""
+        messages = [{"role": "user", "content": f"{prefix}\n\n{prompt}" if prefix else prompt}]
+        if partial:
+            messages.append({"role": "assistant", "content": partial})
+            messages.append({"role": "user", "content": CONTINUE_PROMPT})
+        return messages
+
+    def _fit_to_time(self, model: str, max_tokens: int, timeout: float) -> int:
+        """
+        Shorten max_tokens so the completion can finish within `timeout` at
+        the model's observed output rate (only inside a job with a budget).
+        """
+        if not current_budget():
+            return max_tokens
+        with self._usage_lock:
+            usage = self.model_usage.get(model)
+            rate = usage["output_tokens"] / usage["seconds"] if usage and usage["calls"] >= 3 and usage["seconds"] else 0
+        if not rate:
+            return max_tokens
+        fitting = max(MIN_OUTPUT_TOKENS, int(rate * timeout * 0.9))
+        if fitting < max_tokens:
+            degrade("max_tokens_shortened")
+            logger.info(f"max_tokens {max_tokens} -> {fitting} to finish {model} within {timeout:.0f}s")
+            return fitting
+        return max_tokens
+
+    def _cancellable(self, on_text: Optional[Callable[[str], None]], model: str):
+        """
+        Stream callback for jobs that can be cancelled: relays chunks to
+        `on_text` and aborts the completion as soon as the job is cancelled.
+        Streaming is what makes an in-flight call abortable, so it is used
+        for every call made inside such a job.
+        """
+        token = current_token()
+        if token is None:
+            return on_text
+        streamed = []
+
+        def relay(chunk: str):
+            if token.cancelled:
+                metrics.incr("cancelled.llm_calls_aborted")
+                metrics.incr("cancelled.llm_output_tokens", len("".join(streamed)) // 4)
+                logger.info(f"Aborting {model} stream: {token.reason}")
+                raise Cancelled(token.reason)
+            streamed.append(chunk)
+            if on_text:
+                on_text(chunk)
+        return relay
+
+    def _preflight(self, provider: str, model: str, prompt: str, prefix: str, max_tokens: int,
+                   samples: int = 1) -> dict:
+        """
+        Estimate a call before sending it: refuse it when the prompt cannot
+        fit the context window, clamp max_output_tokens to what fits, and
+        charge the estimated cost to the current job.
+        """
+        estimate = estimate_call(f"{prefix}\n\n{prompt}" if prefix else prompt, provider, model, max_tokens)
+        if not estimate["fits"]:
+            raise ContextWindowExceeded(
+                f"Prompt of ~{estimate['input_tokens']} tokens leaves no room for output "
+                f"in {model} ({estimate['context_window']} token context)"
+            )
+        if estimate["max_output_tokens"] < max_tokens:
+            logger.info(f"Clamping max_tokens {max_tokens} -> {estimate['max_output_tokens']} to fit {model}")
+        job = current_job()
+        if job:
+            # Extra samples cost their output only; the input is shared
+            extra = cost_usd(model, 0, estimate["max_output_tokens"] * (samples - 1))
+            job.estimated_cost_usd += estimate["max_cost_usd"] + extra
+        return estimate
 
-    def _openai_generate(self, prompt: str, max_tokens: int, temperature: float) -> str:
-        """Generate using OpenAI GPT-4."""
+    def _record_usage(self, model: str, estimated_input_tokens: int, input_tokens: int, output_tokens: int,
+                      seconds: float, cached_input_tokens: int = 0):
+        """Accumulate per-model call counts, tokens (estimated and actual), cost and latency."""
+        with self._usage_lock:
+            usage = self.model_usage.setdefault(model, {
+                "calls": 0, "estimated_input_tokens": 0, "input_tokens": 0, "cached_input_tokens": 0,
+                "output_tokens": 0, "cost_usd": 0.0, "seconds": 0.0
+            })
+            usage["calls"] += 1
+            usage["estimated_input_tokens"] += estimated_input_tokens
+            usage["input_tokens"] += input_tokens
+            usage["cached_input_tokens"] += cached_input_tokens
+            usage["output_tokens"] += output_tokens
+            usage["cost_usd"] += cost_usd(model, input_tokens, output_tokens)
+            usage["seconds"] += seconds
+
+    def estimate(self, prompt: str, max_tokens: int = 1000, task_class: str = "standard") -> dict:
+        """
+        Pre-flight estimate (input tokens, clamped output, max cost, fits)
+        of a generate() call on the primary provider, without sending it.
+        """
+        provider = "anthropic" if self.primary == "anthropic" and self.anthropic_client else "openai"
+        return estimate_call(prompt, provider, self.router.model_for(provider, task_class), max_tokens)
+
+    def _anthropic_generate(self, prompt: str, max_tokens: int, temperature: float,
+                            model: str = "claude-sonnet-4-20250514", partial: str = "", prefix: str = None,
+                            on_text: Callable[[str], None] = None, timeout: float = None) -> dict:
+        """
+        Generate using Anthropic Claude. `partial` is prefilled so the model continues it;
+        `prefix` is sent as a separate cache-marked block ahead of the prompt.
+        With `on_text` the response is streamed chunk by chunk; `timeout` bounds the request.
+        """
+        content = prompt
+        if prefix:
+            content = [
+                {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt}
+            ]
+        messages = [{"role": "user", "content": content}]
+        if partial:
+            messages.append({"role": "assistant", "content": partial})
+
+        request = {"model": model, "max_tokens": max_tokens, "temperature": temperature, "messages": messages}
+        if timeout:
+            request["timeout"] = timeout
+        if on_text:
+            with self.anthropic_client.messages.stream(**request) as stream:
+                for chunk in stream.text_stream:
+                    on_text(chunk)
+                response = stream.get_final_message()
+        else:
+            response = self.anthropic_client.messages.create(**request)
+        return {
+            "text": response.content[0].text if response.content else "",
+            "input_tokens": response.usage.input_tokens,
+            "cached_input_tokens": getattr(response.usage, "cache_read_input_tokens", 0) or 0,
+            "output_tokens": response.usage.output_tokens,
+            "truncated": response.stop_reason == "max_tokens"
+        }
+
+    def _openai_generate(self, prompt: str, max_tokens: int, temperature: float,
+                         model: str = "gpt-4o", partial: str = "", prefix: str = None,
+                         on_text: Callable[[str], None] = None, timeout: float = None) -> dict:
+        """
+        Generate using OpenAI. `partial` is replayed and the model is asked to continue it;
+        `prefix` leads the prompt so OpenAI's automatic prompt caching can reuse it.
+        With `on_text` the response is streamed chunk by chunk; `timeout` bounds the request.
+        """
+        messages = self._chat_messages(prompt, partial, prefix)
+
+        request = {"model": model, "max_tokens": max_tokens, "temperature": temperature, "messages": messages}
+        if timeout:
+            request["timeout"] = timeout
+        if on_text:
+            return self._openai_stream(request, on_text)
+
+        response = self.openai_client.chat.completions.create(**request)
+        return {
+            "text": response.choices[0].message.content or "",
+            "input_tokens": response.usage.prompt_tokens if response.usage else 0,
+            "cached_input_tokens": _openai_cached_tokens(response.usage),
+            "output_tokens": response.usage.completion_tokens if response.usage else 0,
+            "truncated": response.choices[0].finish_reason == "length"
+        }
+
+    def _openai_variants(self, prompt: str, n: int, max_tokens: int, temperature: float, model: str,
+                         prefix: str = None, timeout: float = None) -> dict:
+        """`n` OpenAI samples of one prompt: {texts, input_tokens, cached_input_tokens, output_tokens}."""
         response = self.openai_client.chat.completions.create(
-            model="gpt-4o",
+            model=model,
             max_tokens=max_tokens,
             temperature=temperature,
-            messages=[{"role": "user", "content": prompt}]
+            n=n,
+            messages=self._chat_messages(prompt, prefix=prefix),
+            timeout=timeout
+        )
+        usage = response.usage
+        return {
+            "texts": [choice.message.content or "" for choice in response.choices if choice.finish_reason != "length"],
+            "input_tokens": usage.prompt_tokens if usage else 0,
+            "cached_input_tokens": _openai_cached_tokens(usage),
+            "output_tokens": usage.completion_tokens if usage else 0
+        }
+
+    def _openai_stream(self, request: dict, on_text: Callable[[str], None]) -> dict:
+        """Streamed OpenAI completion; same result shape as _openai_generate()."""
+        parts = []
+        finish_reason = None
+        usage = None
+        stream = self.openai_client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
         )
-        return response.choices[0].message.content
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    on_text(delta)
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+        finally:
+            # Closing the response stops the generation when the caller aborts mid-stream
+            stream.close()
+        return {
+            "text": "".join(parts),
+            "input_tokens": usage.prompt_tokens if usage else 0,
+            "cached_input_tokens": _openai_cached_tokens(usage),
+            "output_tokens": usage.completion_tokens if usage else 0,
+            "truncated": finish_reason == "length"
+        }
 
     def is_available(self) -> bool:
         """Check if at least one AI client is available."""
-        return bool(self.anthropic_client or self.openai_client)
+        return bool(self.anthropic_client or self.openai_client or self._providers())
 
     def get_status(self) -> dict:
         """Get status of AI clients."""
         return {
             "anthropic": "available" if self.anthropic_client else "not configured",
             "openai": "available" if self.openai_client else "not configured",
-            "primary": self.primary
+            "primary": self.primary,
+            "backends": {name: backend.status() for name, backend in self.backends.items()},
+            "task_routes": self.task_routes,
+            "models": self.router.models
         }
+
+    def get_usage(self) -> dict:
+        """Per-model usage and the token sizing model, for diagnostics."""
+        with self._usage_lock:
+            models = {model: dict(usage) for model, usage in self.model_usage.items()}
+        return {"models": models, "token_sizing": self.sizer.stats(), "single_flight": self.flights.stats()}
@@ -0,0 +1,205 @@
+"""
+Lead magnet archive.
+Every finished job's artifacts (research, content, visual, posts) are kept
+in SQLite with an FTS5 index on titles, hooks, topics and body text, so
+past magnets can be searched (/api/archive/search) and /generate can offer
+an existing magnet on the same topic before spending tokens on a new one.
+"""
+
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+from .text_similarity import tokenize, jaccard
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# bm25 weights of the FTS columns: job_id (unindexed), title, hook, topic, body
+RANK_WEIGHTS = (0.0, 10.0, 5.0, 5.0, 1.0)
+
+
+def match_query(text: str, prefix: bool = True, any_word: bool = False, column: str = None) -> Optional[str]:
+    """
+    FTS5 query for free text: every word quoted (so user input can't break
+    the syntax), all required unless `any_word`, the last one as a prefix.
+    """
+    words = _WORD.findall(text or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if prefix:
+        terms[-1] += "*"
+    query = (" OR " if any_word else " ").join(terms)
+    return f"{column} : ({query})" if column else query
+
+
+def _strings(value) -> list:
+    """Every string inside a JSON value, depth first."""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [text for item in value.values() for text in _strings(item)]
+    if isinstance(value, list):
+        return [text for item in value for text in _strings(item)]
+    return []
+
+
+class Archive:
+    """SQLite archive of generated lead magnets with a full-text index."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS magnets (
+                    job_id TEXT PRIMARY KEY,
+                    route TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    hook TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_magnets_filters ON magnets (route, format, created_at)")
+            # Accent-insensitive, so "guia" finds "guía"
+            db.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS magnets_fts USING fts5(
+                    job_id UNINDEXED, title, hook, topic, body,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            """)
+
+    @contextmanager
+    def _db(self):
+        """Serialized connection that commits on success and always closes."""
+        with self._lock:
+            db = sqlite3.connect(self.path)
+            try:
+                yield db
+                db.commit()
+            finally:
+                db.close()
+
+    def add(self, job_id: str, route: str, format_type: str, topic: str, title: str, hook: str, result: dict):
+        """Archive (or re-archive, after a regeneration) the artifacts of a job."""
+        content, post = result.get("content"), result.get("post")
+        body = "\n".join(_strings(content) + _strings(post))
+        now = time.time()
+        with self._db() as db:
+            row = db.execute("SELECT created_at FROM magnets WHERE job_id = ?", (job_id,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO magnets (job_id, route, format, topic, title, hook, result, created_at, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, route, format_type, topic or "", title or "", hook or "",
+                 json.dumps(result, ensure_ascii=False), row[0] if row else now, now)
+            )
+            db.execute("DELETE FROM magnets_fts WHERE job_id = ?", (job_id,))
+            db.execute("INSERT INTO magnets_fts (job_id, title, hook, topic, body) VALUES (?, ?, ?, ?, ?)",
+                       (job_id, title or "", hook or "", topic or "", body))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """An archived magnet with its full result."""
+        with self._db() as db:
+            row = db.execute(
+                "SELECT job_id, route, format, topic, title, hook, created_at, updated_at, result "
+                "FROM magnets WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        entry = self._entry(row)
+        entry["result"] = json.loads(row[8])
+        return entry
+
+    def search(self, query: str = None, route: str = None, format_type: str = None, since: float = None,
+               until: float = None, limit: int = 20) -> list:
+        """
+        Archived magnets matching the words of `query` (best first, with a
+        snippet of the matching text), or the latest ones without a query,
+        filtered by route, format and creation time.
+        """
+        return self._query(match_query(query) if query else None, route, format_type, since, until, limit)
+
+    def similar(self, route: str, format_type: str, topic: str, threshold: float = 0.6,
+                max_age_seconds: float = None, limit: int = 3) -> list:
+        """
+        Archived magnets of the same route and format whose topic is close
+        to `topic` (word overlap >= `threshold`), most similar first.
+        """
+        fts = match_query(topic, prefix=False, any_word=True, column="topic")
+        if not fts:
+            return []
+        wanted = set(tokenize(topic))
+        since = time.time() - max_age_seconds if max_age_seconds else None
+        matches = []
+        for entry in self._query(fts, route, format_type, since, None, 20):
+            score = jaccard(wanted, set(tokenize(entry["topic"])))
+            if score >= threshold:
+                entry["similarity"] = round(score, 3)
+                matches.append(entry)
+        matches.sort(key=lambda entry: -entry["similarity"])
+        return matches[:limit]
+
+    def _query(self, fts: Optional[str], route: str, format_type: str, since: float, until: float,
+               limit: int) -> list:
+        """Rows of magnets matching the FTS5 expression `fts` (all when None) and the filters."""
+        filters, params = [], []
+        for column, value in (("m.route", route), ("m.format", format_type)):
+            if value:
+                filters.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            filters.append("m.created_at >= ?")
+            params.append(since)
+        if until:
+            filters.append("m.created_at < ?")
+            params.append(until)
+
+        columns = "m.job_id, m.route, m.format, m.topic, m.title, m.hook, m.created_at, m.updated_at"
+        with self._db() as db:
+            if fts:
+                where = " AND ".join(["magnets_fts MATCH ?"] + filters)
+                rows = db.execute(
+                    f"SELECT {columns}, snippet(magnets_fts, -1, '[', ']', '...', 16) "
+                    f"FROM magnets_fts JOIN magnets m ON m.job_id = magnets_fts.job_id WHERE {where} "
+                    f"ORDER BY bm25(magnets_fts, {', '.join(str(w) for w in RANK_WEIGHTS)}) LIMIT ?",
+                    [fts] + params + [limit]
+                ).fetchall()
+            else:
+                where = f"WHERE {' AND '.join(filters)}" if filters else ""
+                rows = db.execute(
+                    f"SELECT {columns}, NULL FROM magnets m {where} ORDER BY m.created_at DESC LIMIT ?",
+                    params + [limit]
+                ).fetchall()
+
+        entries = []
+        for row in rows:
+            entry = self._entry(row)
+            if row[8]:
+                entry["snippet"] = row[8]
+            entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _entry(row) -> dict:
+        return {
+            "job_id": row[0],
+            "route": row[1],
+            "format": row[2],
+            "topic": row[3],
+            "title": row[4],
+            "hook": row[5],
+            "created_at": row[6],
+            "updated_at": row[7]
+        }
@@ -0,0 +1,235 @@
+"""
+Task broker for multi-node workers.
+Web nodes enqueue jobs; worker processes (worker.py) reserve them with a
+visibility timeout, acknowledge them when done and nack them for a delayed
+retry on failure. A reserved task whose worker dies becomes visible again
+once its timeout expires.
+
+Brokers are pluggable by URL scheme (register_broker); SQLiteBroker is the
+built-in one, for web and worker processes on a single host sharing data/.
+"""
+
+import abc
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# queued -> running -> done | failed | cancelled (running -> queued again on nack or expiry)
+FINAL_STATES = ("done", "failed", "cancelled")
+
+
+class Broker(abc.ABC):
+    """
+    Interface of a task broker. Tasks are dicts with id, queue, payload,
+    state, attempts, max_attempts, result and error.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, queue: str, payload: dict, task_id: str = None, max_attempts: int = 3) -> str:
+        ...
+
+    @abc.abstractmethod
+    def reserve(self, queue: str, visibility_timeout: float) -> Optional[dict]:
+        """Next visible task of `queue`, hidden from other workers for `visibility_timeout` seconds."""
+        ...
+
+    @abc.abstractmethod
+    def extend(self, task_id: str, visibility_timeout: float) -> bool:
+        """Keep a reserved task hidden for another `visibility_timeout` seconds (heartbeat)."""
+        ...
+
+    @abc.abstractmethod
+    def ack(self, task_id: str, result: dict):
+        ...
+
+    @abc.abstractmethod
+    def nack(self, task_id: str, error: str, retry_delay: float = 0):
+        """Release a failed task for a retry after `retry_delay`, or fail it on its last attempt."""
+        ...
+
+    @abc.abstractmethod
+    def cancel(self, task_id: str, reason: str = None) -> bool:
+        """Cancel a queued or running task (a running one stops at its worker's next heartbeat)."""
+        ...
+
+    @abc.abstractmethod
+    def get(self, task_id: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    def depth(self, queue: str) -> int:
+        """Tasks waiting or running in `queue`."""
+        ...
+
+
+class SQLiteBroker(Broker):
+    """
+    Broker on a SQLite file. Reservations run in IMMEDIATE transactions,
+    so any number of worker processes on the machine can share the file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # WAL lets web nodes read task states while workers write
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.close()
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    queue TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    visible_at REAL NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_queue ON tasks (queue, state, visible_at)")
+
+    @contextmanager
+    def _db(self):
+        """Connection in an IMMEDIATE transaction that commits on success and always closes."""
+        with self._lock:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            finally:
+                db.close()
+
+    def enqueue(self, queue: str, payload: dict, task_id: str = None, max_attempts: int = 3) -> str:
+        task_id = task_id or uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO tasks (id, queue, payload, state, max_attempts, visible_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (task_id, queue, json.dumps(payload, ensure_ascii=False), max_attempts, now, now, now)
+            )
+        return task_id
+
+    def reserve(self, queue: str, visibility_timeout: float) -> Optional[dict]:
+        now = time.time()
+        with self._db() as db:
+            # Running tasks past their visibility timeout lost their worker
+            expired = db.execute(
+                "SELECT id FROM tasks WHERE queue = ? AND state = 'running' AND visible_at <= ? "
+                "AND attempts >= max_attempts", (queue, now)
+            ).fetchall()
+            for (task_id,) in expired:
+                db.execute("UPDATE tasks SET state = 'failed', error = 'Worker lost on last attempt', "
+                           "updated_at = ? WHERE id = ?", (now, task_id))
+
+            row = db.execute(
+                "SELECT id FROM tasks WHERE queue = ? AND state IN ('queued', 'running') AND visible_at <= ? "
+                "ORDER BY visible_at LIMIT 1", (queue, now)
+            ).fetchone()
+            if not row:
+                return None
+            db.execute(
+                "UPDATE tasks SET state = 'running', attempts = attempts + 1, visible_at = ?, updated_at = ? "
+                "WHERE id = ?", (now + visibility_timeout, now, row[0])
+            )
+            return self._task(db, row[0])
+
+    def extend(self, task_id: str, visibility_timeout: float) -> bool:
+        now = time.time()
+        with self._db() as db:
+            updated = db.execute(
+                "UPDATE tasks SET visible_at = ?, updated_at = ? WHERE id = ? AND state = 'running'",
+                (now + visibility_timeout, now, task_id)
+            ).rowcount
+        return bool(updated)
+
+    def ack(self, task_id: str, result: dict):
+        with self._db() as db:
+            db.execute(
+                "UPDATE tasks SET state = 'done', result = ?, error = NULL, updated_at = ? "
+                "WHERE id = ? AND state = 'running'",
+                (json.dumps(result, ensure_ascii=False), time.time(), task_id)
+            )
+
+    def nack(self, task_id: str, error: str, retry_delay: float = 0):
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "visible_at = ?, error = ?, updated_at = ? WHERE id = ? AND state = 'running'",
+                (now + retry_delay, error, now, task_id)
+            )
+
+    def cancel(self, task_id: str, reason: str = None) -> bool:
+        with self._db() as db:
+            updated = db.execute(
+                "UPDATE tasks SET state = 'cancelled', error = COALESCE(?, error), updated_at = ? "
+                "WHERE id = ? AND state IN ('queued', 'running')",
+                (reason, time.time(), task_id)
+            ).rowcount
+        return bool(updated)
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._db() as db:
+            return self._task(db, task_id)
+
+    def depth(self, queue: str) -> int:
+        with self._db() as db:
+            return db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE queue = ? AND state IN ('queued', 'running')", (queue,)
+            ).fetchone()[0]
+
+    @staticmethod
+    def _task(db, task_id: str) -> Optional[dict]:
+        row = db.execute(
+            "SELECT id, queue, payload, state, attempts, max_attempts, result, error, created_at, updated_at "
+            "FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "queue": row[1],
+            "payload": json.loads(row[2]),
+            "state": row[3],
+            "attempts": row[4],
+            "max_attempts": row[5],
+            "result": json.loads(row[6]) if row[6] else None,
+            "error": row[7],
+            "created_at": row[8],
+            "updated_at": row[9]
+        }
+
+
+BROKERS = {"sqlite": lambda location: SQLiteBroker(location)}
+
+
+def register_broker(scheme: str, factory):
+    """Make `factory(location)` the broker for URLs like `<scheme>://<location>`."""
+    BROKERS[scheme] = factory
+
+
+def broker_from_url(url: str) -> Broker:
+    """Broker for a URL such as sqlite:///data/broker.db."""
+    scheme, _, location = url.partition("://")
+    if scheme not in BROKERS:
+        raise ValueError(f"Unknown broker '{scheme}'. Available: {list(BROKERS)}")
+    return BROKERS[scheme](location)
@@ -0,0 +1,115 @@
+"""
+Per-stage time budgets.
+Splits a job's deadline (see cancellation.CancelToken) across the pipeline
+stages, derives provider timeouts from the time left, and tells later
+stages when to cut back so the job finishes inside its SLA.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from config.settings import Settings
+from .job_context import current_job
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("research", "content", "visual", "post")
+
+# Typical duration of each stage at full quality; below this a stage is "short" of time
+EXPECTED_SECONDS = {"research": 20, "content": 60, "visual": 25, "post": 20}
+
+# Time held back for every stage still to come when sizing a call's timeout
+MIN_STAGE_SECONDS = 5
+
+_local = threading.local()
+
+
+class TimeBudgetExceeded(Exception):
+    """Raised when a stage skips work it has no time for."""
+
+
+class JobBudget:
+    """
+    Deadline of one job, split into stage budgets by Settings.STAGE_SHARES.
+    A stage's allowance is its share of the time left over the stages that
+    have not run yet, so time saved early flows to later stages.
+    """
+
+    def __init__(self, cancel_token, shares: dict = None):
+        self.token = cancel_token
+        self.shares = shares or Settings.STAGE_SHARES
+
+    def remaining(self) -> float:
+        remaining = self.token.remaining()
+        return float("inf") if remaining is None else remaining
+
+    def allowance(self, stage: str) -> float:
+        """Seconds this stage may use, from its share of the time left."""
+        if stage not in STAGES:
+            return self.remaining()
+        upcoming = STAGES[STAGES.index(stage):]
+        total = sum(self.shares.get(s, 0) for s in upcoming) or 1
+        return self.remaining() * self.shares.get(stage, 0) / total
+
+    def is_short(self, stage: str) -> bool:
+        """True when the stage cannot expect its usual duration."""
+        return self.allowance(stage) < EXPECTED_SECONDS.get(stage, 0)
+
+    def timeout(self, stage: Optional[str], default: float) -> float:
+        """Timeout for one call: the time left minus a reserve for the stages after `stage`."""
+        later = STAGES[STAGES.index(stage) + 1:] if stage in STAGES else ()
+        return max(1.0, min(default, self.remaining() - MIN_STAGE_SECONDS * len(later)))
+
+
+def current_budget() -> Optional[JobBudget]:
+    job = current_job()
+    return getattr(job, "budget", None) if job else None
+
+
+def current_stage() -> Optional[str]:
+    """Stage running on this thread, if any."""
+    return getattr(_local, "stage", None)
+
+
+@contextmanager
+def stage_scope(stage: str):
+    """Mark the block as `stage` for budgets, and time it in the metrics."""
+    previous = current_stage()
+    _local.stage = stage
+    started = time.time()
+    try:
+        yield
+    finally:
+        _local.stage = previous
+        metrics.incr(f"stage_seconds.{stage}", time.time() - started)
+        metrics.incr(f"stage_runs.{stage}")
+
+
+def staged(stage: str, fn):
+    """Wrap `fn` to run inside stage_scope(stage)."""
+    def run(*args, **kwargs):
+        with stage_scope(stage):
+            return fn(*args, **kwargs)
+    return run
+
+
+def call_timeout(default: float) -> float:
+    """Timeout for a provider call made now, bounded by the job's budget."""
+    budget = current_budget()
+    return budget.timeout(current_stage(), default) if budget else default
+
+
+def time_is_short(stage: str = None) -> bool:
+    """True when `stage` (default: the current one) is short of time."""
+    budget = current_budget()
+    stage = stage or current_stage()
+    return bool(budget and stage and budget.is_short(stage))
+
+
+def degrade(action: str, stage: str = None):
+    """Log and count a cut made to stay within budget."""
+    logger.warning(f"Short on time in {stage or current_stage() or 'job'}: {action}")
+    metrics.incr(f"budget.{action}")
@@ -0,0 +1,110 @@
+"""
+Cooperative cancellation.
+A CancelToken travels with the job (see job_context.JobContext); agents
+check it before spending on a provider call and while streaming, so a
+closed tab, an explicit cancel or an expired deadline stops the work.
+"""
+
+import socket
+import logging
+import threading
+import time
+from typing import Optional
+from .job_context import current_job
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Cancelled(BaseException):
+    """
+    Raised inside a job once its token is cancelled.
+    Like asyncio.CancelledError it is a BaseException, so the agents'
+    `except Exception` fallbacks do not swallow it.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(f"Job cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """Cancellation flag with an optional deadline (seconds from now)."""
+
+    def __init__(self, deadline_seconds: float = None):
+        self._event = threading.Event()
+        self.reason = None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel the job; the first reason wins."""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            logger.info(f"Job cancellation requested: {reason}")
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, if there is one."""
+        return max(0.0, self.deadline - time.monotonic()) if self.deadline else None
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+
+def current_token() -> Optional[CancelToken]:
+    """Cancel token of the job running on this thread, if any."""
+    job = current_job()
+    return job.cancel_token if job else None
+
+
+def check_cancelled(kind: str = None):
+    """
+    Raise Cancelled when the current job has been cancelled.
+    `kind` (llm, search, image, stage...) counts the skipped work in the metrics.
+    """
+    token = current_token()
+    if token and token.cancelled:
+        if kind:
+            metrics.incr(f"cancelled.{kind}_skipped")
+        raise Cancelled(token.reason)
+
+
+class DisconnectWatcher:
+    """
+    Polls the client socket of a request and cancels `token` when the peer
+    closes the connection (e.g. the dashboard tab is closed).
+    """
+
+    def __init__(self, sock, token: CancelToken, interval: float = 0.5):
+        self.sock = sock
+        self.token = token
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="disconnect-watcher")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+    def _run(self):
+        flags = socket.MSG_PEEK | getattr(socket, "MSG_DONTWAIT", 0)
+        while not self._stop.wait(self.interval):
+            try:
+                if self.sock.recv(1, flags) == b"":
+                    self.token.cancel("client_disconnected")
+                    return
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                self.token.cancel("client_disconnected")
+                return
@@ -0,0 +1,139 @@
+"""
+Record/replay cassettes for provider traffic.
+In record mode every LLM completion, Serper search and image request is
+stored with its response and timing in a gzip file keyed by the hash of the
+request; in replay mode the same requests are served from the cassette,
+with their original timing scaled by a factor (0 = instant), so runs are
+deterministic, free and offline.
+
+Replay needs the configuration of the recording (PRIMARY_AI, which keys
+are set - any dummy value works) so the same requests are made.
+"""
+
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Callable
+from config.settings import Settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def request_hash(kind: str, request: dict) -> str:
+    """Stable key of a request."""
+    raw = json.dumps([kind, request], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+class Cassette:
+    """
+    On-disk cassette: one `<kind>-<hash>.json.gz` file per distinct request,
+    holding every recorded response to it in order. Repeated identical
+    requests replay those responses in the same order (the last one repeats).
+    """
+
+    def __init__(self, directory: Path, mode: str = "off", timing_factor: float = 1.0):
+        self.directory = Path(directory)
+        self.mode = mode if mode in MODES else "off"
+        self.timing_factor = timing_factor
+        self._served = {}
+        self._lock = threading.Lock()
+        if self.mode != "off":
+            self.directory.mkdir(parents=True, exist_ok=True)
+            logger.info(f"Cassette {self.mode} mode: {self.directory} (timing x{timing_factor})")
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    def call(self, kind: str, request: dict, fn: Callable[[], object]):
+        """Response to `request`: from `fn()` (recorded in record mode) or from the cassette in replay."""
+        if self.mode == "replay":
+            entry = self._next(kind, request)
+            self._sleep(entry["seconds"])
+            return entry["response"]
+
+        started = time.time()
+        response = fn()
+        if self.mode == "record":
+            self._append(kind, request, {"response": response, "seconds": round(time.time() - started, 3)})
+        return response
+
+    def stream(self, kind: str, request: dict, fn: Callable[[Callable], dict], on_text: Callable[[str], None] = None):
+        """
+        Like call() for streamed completions: `fn(on_chunk)` streams through
+        `on_chunk`. Chunks are recorded with their offsets and replayed to `on_text`.
+        """
+        if not on_text:
+            return self.call(kind, request, lambda: fn(None))
+
+        if self.mode == "replay":
+            entry = self._next(kind, request)
+            elapsed = 0.0
+            for offset, chunk in entry.get("chunks", []):
+                self._sleep(offset - elapsed)
+                elapsed = offset
+                on_text(chunk)
+            self._sleep(entry["seconds"] - elapsed)
+            return entry["response"]
+
+        started = time.time()
+        chunks = []
+
+        def capture(chunk: str):
+            chunks.append([round(time.time() - started, 3), chunk])
+            on_text(chunk)
+
+        response = fn(capture if self.mode == "record" else on_text)
+        if self.mode == "record":
+            self._append(kind, request, {"response": response, "seconds": round(time.time() - started, 3),
+                                         "chunks": chunks})
+        return response
+
+    def _path(self, kind: str, request: dict) -> Path:
+        return self.directory / f"{kind}-{request_hash(kind, request)}.json.gz"
+
+    def _load(self, path: Path) -> list:
+        if not path.exists():
+            return []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)["entries"]
+
+    def _append(self, kind: str, request: dict, entry: dict):
+        path = self._path(kind, request)
+        with self._lock:
+            entries = self._load(path)
+            entries.append(entry)
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                json.dump({"kind": kind, "request": request, "entries": entries}, f, ensure_ascii=False)
+        metrics.incr(f"cassette.recorded_{kind}")
+
+    def _next(self, kind: str, request: dict) -> dict:
+        path = self._path(kind, request)
+        with self._lock:
+            entries = self._load(path)
+            if not entries:
+                metrics.incr("cassette.misses")
+                raise CassetteMiss(f"No recorded {kind} response for this request ({path.name})")
+            index = self._served.get(path.name, 0)
+            self._served[path.name] = index + 1
+        metrics.incr(f"cassette.replayed_{kind}")
+        return entries[min(index, len(entries) - 1)]
+
+    def _sleep(self, seconds: float):
+        if self.timing_factor > 0 and seconds > 0:
+            time.sleep(seconds * self.timing_factor)
+
+
+cassette = Cassette(Settings.CASSETTE_DIR, Settings.CASSETTE_MODE, Settings.CASSETTE_TIMING_FACTOR)
@@ -0,0 +1,159 @@
+"""
+Adaptive concurrency limits for outbound provider calls.
+Each endpoint (chat per provider, image, search) gets an AIMD limiter:
+the number of calls allowed in flight grows by one per round of healthy
+calls at the limit, and is cut multiplicatively on a 429, a timeout or a
+latency spike, so concurrency settles at what the provider gives us at
+that moment instead of a fixed thread count.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from config.settings import Settings
+from .cancellation import check_cancelled
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Latency samples needed before spikes are judged against the baseline
+MIN_LATENCY_SAMPLES = 5
+
+
+def is_throttling(error: BaseException) -> bool:
+    """True for provider rate-limit errors (HTTP 429) of any SDK."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+def is_timeout(error: BaseException) -> bool:
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit of one endpoint. Calls report their outcome
+    (ok, failed, throttled, timeout, cancelled), latency and size (`units`, so a long
+    completion is not mistaken for a slow one). Only calls started after the
+    last cut can cut again, so one burst of 429s halves the limit once.
+    """
+
+    def __init__(self, name: str, initial: float, max_limit: float, min_limit: float = 1,
+                 decrease: float = 0.5, latency_factor: float = 2.5, smoothing: float = 0.1):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.inflight = 0
+        self.baseline = None              # smoothed seconds per unit of healthy calls
+        self.samples = 0
+        self.last_cut = 0.0
+        self._cond = threading.Condition()
+        self._report()
+
+    def acquire(self) -> float:
+        """Wait for a free slot; returns the start time to pass to release()."""
+        waited = time.time()
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                check_cancelled("provider_slot")
+                self._cond.wait(0.5)
+            self.inflight += 1
+            self._report()
+        started = time.time()
+        if started - waited > 0.01:
+            metrics.incr(f"concurrency.{self.name}_wait_seconds", round(started - waited, 3))
+        return started
+
+    def release(self, started: float, outcome: str, units: float = 1):
+        now = time.time()
+        latency = (now - started) / max(units, 1)
+        with self._cond:
+            at_limit = self.inflight >= int(self.limit)
+            self.inflight -= 1
+            spike = (outcome == "ok" and self.samples >= MIN_LATENCY_SAMPLES
+                     and latency > self.latency_factor * self.baseline)
+
+            if outcome in ("throttled", "timeout") or spike:
+                if started >= self.last_cut:
+                    self._cut("latency_spike" if spike else outcome)
+                    self.last_cut = now
+            elif outcome == "ok":
+                self.baseline = latency if self.baseline is None else (
+                    self.baseline + self.smoothing * (latency - self.baseline))
+                self.samples += 1
+                # Additive increase: +1 per `limit` healthy calls, only while the limit is what holds us back
+                if at_limit:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._report()
+            self._cond.notify_all()
+
+    def _cut(self, reason: str):
+        previous = self.limit
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+        metrics.incr(f"concurrency.{self.name}_cuts")
+        logger.warning(f"Concurrency of {self.name} cut {previous:.1f} -> {self.limit:.1f} ({reason})")
+
+    def _report(self):
+        metrics.set(f"concurrency.{self.name}_limit", round(self.limit, 2))
+        metrics.set(f"concurrency.{self.name}_inflight", self.inflight)
+
+
+class ConcurrencyLimits:
+    """
+    One AIMDLimiter per endpoint, created on first use with the initial and
+    maximum limits of its kind (the part before the dot: "chat.openai" -> chat).
+    """
+
+    def __init__(self, initial: dict = None, maximum: dict = None, enabled: bool = None):
+        self.initial = initial or Settings.CONCURRENCY_INITIAL
+        self.maximum = maximum or Settings.CONCURRENCY_MAX
+        self.enabled = Settings.CONCURRENCY_ENABLED if enabled is None else enabled
+        self.limiters = {}
+        self._held = threading.local()
+        self._lock = threading.Lock()
+
+    def limiter(self, endpoint: str) -> AIMDLimiter:
+        with self._lock:
+            if endpoint not in self.limiters:
+                kind = endpoint.split(".")[0]
+                self.limiters[endpoint] = AIMDLimiter(
+                    endpoint, self.initial.get(kind, 4), self.maximum.get(kind, 16),
+                    decrease=Settings.CONCURRENCY_DECREASE, latency_factor=Settings.CONCURRENCY_LATENCY_FACTOR
+                )
+            return self.limiters[endpoint]
+
+    @contextmanager
+    def slot(self, endpoint: str, call):
+        """
+        Hold a slot of `endpoint` while the block runs and report the
+        outcome of `call` (a load_shedder.ProviderCall). Nested calls to the
+        same endpoint from the same thread (e.g. one made from a streaming
+        callback) reuse the slot instead of waiting for another.
+        """
+        held = getattr(self._held, "endpoints", None)
+        if held is None:
+            held = self._held.endpoints = set()
+        if not self.enabled or endpoint in held:
+            yield
+            return
+
+        limiter = self.limiter(endpoint)
+        started = limiter.acquire()
+        held.add(endpoint)
+        try:
+            yield
+        finally:
+            held.discard(endpoint)
+            limiter.release(started, call.outcome, call.units)
+
+    def status(self) -> dict:
+        return {endpoint: {"limit": round(limiter.limit, 2), "inflight": limiter.inflight}
+                for endpoint, limiter in self.limiters.items()}
+
+
+limits = ConcurrencyLimits()
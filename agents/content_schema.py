@@ -0,0 +1,274 @@
+"""
+Declared schemas of the lead magnet formats.
+Each format's required fields and list sizes, taken from LEAD_MAGNET_FORMATS
+and the JSON contract of its prompt in ProductArchitectAgent (a carousel has
+8-12 slides, a mini-course exactly 5 emails...). validate() checks a
+generated document in plain Python and reports field-level problems, so
+only the broken fields have to be generated again (see
+ProductArchitectAgent.repair_content).
+
+Only what the renderers and the rest of the pipeline rely on is required;
+optional fields of the prompts (visual_note, metric...) are not checked.
+"""
+
+TEXT = "text"
+
+
+class ListOf:
+    """
+    A list of `item` (TEXT, a dict of fields or another ListOf) with at
+    least `min_items` and at most `max_items` elements. `number_key` is a
+    1-based position field (slide_number, day...) kept in sequence.
+    """
+
+    def __init__(self, item, min_items: int = 1, max_items: int = None, number_key: str = None):
+        self.item = item
+        self.min_items = min_items
+        self.max_items = max_items
+        self.number_key = number_key
+
+
+SCHEMAS = {
+    "carousel": {
+        "carousel_title": TEXT,
+        "hook": TEXT,
+        "slides": ListOf({"title": TEXT, "body": TEXT}, 8, 12, number_key="slide_number"),
+        "comment_trigger": TEXT
+    },
+    "guide": {
+        "guide_title": TEXT,
+        "subtitle": TEXT,
+        "sections": ListOf({"title": TEXT, "content": TEXT, "key_takeaway": TEXT}, 5, 12,
+                           number_key="section_number"),
+        "bonus_checklist": ListOf(TEXT, 3),
+        "cta_text": TEXT
+    },
+    "checklist": {
+        "checklist_title": TEXT,
+        "categories": ListOf({
+            "category_name": TEXT,
+            "items": ListOf({"item": TEXT, "why_important": TEXT}, 4, 8)
+        }, 3, 5),
+        "cta": TEXT
+    },
+    "datareport": {
+        "report_title": TEXT,
+        "executive_summary": TEXT,
+        "sections": ListOf({"section_title": TEXT, "key_stat": TEXT, "analysis": TEXT}, 3, 6),
+        "recommendations": ListOf({"recommendation": TEXT, "priority": TEXT}, 2),
+        "conclusion": TEXT
+    },
+    "template": {
+        "template_title": TEXT,
+        "description": TEXT,
+        "sections": ListOf({
+            "section_name": TEXT,
+            "instructions": TEXT,
+            "fields": ListOf({"field_name": TEXT, "placeholder": TEXT})
+        }, 2),
+        "pro_tips": ListOf(TEXT)
+    },
+    "minicourse": {
+        "course_title": TEXT,
+        "emails": ListOf({"subject": TEXT, "content": TEXT, "action_item": TEXT}, 5, 5, number_key="day"),
+        "final_cta": TEXT
+    },
+    "worksheet": {
+        "worksheet_title": TEXT,
+        "introduction": TEXT,
+        "exercises": ListOf({
+            "title": TEXT,
+            "instructions": TEXT,
+            "questions": ListOf({"question": TEXT})
+        }, 5, 7, number_key="exercise_number"),
+        "next_steps": TEXT
+    },
+    "swipefile": {
+        "swipefile_title": TEXT,
+        "description": TEXT,
+        "categories": ListOf({
+            "category_name": TEXT,
+            "swipes": ListOf({"swipe_name": TEXT, "content": TEXT}, 3)
+        }, 3),
+        "pro_tips": ListOf(TEXT)
+    },
+    "casestudy": {
+        "case_study_title": TEXT,
+        "company_profile": {"type": TEXT, "industry": TEXT, "initial_situation": TEXT},
+        "challenge": {"main_problem": TEXT},
+        "solution": {
+            "approach": TEXT,
+            "steps": ListOf({"action": TEXT, "rationale": TEXT}, 3, number_key="step_number")
+        },
+        "results": {"metrics": ListOf({"metric": TEXT, "before": TEXT, "after": TEXT}, 2)},
+        "lessons_learned": ListOf({"lesson": TEXT, "application": TEXT}, 2),
+        "key_takeaway": TEXT
+    },
+    "toolkit": {
+        "toolkit_title": TEXT,
+        "description": TEXT,
+        "tools": ListOf({"tool_name": TEXT, "description": TEXT, "content": TEXT}, 5, 7,
+                        number_key="tool_number"),
+        "quick_start": TEXT
+    },
+    "cheatsheet": {
+        "cheatsheet_title": TEXT,
+        "sections": ListOf({"section_name": TEXT, "content": ListOf({"item": TEXT}, 2)}, 3),
+        "key_formulas": ListOf({"name": TEXT, "formula": TEXT}),
+        "common_mistakes": ListOf(TEXT, 2),
+        "footer_cta": TEXT
+    }
+}
+
+
+class Problem:
+    """One schema violation at `path` (keys and list indices from the document root)."""
+
+    def __init__(self, path: tuple, kind: str, detail: str = ""):
+        self.path = path
+        self.kind = kind  # missing, invalid, too_few, too_many
+        self.detail = detail
+
+    def __repr__(self):
+        return f"{path_str(self.path)}: {self.kind}{' (' + self.detail + ')' if self.detail else ''}"
+
+
+def path_str(path: tuple) -> str:
+    """`("slides", 3, "body")` -> `slides[3].body`."""
+    text = ""
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else part)
+    return text
+
+
+def _is_text(value) -> bool:
+    # Numbers are accepted where text is expected ("before": 120)
+    if isinstance(value, str):
+        return bool(value.strip())
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check(spec, value, path: tuple, problems: list):
+    if spec == TEXT:
+        if not _is_text(value):
+            problems.append(Problem(path, "missing" if value in (None, "") else "invalid", "expected text"))
+        return
+
+    if isinstance(spec, ListOf):
+        if not isinstance(value, list):
+            problems.append(Problem(path, "missing" if value is None else "invalid", "expected a list"))
+            return
+        for index, item in enumerate(value):
+            _check(spec.item, item, path + (index,), problems)
+        if len(value) < spec.min_items:
+            problems.append(Problem(path, "too_few", f"{len(value)} of at least {spec.min_items}"))
+        elif spec.max_items and len(value) > spec.max_items:
+            problems.append(Problem(path, "too_many", f"{len(value)} of at most {spec.max_items}"))
+        return
+
+    if not isinstance(value, dict):
+        problems.append(Problem(path, "missing" if value is None else "invalid", "expected an object"))
+        return
+    for key, field_spec in spec.items():
+        _check(field_spec, value.get(key), path + (key,), problems)
+
+
+def validate(format_type: str, content: dict) -> list:
+    """Problems of a generated document against its format's schema ([] when valid or undeclared)."""
+    schema = SCHEMAS.get(format_type)
+    if not schema:
+        return []
+    problems = []
+    _check(schema, content, (), problems)
+    return problems
+
+
+def get_path(content, path: tuple):
+    """Value at `path` of a document, None when a step is missing."""
+    for part in path:
+        try:
+            content = content[part]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return content
+
+
+def spec_at(format_type: str, path: tuple):
+    """Schema of the value at `path` of a document of `format_type`."""
+    spec = SCHEMAS[format_type]
+    for part in path:
+        spec = spec.item if isinstance(part, int) else spec[part]
+    return spec
+
+
+def example(spec):
+    """Skeleton of a value matching `spec`, shown to the model in repair prompts."""
+    if spec == TEXT:
+        return "..."
+    if isinstance(spec, ListOf):
+        item = example(spec.item)
+        if isinstance(item, dict) and spec.number_key:
+            item = {spec.number_key: 1, **item}
+        return [item]
+    return {key: example(field_spec) for key, field_spec in spec.items()}
+
+
+def repair_plan(format_type: str, content: dict, problems: list) -> list:
+    """
+    The smallest pieces to regenerate for `problems`, as
+    ("fields", parent_path, keys) for missing or invalid fields of an object,
+    ("items", list_path, indices, missing) for list items to replace and
+    items to add, and ("trim", list_path, max_items) for lists that are too long.
+    A broken field inside a list item is repaired by replacing the item.
+    """
+    fields, items, trims = {}, {}, {}
+    for problem in problems:
+        path = problem.path
+        if problem.kind == "too_many":
+            trims[path] = spec_at(format_type, path).max_items
+        elif problem.kind == "too_few":
+            missing = spec_at(format_type, path).min_items - len(get_path(content, path))
+            items.setdefault(path, [set(), 0])[1] = missing
+        elif not path:
+            continue
+        else:
+            positions = [i for i, part in enumerate(path) if isinstance(part, int)]
+            if positions:
+                items.setdefault(path[:positions[-1]], [set(), 0])[0].add(path[positions[-1]])
+            else:
+                fields.setdefault(path[:-1], []).append(path[-1])
+
+    # Nothing inside an item that is replaced as a whole needs its own repair
+    replaced = [list_path + (index,) for list_path, (indices, _) in items.items() for index in indices]
+
+    def inside_replaced(path: tuple) -> bool:
+        return any(path[:len(item)] == item and len(path) > len(item) for item in replaced)
+
+    plan = [("trim", path, limit) for path, limit in trims.items() if not inside_replaced(path)]
+    plan += [("fields", parent, keys) for parent, keys in fields.items() if not inside_replaced(parent + (keys[0],))]
+    plan += [("items", path, sorted(indices), missing) for path, (indices, missing) in items.items()
+             if not inside_replaced(path)]
+    return plan
+
+
+def renumber(format_type: str, content: dict):
+    """Rewrite the position fields (slide_number, day...) of the lists that declare one, in place."""
+    def walk(spec, value):
+        if isinstance(spec, ListOf) and isinstance(value, list):
+            for position, item in enumerate(value, 1):
+                if spec.number_key and isinstance(item, dict):
+                    item[spec.number_key] = position
+                walk(spec.item, item)
+        elif isinstance(spec, dict) and isinstance(value, dict):
+            for key, field_spec in spec.items():
+                walk(field_spec, value.get(key))
+
+    if format_type in SCHEMAS:
+        walk(SCHEMAS[format_type], content)
+
+
+def is_valid(spec, value) -> bool:
+    """True when `value` matches `spec`."""
+    problems = []
+    _check(spec, value, (), problems)
+    return not problems
@@ -0,0 +1,104 @@
+"""
+Token-efficient context packing for search results.
+Turns raw search results into a compact, de-duplicated, relevance-ranked
+block with short reference ids instead of pretty-printed JSON with full URLs.
+"""
+
+import re
+from typing import Tuple
+from .text_similarity import tokenize, shingles, jaccard
+
+_REF = re.compile(r"^S\d+$")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _normalize_url(url: str) -> str:
+    """Canonical form of a URL for duplicate detection."""
+    url = (url or "").strip().lower()
+    url = re.sub(r"^https?://(www\.)?", "", url)
+    url = url.split("#")[0].split("?")[0]
+    return url.rstrip("/")
+
+
+def pack_search_results(results: list, topic: str, token_budget: int = 1200,
+                        snippet_chars: int = 300, similarity_threshold: float = 0.8) -> Tuple[str, dict]:
+    """
+    Pack search results for a prompt.
+
+    Removes duplicates by URL and near-identical snippet, ranks the rest by
+    overlap with the topic, and keeps as many as fit in `token_budget`.
+    Returns the packed text and a map of reference ids (S1, S2...) to sources.
+    """
+    topic_terms = set(tokenize(topic))
+    seen_urls = set()
+    kept = []
+
+    for position, result in enumerate(results):
+        if not isinstance(result, dict):
+            continue
+        url = _normalize_url(result.get("link", ""))
+        if url and url != "#" and url in seen_urls:
+            continue
+        snippet = " ".join((result.get("snippet") or "").split())
+        fingerprint = shingles(snippet)
+        if any(jaccard(fingerprint, other["fingerprint"]) >= similarity_threshold for other in kept):
+            continue
+        seen_urls.add(url)
+
+        text_terms = set(tokenize(f"{result.get('title', '')} {snippet}"))
+        relevance = len(topic_terms & text_terms) / len(topic_terms) if topic_terms else 0.0
+        kept.append({
+            "result": result,
+            "snippet": snippet,
+            "fingerprint": fingerprint,
+            # Search engines already rank results, so earlier positions break ties
+            "score": relevance - position * 0.001
+        })
+
+    kept.sort(key=lambda item: item["score"], reverse=True)
+
+    lines = []
+    refs = {}
+    used = 0
+    for item in kept:
+        result = item["result"]
+        ref = f"S{len(refs) + 1}"
+        snippet = item["snippet"]
+        if len(snippet) > snippet_chars:
+            snippet = snippet[:snippet_chars].rsplit(" ", 1)[0] + "…"
+        # The domain says more than a generic "Google Search" label and costs fewer tokens
+        domain = _normalize_url(result.get("link", "")).split("/")[0]
+        source = domain if domain and domain != "#" else result.get("source", "")
+        line = f"[{ref}] {result.get('title', '').strip()} | {snippet} ({source})"
+        cost = estimate_tokens(line)
+        if used + cost > token_budget and lines:
+            break
+        lines.append(line)
+        refs[ref] = {"url": result.get("link", ""), "source": source}
+        used += cost
+
+    return "\n".join(lines), refs
+
+
+def resolve_references(data, refs: dict):
+    """
+    Map reference ids produced by the model back to URLs, in place.
+    Any dict with a "ref" like "S3" gets its "url" (and missing "source") filled in.
+    """
+    if isinstance(data, dict):
+        ref = data.get("ref")
+        if isinstance(ref, str) and _REF.match(ref.strip()) and ref.strip() in refs:
+            source = refs[ref.strip()]
+            data["url"] = source["url"]
+            if not data.get("source"):
+                data["source"] = source["source"]
+        for value in data.values():
+            resolve_references(value, refs)
+    elif isinstance(data, list):
+        for value in data:
+            resolve_references(value, refs)
+    return data
@@ -4,10 +4,19 @@ Responsible for creating visual assets using AI image generation.
 Creates carousel covers, ebook covers, social graphics.
 """
 
+import base64
 import logging
 from typing import Optional
 import openai
+import requests
 from config.faststrat_context import VISUAL_BRAND_GUIDELINES
+from config.settings import Settings
+from .single_flight import SingleFlight, request_key
+from .cancellation import check_cancelled
+from .budget import TimeBudgetExceeded, call_timeout, degrade, time_is_short
+from .load_shedder import ServiceOverloaded, is_cut, overload
+from .metrics import metrics
+from .cassette import cassette
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +32,10 @@ class CreativeDirectorAgent:
     - Create infographic concepts
     """
 
-    def __init__(self, openai_api_key: str):
+    def __init__(self, openai_api_key: str, slide_composer=None, library=None):
         self.client = openai.OpenAI(api_key=openai_api_key)
+        self.slide_composer = slide_composer
+        self.library = library
         self.brand_style = """
         Modern tech B2B aesthetic, clean minimalist design,
         gradient backgrounds with purple/indigo (#6366F1) and teal (#10B981) tones,
@@ -32,6 +43,75 @@ class CreativeDirectorAgent:
         abstract geometric shapes, no text in image unless specified,
         high contrast, premium quality
         """
+        self.flights = SingleFlight()
+
+    def _generate_image(self, prompt: str, size: str, kind: str = None, theme: str = None) -> str:
+        """
+        Generate one DALL-E image and return its URL.
+        Identical concurrent requests share one generation.
+
+        When `kind` and `theme` are given and a visual library is configured,
+        a close-enough existing visual is served instead, and fresh
+        generations are stored in the library.
+        """
+        use_library = bool(self.library and kind and theme)
+        if use_library:
+            hit = self.library.find(theme, kind, size)
+            if hit:
+                logger.info(f"Serving {kind} from visual library (similarity {hit['similarity']})")
+                return hit["url"]
+
+        check_cancelled("image")
+        if is_cut("library_visuals"):
+            # Degraded mode: any library visual of this kind, no fresh generations
+            return self._any_library_visual(
+                kind, theme, size, lambda: metrics.incr("overload.library_visuals"),
+                lambda: metrics.incr("overload.visuals_skipped"),
+                ServiceOverloaded("Image generation is paused while the service is overloaded"))
+        if time_is_short("visual"):
+            # No time for a fresh generation: any library visual of this kind beats none
+            return self._any_library_visual(
+                kind, theme, size, lambda: degrade("cached_visual", "visual"),
+                lambda: degrade("visual_skipped", "visual"),
+                TimeBudgetExceeded("Not enough time left to generate an image"))
+
+        key = request_key("image", "dall-e-3", prompt, size)
+        image_url = self.flights.do(
+            key, lambda: cassette.call("image", {"model": "dall-e-3", "prompt": prompt, "size": size},
+                                       lambda: self._dalle_generate(prompt, size))
+        )
+
+        if use_library:
+            image = self._download_image(image_url)
+            if image:
+                return self.library.add(image, theme, kind, size)
+        return image_url
+
+    def _any_library_visual(self, kind: str, theme: str, size: str, on_hit, on_miss, error: Exception) -> str:
+        """
+        URL of the closest library visual of `kind` however far its theme,
+        for when no fresh image can be generated; `error` is raised when the
+        library has none. `on_hit` / `on_miss` record which way it went.
+        """
+        hit = self.library.find(theme or "", kind, size, threshold=0.0) if self.library and kind else None
+        if hit:
+            on_hit()
+            return hit["url"]
+        on_miss()
+        raise error
+
+    def _dalle_generate(self, prompt: str, size: str) -> str:
+        """Call the images API; see _generate_image()."""
+        with overload.provider_call("image"):
+            response = self.client.images.generate(
+                model="dall-e-3",
+                prompt=prompt,
+                size=size,
+                quality="standard",
+                n=1,
+                timeout=call_timeout(Settings.IMAGE_TIMEOUT_SECONDS)
+            )
+        return response.data[0].url
 
     def generate_carousel_cover(self, title: str, theme: str) -> dict:
         """
@@ -53,16 +133,10 @@ Requirements:
 """
 
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1,
-            )
+            image_url = self._generate_image(prompt, "1024x1024", kind="carousel_cover", theme=f"{title} {theme}")
             return {
                 "success": True,
-                "image_url": response.data[0].url,
+                "image_url": image_url,
                 "type": "carousel_cover",
                 "title": title
             }
@@ -92,16 +166,11 @@ Requirements:
 """
 
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1792",  # Portrait for ebook
-                quality="standard",
-                n=1,
-            )
+            image_url = self._generate_image(prompt, "1024x1792",  # Portrait for ebook
+                                             kind="ebook_cover", theme=f"{title} {subtitle}")
             return {
                 "success": True,
-                "image_url": response.data[0].url,
+                "image_url": image_url,
                 "type": "ebook_cover",
                 "title": title
             }
@@ -135,16 +204,10 @@ Requirements:
 """
 
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=sizes.get(platform, "1024x1024"),
-                quality="standard",
-                n=1,
-            )
+            image_url = self._generate_image(prompt, sizes.get(platform, "1024x1024"))
             return {
                 "success": True,
-                "image_url": response.data[0].url,
+                "image_url": image_url,
                 "type": "social_graphic",
                 "platform": platform,
                 "concept": concept
@@ -177,16 +240,11 @@ Requirements:
 """
 
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1792x1024",  # Landscape for reports
-                quality="standard",
-                n=1,
-            )
+            image_url = self._generate_image(prompt, "1792x1024",  # Landscape for reports
+                                             kind="infographic_hero", theme=f"{topic} {data_context}")
             return {
                 "success": True,
-                "image_url": response.data[0].url,
+                "image_url": image_url,
                 "type": "infographic_hero",
                 "topic": topic
             }
@@ -218,16 +276,10 @@ Requirements:
 """
 
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1,
-            )
+            image_url = self._generate_image(prompt, "1024x1024")
             return {
                 "success": True,
-                "image_url": response.data[0].url,
+                "image_url": image_url,
                 "type": "slide_visual",
                 "slide_title": title
             }
@@ -235,11 +287,98 @@ Requirements:
             logger.error(f"Slide visual generation error: {e}")
             return {"success": False, "error": str(e)}
 
+    def generate_carousel_background(self, theme: str) -> dict:
+        """
+        Generate one portrait brand background for locally composed slides.
+        """
+        prompt = f"""Create an abstract background for a LinkedIn carousel.
+
+THEME: {theme}
+STYLE: {self.brand_style}
+
+Requirements:
+- Abstract, low-detail composition that text can sit on top of
+- Gradient purple/indigo background with subtle teal accents
+- Large calm areas, no focal object in the center
+- NO TEXT in the image
+- Portrait 4:5 composition
+"""
+
+        try:
+            image_url = self._generate_image(prompt, "1024x1792", kind="carousel_background", theme=theme)
+            return {
+                "success": True,
+                "image_url": image_url,
+                "type": "carousel_background",
+                "theme": theme
+            }
+        except Exception as e:
+            logger.error(f"Carousel background generation error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _download_image(self, url: str) -> Optional[bytes]:
+        """Fetch a generated image (DALL-E URLs expire, so they are used right away)."""
+        if self.library and self.library.owns(url):
+            return self.library.read(url)
+        try:
+            # Recorded base64-encoded, since cassettes are JSON
+            encoded = cassette.call("image_download", {"url": url}, lambda: self._fetch_image(url))
+            return base64.b64decode(encoded)
+        except Exception as e:
+            logger.warning(f"Image download failed, using brand gradient: {e}")
+            return None
+
+    def _fetch_image(self, url: str) -> str:
+        """Download an image, base64-encoded."""
+        response = requests.get(url, timeout=call_timeout(30))
+        response.raise_for_status()
+        return base64.b64encode(response.content).decode("ascii")
+
+    def compose_carousel(self, carousel_data: dict, background_url: str = None, background: bytes = None) -> dict:
+        """
+        Typeset every slide locally over a single background.
+        Uses `background` (image bytes) or `background_url` when given
+        (e.g. the cover just generated), otherwise generates one background image.
+        """
+        if not self.slide_composer:
+            return {"success": False, "error": "Slide composer not configured"}
+
+        if background is None:
+            if not background_url:
+                background_url = self.generate_carousel_background(carousel_data.get("hook", "")).get("image_url")
+            background = self._download_image(background_url) if background_url else None
+
+        result = self.slide_composer.compose(carousel_data.get("slides", []), background)
+        result.update({
+            "type": "carousel_slides",
+            "title": carousel_data.get("carousel_title", ""),
+            "background_url": background_url
+        })
+        return result
+
     def generate_all_carousel_visuals(self, carousel_data: dict) -> list:
         """
         Generate cover + key slide visuals for a carousel.
         Returns list of generated images.
+
+        With a slide composer, every slide is typeset locally over one
+        generated background instead of one DALL-E call per key slide.
         """
+        if self.slide_composer:
+            composed = self.compose_carousel(carousel_data)
+            if composed.get("success"):
+                return [
+                    {
+                        "success": True,
+                        "type": "carousel_slide",
+                        "carousel_id": composed["carousel_id"],
+                        "image_file": filename,
+                        "slide_number": number
+                    }
+                    for number, filename in enumerate(composed["slides"], 1)
+                ]
+            logger.warning(f"Slide composition failed, falling back to DALL-E visuals: {composed.get('error')}")
+
         results = []
 
         # Generate cover
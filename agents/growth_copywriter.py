@@ -4,12 +4,41 @@ Responsible for writing viral LinkedIn posts to distribute lead magnets.
 Uses proven viral frameworks (PASTOR, PAS, AIDA).
 """
 
+import re
 import json
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from config.faststrat_context import FASTSTRAT_CONTEXT
+from .ai_client import is_valid_json, parse_json_response
+from .job_context import bind_job
+from .text_similarity import tokenize, shingles, jaccard
 
 logger = logging.getLogger(__name__)
 
+_EMOJI = re.compile("[\U0001F300-\U0001FAFF\u2600-\u27BF]")
+
+
+def score_post(post: dict, trigger: str) -> float:
+    """
+    Share of the PASTOR post rules a post satisfies (0-1), checked locally:
+    short hook, 150-200 words, short lines, a data point, the comment CTA,
+    3 hashtags with #FastStrat and at most one emoji.
+    """
+    text = post.get("post_text", "")
+    lines = [line for line in text.splitlines() if line.strip()]
+    hashtags = post.get("hashtags") or []
+    checks = [
+        bool(lines) and len(lines[0].split()) <= 15,
+        150 <= len(text.split()) <= 200,
+        bool(lines) and sum(len(line.split()) <= 10 for line in lines) / len(lines) >= 0.8,
+        bool(re.search(r"\d", text)),
+        trigger.lower() in " ".join(lines[-2:]).lower(),
+        len(hashtags) == 3 and "#FastStrat" in hashtags,
+        len(_EMOJI.findall(text)) <= 1
+    ]
+    return round(sum(checks) / len(checks), 3)
+
 
 class GrowthCopywriterAgent:
     """
@@ -17,33 +46,64 @@ class GrowthCopywriterAgent:
 
     Capabilities:
     - Write viral LinkedIn posts
+    - Write A/B variants of a post in one call
     - Create comment triggers
     - Craft email sequences
     - Write landing page copy
+    - Write the whole distribution bundle at once
     """
 
     def __init__(self, ai_client):
         self.ai_client = ai_client
 
-    def write_linkedin_post(self, lead_magnet: dict, research: dict, comment_trigger: str = None) -> dict:
+    def build_context(self, lead_magnet: dict, research: dict = None) -> str:
+        """
+        Shared context for every distribution asset of one lead magnet.
+        It is sent as a cached prompt prefix, so it must be byte-identical
+        across the calls that share it.
+        """
+        context = f"""{FASTSTRAT_CONTEXT}
+
+LEAD MAGNET A PROMOCIONAR:
+{json.dumps(lead_magnet, indent=2, ensure_ascii=False)[:2000]}"""
+        if research:
+            context += f"""
+
+RESEARCH/DATA POINTS:
+{json.dumps(research, indent=2, ensure_ascii=False)[:1500]}"""
+        return context
+
+    def write_linkedin_post(self, lead_magnet: dict, research: dict, comment_trigger: str = None,
+                            context: str = None) -> dict:
         """
         Write a viral LinkedIn post to distribute the lead magnet.
         Uses PASTOR framework.
         """
         trigger = comment_trigger or lead_magnet.get("comment_trigger", "GUÍA")
 
-        prompt = f"""Eres el Growth Copywriter de FastStrat. Escribe un POST VIRAL para LinkedIn.
+        prompt = self._linkedin_post_prompt(trigger)
 
-LEAD MAGNET A PROMOCIONAR:
-{json.dumps(lead_magnet, indent=2, ensure_ascii=False)[:2000]}
+        try:
+            response = self.ai_client.generate(prompt, max_tokens=1500, task="linkedin_post",
+                                               task_class="standard", validate=is_valid_json,
+                                               prefix=context or self.build_context(lead_magnet, research))
+            clean = response.strip()
+            if clean.startswith("```"):
+                clean = clean.split("```")[1]
+                if clean.startswith("json"):
+                    clean = clean[4:]
+            return json.loads(clean.strip())
+        except Exception as e:
+            logger.error(f"LinkedIn post error: {e}")
+            return {"error": str(e)}
 
-RESEARCH/DATA POINTS:
-{json.dumps(research, indent=2, ensure_ascii=False)[:1500]}
+    def _linkedin_post_prompt(self, trigger: str) -> str:
+        """Instructions for a PASTOR LinkedIn post about the lead magnet in the prefix."""
+        return f"""Eres el Growth Copywriter de FastStrat. Escribe un POST VIRAL para LinkedIn
+para el lead magnet de arriba.
 
 COMMENT TRIGGER: {trigger}
 
-{FASTSTRAT_CONTEXT}
-
 FRAMEWORK PASTOR:
 - Problem: Identifica el dolor con dato impactante
 - Agitate: Amplifica las consecuencias de no actuar
@@ -75,19 +135,59 @@ Responde en JSON:
     "follow_up_comment": "comentario para poner después de publicar para boost del algoritmo"
 }}"""
 
+    def write_linkedin_post_variants(self, lead_magnet: dict, research: dict, n: int = 3,
+                                     comment_trigger: str = None, context: str = None,
+                                     similarity_threshold: float = 0.7) -> dict:
+        """
+        Write `n` LinkedIn post variants for A/B testing hooks, in one call.
+        Near-duplicates (similar text or hook) are dropped and the rest are
+        ranked by score_post(), best first.
+        """
+        trigger = comment_trigger or lead_magnet.get("comment_trigger", "GUÍA")
+
         try:
-            response = self.ai_client.generate(prompt, max_tokens=1500)
-            clean = response.strip()
-            if clean.startswith("```"):
-                clean = clean.split("```")[1]
-                if clean.startswith("json"):
-                    clean = clean[4:]
-            return json.loads(clean.strip())
+            responses = self.ai_client.generate_variants(
+                self._linkedin_post_prompt(trigger), n=n, max_tokens=1500, task="linkedin_post",
+                task_class="standard", validate=is_valid_json,
+                prefix=context or self.build_context(lead_magnet, research)
+            )
         except Exception as e:
-            logger.error(f"LinkedIn post error: {e}")
+            logger.error(f"LinkedIn post variants error: {e}")
             return {"error": str(e)}
 
-    def write_carousel_intro_post(self, carousel: dict) -> dict:
+        variants = []
+        duplicates = 0
+        for response in responses:
+            post = parse_json_response(response)
+            if not isinstance(post, dict) or not post.get("post_text"):
+                continue
+            fingerprint = shingles(post["post_text"])
+            hook = set(tokenize(post.get("hook", "")))
+            if any(jaccard(fingerprint, other["fingerprint"]) >= similarity_threshold
+                   or (hook and jaccard(hook, other["hook_terms"]) >= similarity_threshold)
+                   for other in variants):
+                duplicates += 1
+                continue
+            variants.append({"post": post, "fingerprint": fingerprint, "hook_terms": hook})
+
+        ranked = sorted(
+            (dict(v["post"], score=score_post(v["post"], trigger)) for v in variants),
+            key=lambda post: post["score"], reverse=True
+        )
+        if not ranked:
+            return {"error": "No usable post variants"}
+        return {"variants": ranked, "duplicates_dropped": duplicates}
+
+    def write_best_post(self, lead_magnet: dict, research: dict, n: int = 3, comment_trigger: str = None,
+                        context: str = None) -> dict:
+        """Best-ranked post variant, with the other variants under "alternatives"."""
+        result = self.write_linkedin_post_variants(lead_magnet, research, n, comment_trigger, context=context)
+        if result.get("error"):
+            return result
+        best, *alternatives = result["variants"]
+        return dict(best, alternatives=alternatives, duplicates_dropped=result["duplicates_dropped"])
+
+    def write_carousel_intro_post(self, carousel: dict, context: str = None) -> dict:
         """
         Write a post specifically for carousel distribution.
         Different approach - teases the content.
@@ -123,7 +223,8 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=800)
+            response = self.ai_client.generate(prompt, max_tokens=800, task="carousel_intro_post",
+                                               task_class="light", validate=is_valid_json, prefix=context)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -134,7 +235,7 @@ Responde en JSON:
             logger.error(f"Carousel intro post error: {e}")
             return {"error": str(e)}
 
-    def write_dm_response(self, lead_magnet_title: str, download_link: str = "[LINK]") -> dict:
+    def write_dm_response(self, lead_magnet_title: str, download_link: str = "[LINK]", context: str = None) -> dict:
         """
         Write the DM response to send when someone comments.
         """
@@ -162,7 +263,8 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=600)
+            response = self.ai_client.generate(prompt, max_tokens=600, task="dm_response",
+                                               task_class="light", validate=is_valid_json, prefix=context)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -173,16 +275,11 @@ Responde en JSON:
             logger.error(f"DM response error: {e}")
             return {"error": str(e)}
 
-    def write_email_sequence(self, lead_magnet: dict) -> dict:
+    def write_email_sequence(self, lead_magnet: dict, context: str = None) -> dict:
         """
         Write a 3-email nurture sequence after lead magnet download.
         """
-        prompt = f"""Escribe una SECUENCIA DE 3 EMAILS para nurturing después de descargar el lead magnet.
-
-LEAD MAGNET:
-{json.dumps(lead_magnet, indent=2, ensure_ascii=False)[:1500]}
-
-{FASTSTRAT_CONTEXT}
+        prompt = f"""Escribe una SECUENCIA DE 3 EMAILS para nurturing después de descargar el lead magnet de arriba.
 
 SECUENCIA:
 1. Email 1 (inmediato): Entrega + quick win
@@ -212,7 +309,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=2500)
+            response = self.ai_client.generate(prompt, max_tokens=2500, task="email_sequence",
+                                               task_class="standard", validate=is_valid_json,
+                                               prefix=context or self.build_context(lead_magnet))
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -223,16 +322,11 @@ Responde en JSON:
             logger.error(f"Email sequence error: {e}")
             return {"error": str(e)}
 
-    def write_landing_page_copy(self, lead_magnet: dict) -> dict:
+    def write_landing_page_copy(self, lead_magnet: dict, context: str = None) -> dict:
         """
         Write copy for a lead magnet landing page.
         """
-        prompt = f"""Escribe el COPY para una landing page del lead magnet.
-
-LEAD MAGNET:
-{json.dumps(lead_magnet, indent=2, ensure_ascii=False)[:2000]}
-
-{FASTSTRAT_CONTEXT}
+        prompt = f"""Escribe el COPY para una landing page del lead magnet de arriba.
 
 SECCIONES NECESARIAS:
 1. Headline principal
@@ -257,7 +351,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=1500)
+            response = self.ai_client.generate(prompt, max_tokens=1500, task="landing_page_copy",
+                                               task_class="standard", validate=is_valid_json,
+                                               prefix=context or self.build_context(lead_magnet))
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -267,3 +363,42 @@ Responde en JSON:
         except Exception as e:
             logger.error(f"Landing page copy error: {e}")
             return {"error": str(e)}
+
+    def write_distribution_bundle(self, lead_magnet: dict, research: dict = None, comment_trigger: str = None,
+                                  download_link: str = "[LINK]", post_variants: int = 1) -> dict:
+        """
+        Write every distribution asset for a lead magnet concurrently:
+        LinkedIn post, carousel intro post (carousels only), DM response,
+        email sequence and landing page copy.
+
+        All calls share one prompt prefix (FastStrat context, lead magnet and
+        research). A one-token call writes it to the provider's cache, then
+        every asset runs at once and reads it from there, so the bundle takes
+        about as long as its slowest piece.
+        With `post_variants` > 1 the LinkedIn post comes with ranked
+        alternatives (see write_best_post()).
+        """
+        started = time.time()
+        context = self.build_context(lead_magnet, research)
+        title = next((v for k, v in lead_magnet.items() if k.endswith("_title") and v), "")
+
+        assets = {
+            "linkedin_post": lambda: self.write_linkedin_post(lead_magnet, research, comment_trigger, context=context),
+            "dm_response": lambda: self.write_dm_response(title, download_link, context=context),
+            "email_sequence": lambda: self.write_email_sequence(lead_magnet, context=context),
+            "landing_page": lambda: self.write_landing_page_copy(lead_magnet, context=context)
+        }
+        if post_variants > 1:
+            assets["linkedin_post"] = lambda: self.write_best_post(lead_magnet, research, post_variants,
+                                                                   comment_trigger, context=context)
+        if lead_magnet.get("slides"):
+            assets["carousel_intro_post"] = lambda: self.write_carousel_intro_post(lead_magnet, context=context)
+
+        self.ai_client.warm_prefix(context)
+        with ThreadPoolExecutor(max_workers=len(assets)) as pool:
+            futures = {name: pool.submit(bind_job(write)) for name, write in assets.items()}
+            bundle = {name: future.result() for name, future in futures.items()}
+
+        bundle["seconds"] = round(time.time() - started, 2)
+        logger.info(f"Distribution bundle ({len(assets)} assets) written in {bundle['seconds']}s")
+        return bundle
@@ -0,0 +1,156 @@
+"""
+Idempotent /generate submissions.
+A client retry after a proxy timeout carries the same idempotency key (the
+Idempotency-Key header, or optionally one derived from the normalized
+request body); within the window it attaches to the job already running
+for that key, or gets its stored result, instead of starting a new
+four-agent run. The claims live in SQLite so every web node on the machine
+shares them; a claim whose owning process died is dropped on sight, so a
+killed worker doesn't block retries until the window ends.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Request fields that don't change what is generated
+IGNORED_FIELDS = ("job_id", "idempotency_key")
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()
+                if key not in IGNORED_FIELDS and item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def _alive(pid: int) -> bool:
+    """True when a process with `pid` runs on this machine."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def derive_key(data: dict) -> str:
+    """Key of a request body: equal for bodies differing only in case, whitespace, empty fields or job_id."""
+    payload = json.dumps(_normalize(data), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class IdempotencyStore:
+    """
+    SQLite claims of idempotency keys: key -> job id, the pid of the
+    process running it (None for queued jobs) and, once the job succeeded,
+    its result. Claims older than `window_seconds` are ignored.
+    """
+
+    def __init__(self, path: Path, window_seconds: float = 600):
+        self.path = Path(path)
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    key TEXT PRIMARY KEY,
+                    job_id TEXT NOT NULL,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    owner_pid INTEGER
+                )
+            """)
+            columns = [row[1] for row in db.execute("PRAGMA table_info(idempotency_keys)")]
+            if "owner_pid" not in columns:
+                db.execute("ALTER TABLE idempotency_keys ADD COLUMN owner_pid INTEGER")
+
+    @contextmanager
+    def _db(self):
+        """Connection in an IMMEDIATE transaction that commits on success and always closes."""
+        with self._lock:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            finally:
+                db.close()
+
+    def claim(self, key: str, job_id: str, owner_pid: int = None) -> Optional[dict]:
+        """
+        Claim `key` for `job_id`, run by process `owner_pid`. Returns None
+        when claimed, or the earlier live claim {key, job_id, result} when
+        the key is a duplicate.
+        """
+        now = time.time()
+        with self._db() as db:
+            db.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (now - self.window_seconds,))
+            existing = self._claim(db, key)
+            if existing:
+                return existing
+            db.execute("INSERT INTO idempotency_keys (key, job_id, created_at, owner_pid) VALUES (?, ?, ?, ?)",
+                       (key, job_id, now, owner_pid))
+        return None
+
+    def complete(self, key: str, job_id: str, result: dict):
+        """Store the result of a successful job for its duplicates."""
+        with self._db() as db:
+            db.execute("UPDATE idempotency_keys SET result = ? WHERE key = ? AND job_id = ?",
+                       (json.dumps(result, ensure_ascii=False), key, job_id))
+
+    def release(self, key: str, job_id: str):
+        """Drop the claim of a job that failed or was cancelled, so the next submission runs again."""
+        with self._db() as db:
+            db.execute("DELETE FROM idempotency_keys WHERE key = ? AND job_id = ?", (key, job_id))
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._db() as db:
+            return self._claim(db, key)
+
+    def wait(self, key: str, job_id: str, timeout: float, interval: float = 0.5) -> Optional[dict]:
+        """
+        Wait for the job holding `key` to finish: its result, or None when
+        it failed (claim released) or did not finish within `timeout`.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            claim = self.get(key)
+            if not claim or claim["job_id"] != job_id:
+                return None
+            if claim["result"] is not None:
+                return claim["result"]
+            time.sleep(interval)
+        return None
+
+    def _claim(self, db, key: str) -> Optional[dict]:
+        row = db.execute(
+            "SELECT key, job_id, result, owner_pid FROM idempotency_keys WHERE key = ? AND created_at >= ?",
+            (key, time.time() - self.window_seconds)
+        ).fetchone()
+        if not row:
+            return None
+        if row[2] is None and row[3] and not _alive(row[3]):
+            # The process running the job was killed before finishing or releasing it
+            logger.warning(f"Dropping claim of {key} by dead process {row[3]} (job {row[1]})")
+            db.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+            return None
+        return {"key": row[0], "job_id": row[1], "result": json.loads(row[2]) if row[2] else None}
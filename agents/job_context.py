@@ -0,0 +1,55 @@
+"""
+Per-job context shared by the agents.
+Carries information about the running production (route, etc.) so that
+low-level helpers like AIClient can adapt without changing every signature.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+_local = threading.local()
+
+
+class JobContext:
+    """State of one production run, visible to every agent call made inside it."""
+
+    def __init__(self, route: str = None, research_mode: str = None, job_id: str = None, cancel_token=None,
+                 budget=None, profile=frozenset()):
+        self.route = route
+        self.research_mode = research_mode
+        self.job_id = job_id
+        # agents.cancellation.CancelToken, checked before and during provider calls
+        self.cancel_token = cancel_token
+        # agents.budget.JobBudget, splitting the deadline into stage budgets
+        self.budget = budget
+        # Cuts of the degraded profile the job runs under (agents.load_shedder)
+        self.profile = profile
+        # Upper bound of the LLM spend of this job, from pre-flight estimates
+        self.estimated_cost_usd = 0.0
+
+
+def current_job() -> Optional[JobContext]:
+    """Return the job running on this thread, if any."""
+    return getattr(_local, "job", None)
+
+
+@contextmanager
+def job_scope(job: JobContext):
+    """Make `job` the current job for the duration of the block."""
+    previous = current_job()
+    _local.job = job
+    try:
+        yield job
+    finally:
+        _local.job = previous
+
+
+def bind_job(fn: Callable) -> Callable:
+    """Wrap `fn` so it runs under the caller's job, e.g. on a worker thread."""
+    job = current_job()
+
+    def run(*args, **kwargs):
+        with job_scope(job):
+            return fn(*args, **kwargs)
+    return run
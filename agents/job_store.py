@@ -0,0 +1,88 @@
+"""
+Stored jobs.
+Keeps the request and the outputs of every finished /generate job so a
+lead magnet can later be edited and partially regenerated.
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """SQLite store of job requests and outputs, by job id."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    route TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    outputs TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _db(self):
+        """Serialized connection that commits on success and always closes."""
+        with self._lock:
+            db = sqlite3.connect(self.path)
+            try:
+                yield db
+                db.commit()
+            finally:
+                db.close()
+
+    def save(self, job_id: str, route: str, request: dict, outputs: dict):
+        """Store a job, replacing any earlier job with the same id."""
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO jobs (id, route, request, outputs, version, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?)",
+                (job_id, route, json.dumps(request, ensure_ascii=False), json.dumps(outputs, ensure_ascii=False),
+                 now, now)
+            )
+
+    def update(self, job_id: str, request: dict, outputs: dict) -> int:
+        """Replace the request and outputs of a stored job; returns its new version."""
+        with self._db() as db:
+            db.execute(
+                "UPDATE jobs SET request = ?, outputs = ?, version = version + 1, updated_at = ? WHERE id = ?",
+                (json.dumps(request, ensure_ascii=False), json.dumps(outputs, ensure_ascii=False), time.time(), job_id)
+            )
+            row = db.execute("SELECT version FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """A stored job: id, route, request, outputs, version, created_at, updated_at."""
+        with self._db() as db:
+            row = db.execute(
+                "SELECT id, route, request, outputs, version, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "route": row[1],
+            "request": json.loads(row[2]),
+            "outputs": json.loads(row[3]),
+            "version": row[4],
+            "created_at": row[5],
+            "updated_at": row[6]
+        }
@@ -0,0 +1,121 @@
+"""
+Incremental JSON field scanner.
+Watches a JSON object arrive chunk by chunk (streamed model output) and
+reports each top-level field as soon as its value is complete, so that
+downstream stages can start before the whole document is written.
+"""
+
+import json
+from typing import Callable
+
+
+class JsonFieldStream:
+    """
+    Feed streamed text with feed(). Scalars at the top level of the first
+    JSON object are reported through `on_field(key, value)`; `on_header(fields)`
+    fires once, when the first nested object or array starts, with the
+    scalar fields that lead the document (title, hook, subtitle...).
+
+    Text before the first "{" (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self, on_field: Callable[[str, object], None] = None,
+                 on_header: Callable[[dict], None] = None):
+        self.on_field = on_field
+        self.on_header = on_header
+        self.fields = {}
+        self.header_done = False
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"      # key | colon | value | comma (top-level object only)
+        self._token = []          # raw text of the top-level key or scalar being read
+        self._reading = None      # "key" | "string" | "scalar" | None
+        self._key = None
+
+    def feed(self, chunk: str):
+        """Consume the next piece of streamed text."""
+        for char in chunk:
+            if self.done:
+                return
+            self._consume(char)
+
+    def _consume(self, char: str):
+        if self._in_string:
+            if self._reading:
+                self._token.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._reading:
+                    self._finish_token()
+            return
+
+        if self._depth == 0:
+            if char == "{":
+                self._depth = 1
+            return
+
+        if self._depth > 1:
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+            return
+
+        # Top level of the object
+        if self._reading == "scalar":
+            if char in ",}":
+                self._finish_token()
+            else:
+                self._token.append(char)
+                return
+
+        if char == '"':
+            self._in_string = True
+            self._token = [char]
+            self._reading = "key" if self._expect == "key" else "string"
+        elif char == ":" and self._expect == "colon":
+            self._expect = "value"
+        elif char in "{[" and self._expect == "value":
+            self._depth += 1
+            self._expect = "comma"
+            self._header()
+        elif char == "," and self._expect == "comma":
+            self._expect = "key"
+        elif char == "}":
+            self.done = True
+            self._header()
+        elif self._expect == "value" and not char.isspace():
+            self._token = [char]
+            self._reading = "scalar"
+
+    def _finish_token(self):
+        raw = "".join(self._token).strip()
+        reading = self._reading
+        self._token, self._reading = [], None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        if reading == "key":
+            self._key = value
+            self._expect = "colon"
+            return
+
+        self._expect = "comma"
+        self.fields[self._key] = value
+        if self.on_field:
+            self.on_field(self._key, value)
+
+    def _header(self):
+        if not self.header_done:
+            self.header_done = True
+            if self.on_header:
+                self.on_header(dict(self.fields))
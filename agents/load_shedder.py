@@ -0,0 +1,183 @@
+"""
+Overload control.
+Watches the jobs in flight, the provider calls in flight and the recent
+provider error rate, and picks a service mode for each new job:
+- normal: full four-agent treatment
+- degraded: the job runs with the cuts of Settings.DEGRADED_PROFILE
+- shedding: the job is rejected up front with a Retry-After hint
+"""
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from config.settings import Settings
+from .cancellation import Cancelled
+from .concurrency import limits, is_throttling, is_timeout
+from .job_context import current_job
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ("normal", "degraded", "shedding")
+
+# Cuts a degraded profile can declare
+CUTS = {
+    "cached_research": "no live or simulated searches, research from cache and model knowledge",
+    "light_model": "every LLM call uses the light model",
+    "library_visuals": "visuals from the library instead of fresh images",
+    "no_extras": "single post, no variants or distribution bundle"
+}
+
+
+class ServiceOverloaded(Exception):
+    """Raised when work is skipped because the service is overloaded."""
+
+
+class ProviderCall:
+    """
+    Outcome of one tracked provider call; fail() marks a soft failure
+    (e.g. HTTP 5xx), throttled() a rate limit (HTTP 429). `units` is the
+    size of the response (e.g. output tokens / 100) for latency comparisons.
+    """
+
+    def __init__(self):
+        self.ok = True
+        self.outcome = "ok"
+        self.units = 1
+
+    def fail(self, outcome: str = "failed"):
+        self.ok = False
+        self.outcome = outcome
+
+    def throttled(self):
+        self.fail("throttled")
+
+
+class OverloadController:
+    """
+    Decides the service mode from load signals. Provider calls report
+    through provider_call(); the error rate covers the last `window_seconds`
+    and only counts once `min_calls` calls were seen.
+    """
+
+    def __init__(self, degrade_jobs: int = None, max_jobs: int = None, max_inflight_calls: int = None,
+                 degrade_error_rate: float = None, shed_error_rate: float = None,
+                 window_seconds: float = 60, min_calls: int = 10):
+        self.degrade_jobs = degrade_jobs or Settings.OVERLOAD_DEGRADE_JOBS
+        self.max_jobs = max_jobs or Settings.OVERLOAD_MAX_JOBS
+        self.max_inflight_calls = max_inflight_calls or Settings.OVERLOAD_MAX_INFLIGHT_CALLS
+        self.degrade_error_rate = degrade_error_rate or Settings.OVERLOAD_DEGRADE_ERROR_RATE
+        self.shed_error_rate = shed_error_rate or Settings.OVERLOAD_SHED_ERROR_RATE
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.inflight = 0
+        self.outcomes = deque()           # (finished_at, ok)
+        self.job_seconds = None           # moving average of job duration
+        self.mode = "normal"
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def provider_call(self, kind: str, endpoint: str = None):
+        """
+        Track one call to a provider (chat, image, search) while the block
+        runs, within the adaptive concurrency limit of `endpoint` (default: `kind`).
+        """
+        call = ProviderCall()
+        with limits.slot(endpoint or kind, call):
+            with self._lock:
+                self.inflight += 1
+                metrics.set("overload.inflight_calls", self.inflight)
+            try:
+                yield call
+            except Cancelled:
+                # Our own doing, not the provider's: no error, and no latency sample
+                call.outcome = "cancelled"
+                raise
+            except Exception as e:
+                if call.ok:
+                    call.fail("throttled" if is_throttling(e) else "timeout" if is_timeout(e) else "failed")
+                raise
+            finally:
+                with self._lock:
+                    self.inflight -= 1
+                    metrics.set("overload.inflight_calls", self.inflight)
+                if call.outcome == "cancelled":
+                    metrics.incr(f"provider_cancelled.{kind}")
+                else:
+                    self._record(kind, call.ok)
+
+    def _record(self, kind: str, ok: bool):
+        now = time.time()
+        with self._lock:
+            self.outcomes.append((now, ok))
+        if not ok:
+            metrics.incr(f"provider_errors.{kind}")
+
+    def error_rate(self) -> float:
+        """Share of failed provider calls in the window (0 until there are enough calls)."""
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            while self.outcomes and self.outcomes[0][0] < cutoff:
+                self.outcomes.popleft()
+            calls = len(self.outcomes)
+            failed = sum(1 for _, ok in self.outcomes if not ok)
+        return failed / calls if calls >= self.min_calls else 0.0
+
+    def current_mode(self, queue_depth: int) -> str:
+        """Mode for a new job arriving with `queue_depth` jobs already running."""
+        errors = self.error_rate()
+        if queue_depth >= self.max_jobs or errors >= self.shed_error_rate:
+            mode = "shedding"
+        elif (queue_depth >= self.degrade_jobs or self.inflight >= self.max_inflight_calls
+              or errors >= self.degrade_error_rate):
+            mode = "degraded"
+        else:
+            mode = "normal"
+
+        if mode != self.mode:
+            logger.warning(f"Service mode {self.mode} -> {mode} (jobs={queue_depth}, "
+                           f"calls={self.inflight}, error_rate={errors:.2f})")
+            metrics.incr("overload.mode_changes")
+            self.mode = mode
+        metrics.set("overload.mode", mode)
+        metrics.set("overload.error_rate", round(errors, 3))
+        return mode
+
+    def admit(self, queue_depth: int) -> tuple:
+        """
+        (profile, retry_after) for a new job. `profile` is the set of cuts
+        to apply (empty in normal mode); None means reject, retrying after
+        `retry_after` seconds.
+        """
+        mode = self.current_mode(queue_depth)
+        if mode == "shedding":
+            metrics.incr("overload.jobs_rejected")
+            return None, self.retry_after(queue_depth)
+        if mode == "degraded":
+            metrics.incr("overload.jobs_degraded")
+            return frozenset(Settings.DEGRADED_PROFILE), 0
+        return frozenset(), 0
+
+    def retry_after(self, queue_depth: int) -> int:
+        """Seconds until a slot is likely free: the jobs over the limit times the average job duration."""
+        if not self.job_seconds or queue_depth < self.max_jobs:
+            return Settings.OVERLOAD_RETRY_AFTER
+        excess = queue_depth - self.max_jobs + 1
+        return max(1, math.ceil(self.job_seconds * excess / self.max_jobs))
+
+    def job_finished(self, seconds: float):
+        """Feed the duration of a finished job into the Retry-After estimate."""
+        with self._lock:
+            self.job_seconds = seconds if self.job_seconds is None else 0.8 * self.job_seconds + 0.2 * seconds
+
+
+def is_cut(cut: str) -> bool:
+    """True when the current job runs under a degraded profile that includes `cut`."""
+    job = current_job()
+    return bool(job and cut in (getattr(job, "profile", None) or ()))
+
+
+overload = OverloadController()
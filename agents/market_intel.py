@@ -10,9 +10,38 @@ import logging
 from datetime import datetime
 from typing import Optional
 import requests
+from .ai_client import is_valid_json
+from .single_flight import SingleFlight, request_key
+from .context_packer import pack_search_results, resolve_references
+from .job_context import current_job
+from .cancellation import check_cancelled
+from .budget import call_timeout
+from .load_shedder import is_cut, overload
+from .cassette import cassette
+from config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+RESEARCH_MODES = ("inline", "fused", "per_query")
+
+TREND_SCAN_QUERIES = [
+    "marketing trends 2026 B2B",
+    "LinkedIn viral posts marketing enero 2026",
+    "AI marketing automation trends"
+]
+TREND_SCAN_FOCUS = "marketing B2B trends LinkedIn AI automation"
+
+NO_SEARCH_CONTEXT = """(Sin resultados de búsqueda en vivo. Usa tu conocimiento de fuentes reconocidas
+como HubSpot, Gartner, Forbes, McKinsey y LinkedIn, con datos plausibles y actuales (2025-2026).
+Cuando no tengas id de referencia, indica la URL de la fuente en "url" en lugar de "ref".)"""
+
+
+def valid_trends(trending) -> list:
+    """The trends of a scan response that are objects with a topic."""
+    if not isinstance(trending, list):
+        return []
+    return [trend for trend in trending if isinstance(trend, dict) and str(trend.get("topic") or "").strip()]
+
 
 class MarketIntelAgent:
     """
@@ -27,17 +56,40 @@ class MarketIntelAgent:
     def __init__(self, ai_client):
         self.ai_client = ai_client
         self.serper_api_key = os.getenv("SERPER_API_KEY", "")
+        self.flights = SingleFlight()
+        for route, mode in Settings.SIMULATED_SEARCH_ROUTE_MODES.items():
+            if mode not in RESEARCH_MODES:
+                logger.warning(f"Unknown research mode '{mode}' for {route} in SIMULATED_SEARCH_ROUTE_MODES "
+                               f"(expected one of {RESEARCH_MODES}); using the default")
 
     def search_web(self, query: str, num_results: int = 5) -> list:
         """
         Search the web using Serper API (Google Search).
         Returns list of results with title, snippet, link.
+        Identical concurrent searches share one request.
         """
+        key = request_key("search", query, num_results)
+        return self.flights.do(key, lambda: self._search_web(query, num_results))
+
+    def _search_web(self, query: str, num_results: int) -> list:
+        """Uncoalesced search; see search_web()."""
+        check_cancelled("search")
+        if is_cut("cached_research"):
+            return []
         if not self.serper_api_key:
             logger.warning("SERPER_API_KEY not configured, using AI for simulated search")
             return self._ai_simulated_search(query)
 
         try:
+            return cassette.call("search", {"q": query, "num": num_results},
+                                 lambda: self._serper_search(query, num_results))
+        except Exception as e:
+            logger.error(f"Search error: {e}")
+            return self._ai_simulated_search(query)
+
+    def _serper_search(self, query: str, num_results: int) -> list:
+        """One Serper request; raises on API errors."""
+        with overload.provider_call("search") as call:
             response = requests.post(
                 "https://google.serper.dev/search",
                 headers={
@@ -49,27 +101,101 @@ class MarketIntelAgent:
                     "num": num_results,
                     "gl": "us",
                     "hl": "es"
-                }
+                },
+                timeout=call_timeout(Settings.SEARCH_TIMEOUT_SECONDS)
             )
+            if response.status_code != 200:
+                if response.status_code == 429:
+                    call.throttled()
+                else:
+                    call.fail()
+                raise RuntimeError(f"Serper API error: {response.status_code}")
+
+        data = response.json()
+        results = []
+        for item in data.get("organic", [])[:num_results]:
+            results.append({
+                "title": item.get("title", ""),
+                "snippet": item.get("snippet", ""),
+                "link": item.get("link", ""),
+                "source": "Google Search"
+            })
+        return results
+
+    def research_mode(self) -> str:
+        """
+        How to research without a search key, for the current job:
+        - inline: no simulated searches, the analysis prompt uses model knowledge (1 LLM call)
+        - fused: all queries simulated in one structured call
+        - per_query: one simulated search call per query (legacy)
+        """
+        job = current_job()
+        mode = getattr(job, "research_mode", None) if job else None
+        if not mode and job and job.route and Settings.SIMULATED_SEARCH_ROUTE_MODES.get(job.route) in RESEARCH_MODES:
+            mode = Settings.SIMULATED_SEARCH_ROUTE_MODES[job.route]
+        mode = mode or Settings.SIMULATED_SEARCH_MODE
+        return mode if mode in RESEARCH_MODES else "inline"
+
+    def search_many(self, queries: list, num_results: int = 3) -> list:
+        """
+        Run several searches and return all results in one list.
+        Without SERPER_API_KEY the research mode decides how (or whether)
+        results are simulated, so research needs as few LLM calls as possible.
+        """
+        if is_cut("cached_research"):
+            return []
+        if not self.serper_api_key:
+            mode = self.research_mode()
+            if mode == "inline":
+                return []
+            if mode == "fused":
+                return self._ai_simulated_search_batch(queries, num_results)
+
+        all_results = []
+        for query in queries:
+            all_results.extend(self.search_web(query, num_results=num_results))
+        return all_results
+
+    def _search_context(self, results: list, topic: str) -> tuple:
+        """Packed search context for a prompt, or model-knowledge instructions when empty."""
+        packed, refs = pack_search_results(results, topic)
+        return (packed or NO_SEARCH_CONTEXT), refs
+
+    def _ai_simulated_search_batch(self, queries: list, num_results: int = 3) -> list:
+        """Fallback: simulate results for every query in a single structured AI call."""
+        query_list = "\n".join(f"{i}. {query}" for i, query in enumerate(queries, 1))
+        prompt = f"""Actúa como un motor de búsqueda. Para CADA una de estas queries genera {num_results} resultados REALISTAS
+basados en fuentes conocidas (HubSpot, Gartner, Forbes, LinkedIn, etc).
+Los datos deben ser plausibles y actuales (2025-2026).
 
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                for item in data.get("organic", [])[:num_results]:
-                    results.append({
-                        "title": item.get("title", ""),
-                        "snippet": item.get("snippet", ""),
-                        "link": item.get("link", ""),
-                        "source": "Google Search"
-                    })
-                return results
-            else:
-                logger.error(f"Serper API error: {response.status_code}")
-                return self._ai_simulated_search(query)
+QUERIES:
+{query_list}
 
+Responde en JSON (sin markdown):
+[
+    {{"query": "query original", "title": "...", "snippet": "...", "link": "https://...", "source": "..."}},
+    ...
+]"""
+
+        try:
+            response = self.ai_client.generate(prompt, max_tokens=500 * len(queries), task="simulated_search_batch",
+                                               task_class="light", validate=is_valid_json)
+            clean = response.strip()
+            if clean.startswith("```"):
+                clean = clean.split("```")[1]
+                if clean.startswith("json"):
+                    clean = clean[4:]
+            results = json.loads(clean.strip())
         except Exception as e:
-            logger.error(f"Search error: {e}")
-            return self._ai_simulated_search(query)
+            logger.error(f"Batch simulated search error: {e}")
+            return []
+        # Some models wrap the array in an object ({"results": [...]})
+        if isinstance(results, dict):
+            results = next((value for value in results.values() if isinstance(value, list)), [])
+        if not isinstance(results, list):
+            logger.error(f"Batch simulated search returned {type(results).__name__}, expected a list")
+            return []
+        return [item for item in results if isinstance(item, dict)]
 
     def _ai_simulated_search(self, query: str) -> list:
         """Fallback: Use AI to generate realistic search results based on its knowledge."""
@@ -85,7 +211,8 @@ Responde en JSON (sin markdown):
 ]"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=800)
+            response = self.ai_client.generate(prompt, max_tokens=800, task="simulated_search",
+                                               task_class="light", validate=is_valid_json)
             # Parse JSON from response
             clean = response.strip()
             if clean.startswith("```"):
@@ -93,13 +220,17 @@ Responde en JSON (sin markdown):
                 if clean.startswith("json"):
                     clean = clean[4:]
             return json.loads(clean.strip())
-        except:
+        except Exception:
             return [{"title": "Error en búsqueda", "snippet": query, "link": "#", "source": "Fallback"}]
 
-    def research_trend(self, topic: str) -> dict:
+    def research_trend(self, topic: str, prior_results: list = None) -> dict:
         """
         Research a specific trend and gather data points.
         Returns structured research with sources.
+
+        `prior_results` are search results already gathered for this topic
+        (e.g. by the trend scan); they are reused and only the statistics
+        query is searched again.
         """
         # Search queries
         queries = [
@@ -107,19 +238,19 @@ Responde en JSON (sin markdown):
             f"{topic} tendencias marketing B2B",
             f"{topic} LinkedIn viral posts"
         ]
+        if prior_results:
+            queries = queries[:1]
 
-        all_results = []
-        for query in queries:
-            results = self.search_web(query, num_results=3)
-            all_results.extend(results)
+        all_results = list(prior_results or []) + self.search_many(queries, num_results=3)
+        packed, refs = self._search_context(all_results, topic)
 
         # Analyze with AI
         research_prompt = f"""Eres el Agente de Inteligencia de Mercado de FastStrat.
 
 TEMA A INVESTIGAR: {topic}
 
-RESULTADOS DE BÚSQUEDA:
-{json.dumps(all_results, indent=2, ensure_ascii=False)}
+RESULTADOS DE BÚSQUEDA (cita cada dato con su id de referencia, ej. S1):
+{packed}
 
 CONTEXTO FASTSTRAT:
 - Vendemos automatización de marketing estratégico (BrandOS + Growth Engine)
@@ -130,9 +261,9 @@ ANALIZA y responde en JSON:
 {{
     "trend_summary": "Resumen de la tendencia en 2-3 oraciones",
     "data_points": [
-        {{"stat": "dato concreto con número", "source": "fuente", "url": "link"}},
-        {{"stat": "dato concreto con número", "source": "fuente", "url": "link"}},
-        {{"stat": "dato concreto con número", "source": "fuente", "url": "link"}}
+        {{"stat": "dato concreto con número", "source": "fuente", "ref": "S1"}},
+        {{"stat": "dato concreto con número", "source": "fuente", "ref": "S2"}},
+        {{"stat": "dato concreto con número", "source": "fuente", "ref": "S3"}}
     ],
     "strategic_gap": "Por qué FastStrat es la única solución sostenible para este problema/tendencia",
     "lead_magnet_angle": "Ángulo recomendado para el Lead Magnet",
@@ -141,13 +272,14 @@ ANALIZA y responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(research_prompt, max_tokens=1000)
+            response = self.ai_client.generate(research_prompt, max_tokens=1000, task="trend_research",
+                                               task_class="standard", validate=is_valid_json)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
                 if clean.startswith("json"):
                     clean = clean[4:]
-            return json.loads(clean.strip())
+            return resolve_references(json.loads(clean.strip()), refs)
         except Exception as e:
             logger.error(f"Research analysis error: {e}")
             return {
@@ -164,22 +296,14 @@ ANALIZA y responde en JSON:
         Scan for current trending topics in marketing/business.
         Returns list of trending topics with context.
         """
-        queries = [
-            "marketing trends 2026 B2B",
-            "LinkedIn viral posts marketing enero 2026",
-            "AI marketing automation trends"
-        ]
-
-        all_results = []
-        for query in queries:
-            results = self.search_web(query, num_results=3)
-            all_results.extend(results)
+        all_results = self.search_many(TREND_SCAN_QUERIES, num_results=3)
+        packed, _ = self._search_context(all_results, TREND_SCAN_FOCUS)
 
         # Extract topics with AI
         prompt = f"""Basado en estos resultados de búsqueda actuales, identifica 5 temas trending para crear Lead Magnets de marketing:
 
 RESULTADOS:
-{json.dumps(all_results, indent=2, ensure_ascii=False)}
+{packed}
 
 Para cada tema, evalúa:
 1. Relevancia para PyMEs/Agencias
@@ -199,30 +323,116 @@ Responde en JSON:
 ]"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=1200)
+            response = self.ai_client.generate(prompt, max_tokens=1200, task="trending_topics",
+                                               task_class="standard", validate=is_valid_json)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
                 if clean.startswith("json"):
                     clean = clean[4:]
-            return json.loads(clean.strip())
+            return valid_trends(json.loads(clean.strip()))
         except Exception as e:
             logger.error(f"Trending topics error: {e}")
             return []
 
+    def scan_and_research_top_trend(self, min_data_points: int = 2) -> dict:
+        """
+        Scan trends and research the top one in a single pass.
+        The scan's search results are reused for the research, and extra
+        targeted searches are issued only when the evidence is thin.
+        Returns {"trending": [...], "research": {...}}.
+        """
+        all_results = self.search_many(TREND_SCAN_QUERIES, num_results=3)
+        packed, refs = self._search_context(all_results, TREND_SCAN_FOCUS)
+
+        prompt = f"""Eres el Agente de Inteligencia de Mercado de FastStrat.
+
+Basado en estos resultados de búsqueda actuales, identifica 5 temas trending para crear Lead Magnets de marketing
+y luego investiga a fondo el tema #1 (el de mayor potencial).
+
+RESULTADOS DE BÚSQUEDA (cita cada dato con su id de referencia, ej. S1):
+{packed}
+
+Para cada tema, evalúa:
+1. Relevancia para PyMEs/Agencias
+2. Conexión con "marketing estratégico" (el core de FastStrat)
+3. Potencial viral en LinkedIn
+
+CONTEXTO FASTSTRAT:
+- Vendemos automatización de marketing estratégico (BrandOS + Growth Engine)
+- Nuestro mensaje: "Marketing sin estrategia es solo ruido (Spaghetti Marketing)"
+- ICP: PyMEs y Agencias que no tienen departamento de marketing
+
+Responde en JSON:
+{{
+    "trending": [
+        {{
+            "topic": "nombre del tema",
+            "why_trending": "por qué está trending ahora",
+            "faststrat_angle": "cómo conectarlo con FastStrat",
+            "urgency": "alta/media/baja",
+            "suggested_format": "carousel/guía/checklist/reporte"
+        }},
+        ...
+    ],
+    "top_trend_research": {{
+        "trend_summary": "Resumen de la tendencia #1 en 2-3 oraciones",
+        "data_points": [
+            {{"stat": "dato concreto con número", "source": "fuente", "ref": "S1"}},
+            ...
+        ],
+        "strategic_gap": "Por qué FastStrat es la única solución sostenible para este problema/tendencia",
+        "lead_magnet_angle": "Ángulo recomendado para el Lead Magnet",
+        "viral_potential": "alto/medio/bajo",
+        "reasoning": "Por qué este tema tiene potencial viral"
+    }}
+}}
+
+Incluye en data_points SOLO datos respaldados por los resultados; si no hay suficientes, deja menos."""
+
+        try:
+            response = self.ai_client.generate(prompt, max_tokens=2000, task="trend_scan_research",
+                                               task_class="standard", validate=is_valid_json)
+            clean = response.strip()
+            if clean.startswith("```"):
+                clean = clean.split("```")[1]
+                if clean.startswith("json"):
+                    clean = clean[4:]
+            scan = resolve_references(json.loads(clean.strip()), refs)
+        except Exception as e:
+            logger.error(f"Trend scan and research error: {e}")
+            return {"trending": [], "research": None}
+
+        trending = valid_trends(scan.get("trending")) if isinstance(scan, dict) else []
+        if not trending:
+            # Malformed scan (a bare list, trends without a topic...): separate scan, research done by the caller
+            logger.warning("Fused trend scan returned no usable trends, falling back to a separate scan")
+            return {"trending": self.find_trending_topics(), "research": None}
+        research = scan.get("top_trend_research")
+        if not isinstance(research, dict):
+            research = None
+
+        thin = not research or len(research.get("data_points") or []) < min_data_points
+        if thin:
+            logger.info(f"Thin evidence for '{trending[0]['topic']}', running targeted research")
+            research = self.research_trend(trending[0]["topic"], prior_results=all_results)
+
+        return {"trending": trending, "research": research}
+
     def analyze_pain_point(self, pain_point: str) -> dict:
         """
         Deep analysis of a specific pain point.
         Used for Problem-Solver route.
         """
-        search_results = self.search_web(f"{pain_point} solución marketing PyMEs", num_results=5)
+        search_results = self.search_many([f"{pain_point} solución marketing PyMEs"], num_results=5)
+        packed, refs = self._search_context(search_results, pain_point)
 
         prompt = f"""Eres un analista de mercado experto. Analiza este dolor de cliente:
 
 DOLOR: {pain_point}
 
-RESULTADOS DE BÚSQUEDA:
-{json.dumps(search_results, indent=2, ensure_ascii=False)}
+RESULTADOS DE BÚSQUEDA (cita cada dato con su id de referencia, ej. S1):
+{packed}
 
 CONTEXTO: FastStrat vende automatización de marketing estratégico para PyMEs/Agencias.
 
@@ -235,7 +445,7 @@ Responde en JSON:
         "why_solutions_fail": "por qué las soluciones actuales no funcionan"
     }},
     "data_points": [
-        {{"stat": "estadística relevante", "source": "fuente", "url": "link"}}
+        {{"stat": "estadística relevante", "source": "fuente", "ref": "S1"}}
     ],
     "faststrat_solution": "cómo FastStrat resuelve esto de forma única",
     "lead_magnet_recommendation": {{
@@ -247,13 +457,14 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=1200)
+            response = self.ai_client.generate(prompt, max_tokens=1200, task="pain_point_analysis",
+                                               task_class="standard", validate=is_valid_json)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
                 if clean.startswith("json"):
                     clean = clean[4:]
-            return json.loads(clean.strip())
+            return resolve_references(json.loads(clean.strip()), refs)
         except Exception as e:
             logger.error(f"Pain point analysis error: {e}")
             return {"error": str(e)}
@@ -268,15 +479,13 @@ Responde en JSON:
             f"state of {industry} report gartner hubspot"
         ]
 
-        all_results = []
-        for query in queries:
-            results = self.search_web(query, num_results=3)
-            all_results.extend(results)
+        all_results = self.search_many(queries, num_results=3)
+        packed, refs = self._search_context(all_results, f"{industry} statistics benchmark report")
 
         prompt = f"""Recopila estadísticas reales de la industria de {industry} para crear un reporte de autoridad.
 
-RESULTADOS DE BÚSQUEDA:
-{json.dumps(all_results, indent=2, ensure_ascii=False)}
+RESULTADOS DE BÚSQUEDA (cita cada dato con su id de referencia, ej. S1):
+{packed}
 
 Extrae y organiza las estadísticas más impactantes. Cada stat DEBE tener fuente.
 
@@ -284,7 +493,7 @@ Responde en JSON:
 {{
     "report_title": "título sugerido para el reporte",
     "key_stats": [
-        {{"stat": "X% de empresas...", "source": "HubSpot 2025", "url": "...", "category": "categoría"}},
+        {{"stat": "X% de empresas...", "source": "HubSpot 2025", "ref": "S1", "category": "categoría"}},
         ...
     ],
     "trends": [
@@ -295,13 +504,14 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=1500)
+            response = self.ai_client.generate(prompt, max_tokens=1500, task="industry_stats",
+                                               task_class="standard", validate=is_valid_json)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
                 if clean.startswith("json"):
                     clean = clean[4:]
-            return json.loads(clean.strip())
+            return resolve_references(json.loads(clean.strip()), refs)
         except Exception as e:
             logger.error(f"Industry stats error: {e}")
             return {"error": str(e)}
@@ -0,0 +1,41 @@
+"""
+Process-wide counters and gauges for /api/metrics.
+"""
+
+import threading
+
+
+class Metrics:
+    """Thread-safe named counters (incr) and gauges (set)."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    def set(self, name: str, value):
+        with self._lock:
+            self._values[name] = value
+
+    def get(self, name: str, default=0):
+        with self._lock:
+            return self._values.get(name, default)
+
+    def snapshot(self) -> dict:
+        """All values, grouped by the prefix before the first dot."""
+        with self._lock:
+            values = dict(self._values)
+        grouped = {}
+        for name, value in sorted(values.items()):
+            group, _, key = name.partition(".")
+            if key:
+                grouped.setdefault(group, {})[key] = round(value, 6) if isinstance(value, float) else value
+            else:
+                grouped[group] = value
+        return grouped
+
+
+metrics = Metrics()
@@ -0,0 +1,57 @@
+"""
+Tiered model routing.
+Maps the task class declared by each agent method (light, standard, heavy)
+to a concrete model per provider.
+"""
+
+import os
+from typing import Optional
+
+TASK_CLASSES = ("light", "standard", "heavy")
+
+DEFAULT_MODELS = {
+    "anthropic": {
+        "light": "claude-3-5-haiku-20241022",
+        "standard": "claude-sonnet-4-20250514",
+        "heavy": "claude-sonnet-4-20250514"
+    },
+    "openai": {
+        "light": "gpt-4o-mini",
+        "standard": "gpt-4o",
+        "heavy": "gpt-4o"
+    }
+}
+
+
+class ModelRouter:
+    """
+    Resolves (provider, task class) to a model name.
+
+    Any entry can be overridden with MODEL_<PROVIDER>_<CLASS>,
+    e.g. MODEL_ANTHROPIC_HEAVY=claude-opus-4-20250514.
+    """
+
+    def __init__(self, models: dict = None):
+        self.models = {provider: dict(classes) for provider, classes in (models or DEFAULT_MODELS).items()}
+        for provider, classes in self.models.items():
+            for task_class in TASK_CLASSES:
+                override = os.getenv(f"MODEL_{provider.upper()}_{task_class.upper()}")
+                if override:
+                    classes[task_class] = override
+
+    def model_for(self, provider: str, task_class: str = "standard") -> str:
+        """Return the model to use for a task class on a provider."""
+        classes = self.models[provider]
+        return classes.get(task_class) or classes["standard"]
+
+    def escalate(self, provider: str, task_class: str) -> Optional[str]:
+        """
+        Return the next stronger task class whose model differs from the
+        current one, or None when there is nothing stronger to try.
+        """
+        current = self.model_for(provider, task_class)
+        index = TASK_CLASSES.index(task_class) if task_class in TASK_CLASSES else 1
+        for stronger in TASK_CLASSES[index + 1:]:
+            if self.model_for(provider, stronger) != current:
+                return stronger
+        return None
@@ -7,8 +7,15 @@ Mini-Courses, Worksheets, Case Studies, and more.
 
 import json
 import logging
-from typing import Optional
+from typing import Callable, Optional
+from config.settings import Settings
 from config.faststrat_context import FASTSTRAT_CONTEXT, LEAD_MAGNET_GUIDELINES
+from .ai_client import is_valid_json, parse_json_response
+from .budget import time_is_short, degrade
+from .cancellation import Cancelled
+from .content_schema import validate, repair_plan, renumber, spec_at, example, is_valid, get_path, path_str
+from .metrics import metrics
+from .token_estimator import trim_to_budget
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +73,17 @@ LEAD_MAGNET_FORMATS = {
     }
 }
 
+FIELD_REPAIR_PROMPT = """Eres el Product Architect de FastStrat. Este {format_name} ya está escrito, pero {problem}.
+
+DOCUMENTO ACTUAL:
+{document}
+
+{instructions}
+Mantén el mismo idioma, tono y nivel de detalle que el resto del documento.
+
+Responde SOLO con JSON, sin markdown:
+{shape}"""
+
 
 class ProductArchitectAgent:
     """
@@ -81,7 +99,14 @@ class ProductArchitectAgent:
     def __init__(self, ai_client):
         self.ai_client = ai_client
 
-    def create_carousel(self, research: dict, title: str = None) -> dict:
+    def _research_json(self, research: dict) -> str:
+        """Research as pasted into prompts, trimmed to RESEARCH_TOKEN_BUDGET."""
+        trimmed = trim_to_budget(research, Settings.RESEARCH_TOKEN_BUDGET)
+        if trimmed is not research:
+            logger.info(f"Research trimmed to fit {Settings.RESEARCH_TOKEN_BUDGET} tokens")
+        return json.dumps(trimmed, indent=2, ensure_ascii=False)
+
+    def create_carousel(self, research: dict, title: str = None, on_text: Callable = None) -> dict:
         """
         Create a complete LinkedIn carousel (8-12 slides).
         Returns slide-by-slide content.
@@ -89,7 +114,7 @@ class ProductArchitectAgent:
         prompt = f"""Eres el Product Architect de FastStrat. Crea un CAROUSEL COMPLETO para LinkedIn.
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 TÍTULO SUGERIDO: {title or 'Genera uno basado en el research'}
 
@@ -125,7 +150,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=2500)
+            response = self.ai_client.generate(prompt, max_tokens=2500, task="carousel",
+                                               task_class="standard", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -136,7 +163,7 @@ Responde en JSON:
             logger.error(f"Carousel creation error: {e}")
             return {"error": str(e)}
 
-    def create_guide(self, research: dict, title: str = None, pages: int = 7) -> dict:
+    def create_guide(self, research: dict, title: str = None, pages: int = 7, on_text: Callable = None) -> dict:
         """
         Create a complete PDF guide/ebook.
         Returns section-by-section content.
@@ -144,7 +171,7 @@ Responde en JSON:
         prompt = f"""Eres el Product Architect de FastStrat. Crea una GUÍA/EBOOK COMPLETA.
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 TÍTULO SUGERIDO: {title or 'Genera uno basado en el research'}
 PÁGINAS OBJETIVO: {pages}
@@ -192,7 +219,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=4000)
+            response = self.ai_client.generate(prompt, max_tokens=4000, task="guide",
+                                               task_class="heavy", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -203,14 +232,14 @@ Responde en JSON:
             logger.error(f"Guide creation error: {e}")
             return {"error": str(e)}
 
-    def create_checklist(self, research: dict, title: str = None) -> dict:
+    def create_checklist(self, research: dict, title: str = None, on_text: Callable = None) -> dict:
         """
         Create a comprehensive checklist (15-20 items).
         """
         prompt = f"""Eres el Product Architect de FastStrat. Crea un CHECKLIST COMPLETO.
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 TÍTULO SUGERIDO: {title or 'Genera uno basado en el research'}
 
@@ -247,7 +276,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=2500)
+            response = self.ai_client.generate(prompt, max_tokens=2500, task="checklist",
+                                               task_class="standard", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -258,7 +289,7 @@ Responde en JSON:
             logger.error(f"Checklist creation error: {e}")
             return {"error": str(e)}
 
-    def create_data_report(self, stats_research: dict, title: str = None) -> dict:
+    def create_data_report(self, stats_research: dict, title: str = None, on_text: Callable = None) -> dict:
         """
         Create a data-driven report with statistics and insights.
         For the Data-Authority route.
@@ -266,7 +297,7 @@ Responde en JSON:
         prompt = f"""Eres el Product Architect de FastStrat. Crea un REPORTE DE DATOS completo.
 
 ESTADÍSTICAS RECOPILADAS:
-{json.dumps(stats_research, indent=2, ensure_ascii=False)}
+{self._research_json(stats_research)}
 
 TÍTULO SUGERIDO: {title or stats_research.get('report_title', 'Estado del Marketing 2026')}
 
@@ -316,7 +347,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=4000)
+            response = self.ai_client.generate(prompt, max_tokens=4000, task="datareport",
+                                               task_class="heavy", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -327,7 +360,7 @@ Responde en JSON:
             logger.error(f"Data report creation error: {e}")
             return {"error": str(e)}
 
-    def create_template(self, research: dict, template_type: str = "strategy") -> dict:
+    def create_template(self, research: dict, template_type: str = "strategy", on_text: Callable = None) -> dict:
         """
         Create a fillable template (strategy, content calendar, etc).
         """
@@ -336,7 +369,7 @@ Responde en JSON:
 TIPO DE TEMPLATE: {template_type}
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 {FASTSTRAT_CONTEXT}
 
@@ -371,7 +404,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=3000)
+            response = self.ai_client.generate(prompt, max_tokens=3000, task="template",
+                                               task_class="standard", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -382,14 +417,14 @@ Responde en JSON:
             logger.error(f"Template creation error: {e}")
             return {"error": str(e)}
 
-    def create_minicourse(self, research: dict, title: str = None) -> dict:
+    def create_minicourse(self, research: dict, title: str = None, on_text: Callable = None) -> dict:
         """
         Create a 5-email mini-course sequence.
         """
         prompt = f"""Eres el Product Architect de FastStrat. Crea un MINI-CURSO de 5 emails.
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 TÍTULO SUGERIDO: {title or 'Genera uno basado en el research'}
 
@@ -435,7 +470,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=5000)
+            response = self.ai_client.generate(prompt, max_tokens=5000, task="minicourse",
+                                               task_class="heavy", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -446,14 +483,14 @@ Responde en JSON:
             logger.error(f"Mini-course creation error: {e}")
             return {"error": str(e)}
 
-    def create_worksheet(self, research: dict, title: str = None) -> dict:
+    def create_worksheet(self, research: dict, title: str = None, on_text: Callable = None) -> dict:
         """
         Create an interactive worksheet with exercises.
         """
         prompt = f"""Eres el Product Architect de FastStrat. Crea un WORKSHEET interactivo.
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 TÍTULO SUGERIDO: {title or 'Genera uno basado en el research'}
 
@@ -504,7 +541,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=4000)
+            response = self.ai_client.generate(prompt, max_tokens=4000, task="worksheet",
+                                               task_class="heavy", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -515,7 +554,7 @@ Responde en JSON:
             logger.error(f"Worksheet creation error: {e}")
             return {"error": str(e)}
 
-    def create_swipefile(self, research: dict, swipe_type: str = "copy") -> dict:
+    def create_swipefile(self, research: dict, swipe_type: str = "copy", on_text: Callable = None) -> dict:
         """
         Create a swipe file with copy-paste examples.
         """
@@ -524,7 +563,7 @@ Responde en JSON:
 TIPO DE SWIPE: {swipe_type}
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 {FASTSTRAT_CONTEXT}
 
@@ -568,7 +607,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=4500)
+            response = self.ai_client.generate(prompt, max_tokens=4500, task="swipefile",
+                                               task_class="heavy", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -579,14 +620,14 @@ Responde en JSON:
             logger.error(f"Swipe file creation error: {e}")
             return {"error": str(e)}
 
-    def create_casestudy(self, research: dict, title: str = None) -> dict:
+    def create_casestudy(self, research: dict, title: str = None, on_text: Callable = None) -> dict:
         """
         Create a detailed case study analysis.
         """
         prompt = f"""Eres el Product Architect de FastStrat. Crea un CASO DE ESTUDIO detallado.
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 TÍTULO SUGERIDO: {title or 'Genera uno basado en el research'}
 
@@ -661,7 +702,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=4000)
+            response = self.ai_client.generate(prompt, max_tokens=4000, task="casestudy",
+                                               task_class="heavy", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -672,14 +715,14 @@ Responde en JSON:
             logger.error(f"Case study creation error: {e}")
             return {"error": str(e)}
 
-    def create_toolkit(self, research: dict, title: str = None) -> dict:
+    def create_toolkit(self, research: dict, title: str = None, on_text: Callable = None) -> dict:
         """
         Create a comprehensive toolkit with multiple resources.
         """
         prompt = f"""Eres el Product Architect de FastStrat. Crea un TOOLKIT completo.
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 TÍTULO SUGERIDO: {title or 'Genera uno basado en el research'}
 
@@ -725,7 +768,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=5000)
+            response = self.ai_client.generate(prompt, max_tokens=5000, task="toolkit",
+                                               task_class="heavy", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -736,14 +781,14 @@ Responde en JSON:
             logger.error(f"Toolkit creation error: {e}")
             return {"error": str(e)}
 
-    def create_cheatsheet(self, research: dict, title: str = None) -> dict:
+    def create_cheatsheet(self, research: dict, title: str = None, on_text: Callable = None) -> dict:
         """
         Create a 1-2 page quick reference cheat sheet.
         """
         prompt = f"""Eres el Product Architect de FastStrat. Crea un CHEAT SHEET de referencia rápida.
 
 RESEARCH DATA:
-{json.dumps(research, indent=2, ensure_ascii=False)}
+{self._research_json(research)}
 
 TÍTULO SUGERIDO: {title or 'Genera uno basado en el research'}
 
@@ -800,7 +845,9 @@ Responde en JSON:
 }}"""
 
         try:
-            response = self.ai_client.generate(prompt, max_tokens=3000)
+            response = self.ai_client.generate(prompt, max_tokens=3000, task="cheatsheet",
+                                               task_class="standard", validate=is_valid_json,
+                                               on_text=on_text)
             clean = response.strip()
             if clean.startswith("```"):
                 clean = clean.split("```")[1]
@@ -815,6 +862,7 @@ Responde en JSON:
         """
         Universal method to create any lead magnet format.
         Routes to the appropriate creation method based on format_type.
+        Pass `on_text` to stream the model output (e.g. into a JsonFieldStream).
         """
         format_methods = {
             "carousel": self.create_carousel,
@@ -833,4 +881,115 @@ Responde en JSON:
         if format_type not in format_methods:
             return {"error": f"Unknown format: {format_type}. Available: {list(format_methods.keys())}"}
 
-        return format_methods[format_type](research, **kwargs)
+        return self.repair_content(format_type, format_methods[format_type](research, **kwargs))
+
+    def repair_content(self, format_type: str, content: dict) -> dict:
+        """
+        Check a generated document against its declared schema
+        (content_schema.SCHEMAS) and regenerate only the fields, list items
+        or missing items that fail it, with small follow-up calls, instead
+        of the whole document. The document is repaired in place.
+        """
+        if "error" in content or not Settings.SCHEMA_REPAIR_ENABLED:
+            return content
+        problems = validate(format_type, content)
+        if not problems:
+            metrics.incr("schema.valid")
+            return content
+
+        metrics.incr("schema.invalid")
+        logger.warning(f"{format_type} does not match its schema: {problems}")
+        if time_is_short():
+            degrade("skip_schema_repair")
+            return content
+
+        calls = 0
+        for step in repair_plan(format_type, content, problems):
+            if step[0] == "trim":
+                _, path, limit = step
+                del get_path(content, path)[limit:]
+                continue
+            if calls >= Settings.SCHEMA_REPAIR_MAX_CALLS:
+                break
+            calls += 1
+            if step[0] == "fields":
+                self._repair_fields(format_type, content, step[1], step[2])
+            else:
+                self._repair_items(format_type, content, step[1], step[2], step[3])
+        renumber(format_type, content)
+
+        remaining = validate(format_type, content)
+        metrics.incr("schema.repair_calls", calls)
+        metrics.incr("schema.repaired" if not remaining else "schema.unrepaired")
+        if remaining:
+            logger.warning(f"{format_type} still incomplete after {calls} repair calls: {remaining}")
+        return content
+
+    def _repair_call(self, format_type: str, content: dict, problem: str, instructions: str, shape: dict,
+                     units: int) -> dict:
+        """One repair completion for `units` fields or items, parsed; {} when it fails."""
+        prompt = FIELD_REPAIR_PROMPT.format(
+            format_name=LEAD_MAGNET_FORMATS.get(format_type, {}).get("name", format_type),
+            problem=problem,
+            document=json.dumps(trim_to_budget(content, Settings.RESEARCH_TOKEN_BUDGET), indent=2,
+                                ensure_ascii=False),
+            instructions=instructions,
+            shape=json.dumps(shape, indent=2, ensure_ascii=False)
+        )
+        try:
+            response = self.ai_client.generate(prompt, max_tokens=400 * units, temperature=0.5,
+                                               task="schema_repair", task_class="standard",
+                                               validate=is_valid_json)
+            repaired = parse_json_response(response)
+        except Cancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Schema repair of {format_type} failed: {e}")
+            return {}
+        return repaired if isinstance(repaired, dict) else {}
+
+    def _repair_fields(self, format_type: str, content: dict, parent: tuple, keys: list):
+        """Regenerate the missing or invalid `keys` of the object at `parent`."""
+        target = get_path(content, parent)
+        if not isinstance(target, dict):
+            return
+        location = f'del objeto "{path_str(parent)}"' if parent else "del documento"
+        repaired = self._repair_call(
+            format_type, content, "le faltan campos o están incompletos",
+            f"Escribe SOLO los campos {', '.join(keys)} {location}, coherentes con el resto.",
+            {key: example(spec_at(format_type, parent + (key,))) for key in keys},
+            len(keys)
+        )
+        for key in keys:
+            if is_valid(spec_at(format_type, parent + (key,)), repaired.get(key)):
+                target[key] = repaired[key]
+                metrics.incr("schema.repaired_fields")
+
+    def _repair_items(self, format_type: str, content: dict, path: tuple, indices: list, missing: int):
+        """Replace the invalid items at `indices` of the list at `path` and append `missing` new ones."""
+        items = get_path(content, path)
+        if not isinstance(items, list):
+            return
+        item_spec = spec_at(format_type, path).item
+        wanted = []
+        if indices:
+            wanted.append(f"reemplazos de los elementos {', '.join(str(i + 1) for i in indices)} (incompletos), "
+                          f"en ese orden")
+        if missing > 0:
+            wanted.append(f"{missing} elementos nuevos que continúen la lista sin repetir contenido")
+        repaired = self._repair_call(
+            format_type, content, f'la lista "{path_str(path)}" está incompleta',
+            f'Escribe SOLO {len(indices) + max(missing, 0)} elementos para "{path_str(path)}": '
+            f'{" y ".join(wanted)}.',
+            {"items": [example(item_spec)]},
+            len(indices) + max(missing, 0)
+        )
+        new_items = [item for item in repaired.get("items") or [] if is_valid(item_spec, item)]
+        for index in indices:
+            if not new_items:
+                return
+            items[index] = new_items.pop(0)
+            metrics.incr("schema.repaired_fields")
+        for item in new_items[:max(missing, 0)]:
+            items.append(item)
+            metrics.incr("schema.repaired_fields")
@@ -0,0 +1,132 @@
+"""
+Pluggable provider backends.
+Anthropic and OpenAI are built into AIClient; any other chat backend can be
+plugged in with AIClient.register_backend() and receives the calls of the
+tasks routed to it. The built-in LocalModelBackend talks to a small
+quantized model served on CPU by a local OpenAI-compatible server
+(llama.cpp's llama-server, Ollama, llamafile...), which takes low-stakes
+calls off the paid rate limits and lets the app run offline.
+"""
+
+import abc
+import json
+import time
+import logging
+from typing import Callable
+import requests
+from .token_estimator import MODEL_SPECS
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderBackend(abc.ABC):
+    """
+    A chat completion backend for AIClient.
+
+    complete() receives OpenAI-style chat `messages` and returns
+    {text, input_tokens, cached_input_tokens, output_tokens, truncated};
+    with `on_text` it streams and passes each text chunk to it.
+    """
+
+    name = "backend"
+    model = None
+
+    def is_available(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def complete(self, messages: list, max_tokens: int, temperature: float, model: str = None,
+                 on_text: Callable[[str], None] = None, timeout: float = None) -> dict:
+        ...
+
+    def status(self) -> str:
+        return "available" if self.is_available() else "unreachable"
+
+
+class LocalModelBackend(ProviderBackend):
+    """
+    Small quantized model on CPU behind a local OpenAI-compatible server.
+    Reachability is probed at most every `probe_seconds`.
+    """
+
+    name = "local"
+
+    def __init__(self, base_url: str, model: str, context_window: int = 8192, probe_seconds: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.probe_seconds = probe_seconds
+        self._reachable = None
+        self._probed_at = 0.0
+        # Free to run; the context window is whatever the server was started with
+        MODEL_SPECS.setdefault(model, {
+            "context": context_window, "max_output": context_window // 2, "input_price": 0.0, "output_price": 0.0
+        })
+
+    def is_available(self) -> bool:
+        if self._reachable is None or time.time() - self._probed_at > self.probe_seconds:
+            try:
+                self._reachable = requests.get(f"{self.base_url}/models", timeout=2).ok
+            except requests.RequestException:
+                self._reachable = False
+            self._probed_at = time.time()
+            if not self._reachable:
+                logger.info(f"Local model server not reachable at {self.base_url}")
+        return self._reachable
+
+    def complete(self, messages: list, max_tokens: int, temperature: float, model: str = None,
+                 on_text: Callable[[str], None] = None, timeout: float = None) -> dict:
+        request = {"model": model or self.model, "max_tokens": max_tokens, "temperature": temperature,
+                   "messages": messages, "stream": bool(on_text)}
+        try:
+            response = requests.post(f"{self.base_url}/chat/completions", json=request, timeout=timeout or 120,
+                                     stream=bool(on_text))
+            response.raise_for_status()
+        except requests.RequestException:
+            # Probe again before the next call instead of waiting out probe_seconds
+            self._reachable = None
+            raise
+        if on_text:
+            return self._stream(response, on_text)
+
+        data = response.json()
+        usage = data.get("usage") or {}
+        choice = data["choices"][0]
+        return {
+            "text": choice["message"].get("content") or "",
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "cached_input_tokens": 0,
+            "output_tokens": usage.get("completion_tokens", 0),
+            "truncated": choice.get("finish_reason") == "length"
+        }
+
+    def _stream(self, response, on_text: Callable[[str], None]) -> dict:
+        """Read a server-sent events completion; same result shape as complete()."""
+        parts = []
+        finish_reason = None
+        usage = {}
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                usage = chunk.get("usage") or usage
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    on_text(delta)
+                finish_reason = chunk["choices"][0].get("finish_reason") or finish_reason
+        finally:
+            # Closing the connection stops the generation when the caller aborts mid-stream
+            response.close()
+        return {
+            "text": "".join(parts),
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "cached_input_tokens": 0,
+            "output_tokens": usage.get("completion_tokens", 0),
+            "truncated": finish_reason == "length"
+        }
@@ -0,0 +1,83 @@
+"""
+Single-flight deduplication.
+Concurrent callers asking for the same thing share one in-flight call
+instead of each paying the provider.
+"""
+
+import copy
+import json
+import hashlib
+import threading
+from typing import Any, Callable
+from .cancellation import Cancelled, check_cancelled
+
+
+def request_key(*parts) -> str:
+    """Stable hash of the parts that identify a request."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """One in-flight call and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    The first caller for a key executes the function; callers arriving while
+    it runs wait and receive a copy of the same result (or the same error).
+    If the leader's job is cancelled, a waiting caller runs the call itself.
+    Waiting callers still honour their own job's cancellation and deadline.
+    Nothing is cached once the call finishes.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run `fn` for `key`, or wait for the identical call already running."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            while not call.done.wait(0.5):
+                check_cancelled("shared_call")
+            if isinstance(call.error, Cancelled):
+                return self.do(key, fn)
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = fn()
+            # Followers get their own copies so the leader's caller can mutate freely
+            call.result = copy.deepcopy(result)
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        """Executed vs. shared call counts."""
+        with self._lock:
+            return {"executed": self.executed, "shared": self.shared, "in_flight": len(self._calls)}
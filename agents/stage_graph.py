@@ -0,0 +1,49 @@
+"""
+Stage dependency graph.
+Declares which inputs (request fields) and upstream outputs each stage of
+a pipeline reads, so an edit to a stored job recomputes only the stages
+it invalidates: a new title reruns the cover, the post and the derived
+slides and render, but not research or the body content.
+"""
+
+# Stages in execution order; "title" is derived from the content (or edited by the user)
+STAGE_ORDER = ("research", "content", "title", "visual", "post", "slides", "render")
+
+# Request fields each route's research and content read
+RESEARCH_INPUTS = {
+    "trend-jacker": ("industry",),
+    "problem-solver": ("pain_point",),
+    "data-authority": ("industry",)
+}
+CONTENT_INPUTS = {
+    "data-authority": ("topic",)
+}
+
+
+def dependencies(route: str) -> dict:
+    """Stage -> the request fields and stages it reads, for one route."""
+    return {
+        "research": RESEARCH_INPUTS.get(route, ()),
+        "content": ("research", "format") + CONTENT_INPUTS.get(route, ()),
+        "title": ("content",),
+        "visual": ("research", "title", "format"),
+        "post": ("research", "content", "title", "post_variants", "distribution_bundle"),
+        "slides": ("content", "title", "visual", "compose_slides"),
+        "render": ("content", "title", "render")
+    }
+
+
+def stale_stages(route: str, fields: set, edited: set = frozenset()) -> list:
+    """
+    Stages to recompute, in execution order, after the request `fields`
+    changed and/or the user `edited` the output of some stages (e.g.
+    "title"). Edited stages are kept; only what depends on them reruns.
+    """
+    graph = dependencies(route)
+    dirty = set(fields) | set(edited)
+    stale = []
+    for stage in STAGE_ORDER:
+        if stage not in edited and any(dep in dirty for dep in graph[stage]):
+            dirty.add(stage)
+            stale.append(stage)
+    return stale
@@ -0,0 +1,29 @@
+"""
+Lightweight lexical similarity helpers.
+Used for de-duplicating search results, visuals and copy variants
+without embeddings or extra dependencies.
+"""
+
+import re
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str, min_length: int = 3) -> list:
+    """Lowercase word tokens, ignoring very short words."""
+    return [w for w in _WORD.findall((text or "").lower()) if len(w) >= min_length]
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Word n-grams of a text (the whole text when it is shorter than `size`)."""
+    words = _WORD.findall((text or "").lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    """Jaccard similarity of two sets (0.0 when both are empty)."""
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
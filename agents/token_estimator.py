@@ -0,0 +1,144 @@
+"""
+Pre-flight token estimation.
+Predicts the input tokens and cost of a call per provider and model before
+it is sent, guards the model's context window, and trims oversized research
+payloads deterministically so prompts stay within a token budget.
+"""
+
+import copy
+import json
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# context: context window; max_output: output token cap; prices in USD per 1M tokens
+MODEL_SPECS = {
+    "claude-3-5-haiku-20241022": {"context": 200000, "max_output": 8192, "input_price": 0.8, "output_price": 4.0},
+    "claude-sonnet-4-20250514": {"context": 200000, "max_output": 64000, "input_price": 3.0, "output_price": 15.0},
+    "gpt-4o-mini": {"context": 128000, "max_output": 16384, "input_price": 0.15, "output_price": 0.6},
+    "gpt-4o": {"context": 128000, "max_output": 16384, "input_price": 2.5, "output_price": 10.0}
+}
+DEFAULT_SPEC = {"context": 128000, "max_output": 8192, "input_price": 0.0, "output_price": 0.0}
+
+# Characters per token for Spanish prose mixed with JSON, on the conservative side
+CHARS_PER_TOKEN = {"anthropic": 3.2, "openai": 3.6}
+
+# Per-message framing added by the chat APIs
+MESSAGE_OVERHEAD = 8
+
+# Below this many output tokens a call cannot produce a usable lead magnet section
+MIN_OUTPUT_TOKENS = 256
+
+
+class ContextWindowExceeded(ValueError):
+    """Raised when a prompt cannot fit the model's context window."""
+
+
+def spec_for(model: str) -> dict:
+    """Limits and prices of a model (unknown models get conservative defaults)."""
+    return MODEL_SPECS.get(model, DEFAULT_SPEC)
+
+
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, provider: str = "openai", model: str = None) -> int:
+    """
+    Token count of `text` for a provider. Exact for OpenAI models when
+    tiktoken is installed, otherwise a character-ratio estimate.
+    """
+    if not text:
+        return 0
+    if provider == "openai" and model and TIKTOKEN_AVAILABLE:
+        return len(_encoding(model).encode(text))
+    return int(len(text) / CHARS_PER_TOKEN.get(provider, 3.2)) + 1
+
+
+def estimate_call(prompt: str, provider: str, model: str, max_tokens: int) -> dict:
+    """
+    Pre-flight estimate of one generation call.
+    `max_output_tokens` is `max_tokens` clamped to what the model can return
+    after the prompt; `fits` is False when that leaves too little room.
+    """
+    spec = spec_for(model)
+    input_tokens = count_tokens(prompt, provider, model) + MESSAGE_OVERHEAD
+    room = spec["context"] - input_tokens
+    max_output = max(0, min(max_tokens, spec["max_output"], room))
+    return {
+        "model": model,
+        "input_tokens": input_tokens,
+        "max_output_tokens": max_output,
+        "context_window": spec["context"],
+        "fits": max_output >= min(max_tokens, MIN_OUTPUT_TOKENS),
+        # Upper bound: assumes the whole output budget is used
+        "max_cost_usd": round(cost_usd(model, input_tokens, max_output), 6)
+    }
+
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Price of a call from its token counts."""
+    spec = spec_for(model)
+    return (input_tokens * spec["input_price"] + output_tokens * spec["output_price"]) / 1_000_000
+
+
+def _json_tokens(data) -> int:
+    return count_tokens(json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def _shrinkable(data, path=()):
+    """Yield (size, path) for every string or list that can still be shortened."""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _shrinkable(value, path + (key,))
+    elif isinstance(data, list):
+        if len(data) > 1:
+            yield len(json.dumps(data, ensure_ascii=False)), path
+        for index, value in enumerate(data):
+            yield from _shrinkable(value, path + (index,))
+    elif isinstance(data, str) and len(data) > 80:
+        yield len(data), path
+
+
+def _get(data, path):
+    for key in path:
+        data = data[key]
+    return data
+
+
+def trim_to_budget(data: dict, token_budget: int) -> dict:
+    """
+    Shrink a research dict until its JSON fits `token_budget` tokens.
+
+    The largest string or list is shortened first (strings are halved at a
+    word boundary, lists drop a quarter of their trailing, lowest-ranked
+    items), so the same input always produces the same output. The input is not modified.
+    """
+    if token_budget <= 0 or _json_tokens(data) <= token_budget:
+        return data
+
+    data = copy.deepcopy(data)
+    while _json_tokens(data) > token_budget:
+        # Largest first; ties resolved by path so trimming is deterministic
+        candidates = sorted(_shrinkable(data), key=lambda item: (-item[0], str(item[1])))
+        if not candidates:
+            break
+        _, path = candidates[0]
+        parent = _get(data, path[:-1]) if path else None
+        value = _get(data, path)
+        if isinstance(value, list):
+            shortened = value[:len(value) - max(1, len(value) // 4)]
+        else:
+            shortened = value[:len(value) // 2].rsplit(" ", 1)[0] + "…"
+        if parent is None:
+            data = shortened
+        else:
+            parent[path[-1]] = shortened
+    return data
+
@@ -0,0 +1,129 @@
+"""
+Adaptive max_tokens sizing.
+Learns how long each kind of output really is and sizes limits from history
+instead of hard-coding them per method.
+"""
+
+import json
+import time
+import atexit
+import logging
+import math
+import threading
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenSizer:
+    """
+    Records completion tokens per (task, route, provider) and suggests
+    max_tokens at a high percentile of the observed lengths plus a margin.
+
+    Until a key has enough samples the caller's declared limit is used.
+    History is saved every `save_every` records or `save_interval` seconds,
+    whichever comes first, and on exit.
+    """
+
+    def __init__(self, path: Optional[Path] = None, percentile: float = 0.95, margin: float = 0.15,
+                 min_samples: int = 5, history_size: int = 50, floor: int = 256, ceiling: int = 8192,
+                 save_every: int = 20, save_interval: float = 30.0):
+        self.path = Path(path) if path else None
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.history_size = history_size
+        self.floor = floor
+        self.ceiling = ceiling
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self._history = {}
+        self._truncations = {}
+        self._unsaved = 0
+        self._saved_at = time.time()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._load()
+        if self.path:
+            atexit.register(self.flush)
+
+    @staticmethod
+    def key(task: str, route: Optional[str], provider: str) -> str:
+        """Build the history key for a task/route/provider combination."""
+        return f"{task}|{route or '-'}|{provider}"
+
+    def suggest(self, task: str, route: Optional[str], provider: str, default: int) -> int:
+        """Return the max_tokens to request for this task, falling back to `default`."""
+        with self._lock:
+            samples = list(self._history.get(self.key(task, route, provider), []))
+
+        if len(samples) < self.min_samples:
+            return default
+
+        samples.sort()
+        index = min(len(samples) - 1, math.ceil(self.percentile * len(samples)) - 1)
+        sized = int(samples[index] * (1 + self.margin))
+        return max(self.floor, min(self.ceiling, sized))
+
+    def record(self, task: str, route: Optional[str], provider: str, output_tokens: int, truncated: bool = False):
+        """Record the real completion length of a finished call."""
+        if not output_tokens:
+            return
+        key = self.key(task, route, provider)
+        with self._lock:
+            history = self._history.setdefault(key, [])
+            history.append(int(output_tokens))
+            del history[:-self.history_size]
+            if truncated:
+                self._truncations[key] = self._truncations.get(key, 0) + 1
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every or time.time() - self._saved_at >= self.save_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Save unsaved history now."""
+        with self._save_lock:
+            with self._lock:
+                if not self._unsaved:
+                    return
+                payload = json.dumps({"history": self._history, "truncations": self._truncations})
+                self._unsaved = 0
+                self._saved_at = time.time()
+            self._save(payload)
+
+    def stats(self) -> dict:
+        """Summary of the sizing model for diagnostics."""
+        with self._lock:
+            return {
+                key: {
+                    "samples": len(history),
+                    "max_observed": max(history),
+                    "truncations": self._truncations.get(key, 0)
+                }
+                for key, history in self._history.items() if history
+            }
+
+    def _load(self):
+        """Load history from disk if a path is configured."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+            self._history = data.get("history", {})
+            self._truncations = data.get("truncations", {})
+        except Exception as e:
+            logger.warning(f"Could not load token sizing history: {e}")
+
+    def _save(self, payload: str):
+        """Write serialized history to disk atomically. Caller must hold the save lock."""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(payload)
+            tmp.replace(self.path)
+        except Exception as e:
+            logger.warning(f"Could not save token sizing history: {e}")
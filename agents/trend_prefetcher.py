@@ -0,0 +1,194 @@
+"""
+Background trend prefetcher.
+Keeps the current top trends and their research warm so Trend-Jacker
+starts from a cache read instead of 6 searches and 2 LLM calls.
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+from .job_context import JobContext, job_scope
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalize a topic name for use as a cache key."""
+    return " ".join(topic.lower().split())
+
+
+def trend_fingerprint(trend: dict) -> str:
+    """
+    Fingerprint of a trend's signals; a change means re-research. The topic
+    is already the cache key, so what counts is its urgency: the scan's
+    prose (why_trending, faststrat_angle) is rewritten by the model on every
+    scan and would never match.
+    """
+    payload = json.dumps([normalize_topic(trend.get("urgency") or "")], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class TrendPrefetcher:
+    """
+    Periodically scans trends and researches the top-K topics.
+
+    Only topics that are new since the previous refresh, whose urgency
+    changed, or whose research is older than `research_max_age` seconds (default: four intervals), are
+    re-researched; the rest keep their existing research.
+    """
+
+    def __init__(self, market_intel, top_k: int = 3, interval_seconds: int = 1800, path: Optional[Path] = None,
+                 research_max_age: float = None):
+        self.market_intel = market_intel
+        self.top_k = top_k
+        self.interval_seconds = interval_seconds
+        self.research_max_age = research_max_age or 4 * interval_seconds
+        self.path = Path(path) if path else None
+        self._snapshot = {"trends": [], "research": {}, "refreshed_at": 0}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._loaded_mtime = 0.0
+        self._load()
+
+    def start(self):
+        """Start the background refresh loop (no-op if already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trend-prefetcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Trend prefetcher started (top {self.top_k}, every {self.interval_seconds}s)")
+
+    def stop(self):
+        """Stop the background refresh loop."""
+        self._stop.set()
+
+    def _run(self):
+        """Refresh immediately if the cache is cold, then on every interval."""
+        if self.is_warm():
+            self._stop.wait(max(0, self.interval_seconds - self.age()))
+        while not self._stop.is_set():
+            try:
+                with job_scope(JobContext(route="trend-jacker")):
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Trend prefetch error: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def refresh(self) -> dict:
+        """Scan trends and research the top-K, reusing research for unchanged topics."""
+        with self._refresh_lock:
+            trending = self.market_intel.find_trending_topics()
+            if not trending:
+                logger.warning("Trend prefetch found no trends, keeping previous snapshot")
+                return self.snapshot()
+
+            with self._lock:
+                previous = dict(self._snapshot["research"])
+
+            research = {}
+            reused = 0
+            for trend in trending[:self.top_k]:
+                key = normalize_topic(trend.get("topic", ""))
+                if not key:
+                    continue
+                fingerprint = trend_fingerprint(trend)
+                cached = previous.get(key)
+                if (cached and cached.get("fingerprint") == fingerprint
+                        and time.time() - cached.get("researched_at", 0) < self.research_max_age):
+                    research[key] = cached
+                    reused += 1
+                    continue
+                research[key] = {
+                    "fingerprint": fingerprint,
+                    "research": self.market_intel.research_trend(trend["topic"]),
+                    "researched_at": time.time()
+                }
+
+            with self._lock:
+                self._snapshot = {"trends": trending, "research": research, "refreshed_at": time.time()}
+                self._save()
+
+            logger.info(f"Trend prefetch refreshed: {len(research)} topics, {reused} reused")
+            return self.snapshot()
+
+    def age(self) -> float:
+        """Seconds since the last successful refresh."""
+        with self._lock:
+            refreshed_at = self._snapshot["refreshed_at"]
+        return time.time() - refreshed_at if refreshed_at else float("inf")
+
+    def is_warm(self) -> bool:
+        """True when the snapshot is recent enough to serve (two intervals)."""
+        return self.age() < 2 * self.interval_seconds
+
+    def get_trends(self) -> Optional[list]:
+        """Cached trending topics, or None when the cache is cold."""
+        self._reload()
+        if not self.is_warm():
+            return None
+        with self._lock:
+            return list(self._snapshot["trends"]) or None
+
+    def get_research(self, topic: str) -> Optional[dict]:
+        """Cached research for a topic, or None when it was not prefetched."""
+        self._reload()
+        if not self.is_warm():
+            return None
+        with self._lock:
+            entry = self._snapshot["research"].get(normalize_topic(topic))
+        return entry["research"] if entry else None
+
+    def snapshot(self) -> dict:
+        """Status summary of the cache."""
+        with self._lock:
+            return {
+                "trends": len(self._snapshot["trends"]),
+                "researched": list(self._snapshot["research"].keys()),
+                "refreshed_at": self._snapshot["refreshed_at"]
+            }
+
+    def _load(self):
+        """Load the last snapshot from disk so restarts start warm."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            mtime = self.path.stat().st_mtime
+            snapshot = json.loads(self.path.read_text())
+        except Exception as e:
+            logger.warning(f"Could not load trend cache: {e}")
+            return
+        with self._lock:
+            self._snapshot, self._loaded_mtime = snapshot, mtime
+
+    def _reload(self):
+        """
+        Pick up snapshots saved by the process running the refresh loop
+        (queue workers never start their own).
+        """
+        if self._thread is not None or not self.path:
+            return
+        try:
+            changed = self.path.stat().st_mtime > self._loaded_mtime
+        except OSError:
+            return
+        if changed:
+            self._load()
+
+    def _save(self):
+        """Persist the snapshot. Caller must hold the lock."""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(self._snapshot, ensure_ascii=False))
+            tmp.replace(self.path)
+        except Exception as e:
+            logger.warning(f"Could not save trend cache: {e}")
@@ -0,0 +1,147 @@
+"""
+Brand visual library.
+Indexes every generated brand image by type, size and theme so that a
+close-enough existing visual can be served locally instead of paying for
+a fresh DALL-E generation.
+"""
+
+import re
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+from .text_similarity import tokenize, jaccard
+
+logger = logging.getLogger(__name__)
+
+# File names of library images (see add)
+VISUAL_FILE = re.compile(r"[0-9a-f]{16}\.png")
+
+# Words that say nothing about the theme of an image
+STOPWORDS = {
+    "para", "con", "los", "las", "del", "una", "uno", "que", "por", "como", "sin", "más", "sus", "the",
+    "and", "for", "with", "your", "you", "from", "this", "that", "cómo", "qué", "est", "son", "hay"
+}
+
+
+def theme_terms(text: str) -> set:
+    """Distinctive terms of a theme description."""
+    return {t for t in tokenize(text) if t not in STOPWORDS}
+
+
+class VisualLibrary:
+    """
+    On-disk library of generated visuals with lexical similarity retrieval.
+
+    Policy:
+    - threshold: minimum Jaccard similarity between theme terms to reuse
+    - max_age_days: visuals older than this are never served (freshness)
+    - max_uses: a visual is served at most this many times (novelty)
+    """
+
+    def __init__(self, directory: Path, threshold: float = 0.5, max_age_days: float = 30, max_uses: int = 5,
+                 url_prefix: str = "/visuals"):
+        self.directory = Path(directory)
+        self.threshold = threshold
+        self.max_age_days = max_age_days
+        self.max_uses = max_uses
+        self.url_prefix = url_prefix.rstrip("/")
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS visuals (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    size TEXT NOT NULL,
+                    theme TEXT NOT NULL,
+                    terms TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    uses INTEGER NOT NULL DEFAULT 0,
+                    last_used_at REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_visuals_type_size ON visuals (type, size, created_at)")
+
+    @contextmanager
+    def _db(self):
+        """Serialized connection that commits on success and always closes."""
+        with self._lock:
+            db = sqlite3.connect(self.directory / "library.db")
+            try:
+                yield db
+                db.commit()
+            finally:
+                db.close()
+
+    def url_for(self, visual_id: str) -> str:
+        """Public URL of a library visual."""
+        return f"{self.url_prefix}/{visual_id}.png"
+
+    def find(self, theme: str, visual_type: str, size: str, threshold: float = None) -> Optional[dict]:
+        """
+        Best existing visual of the same type and size whose theme is within
+        the similarity threshold, honouring the freshness and novelty policy.
+        Counts as a use when found. `threshold=0` accepts any visual of the type.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        terms = theme_terms(theme)
+        if not terms and threshold > 0:
+            return None
+        oldest = time.time() - self.max_age_days * 86400
+
+        with self._db() as db:
+            rows = db.execute(
+                "SELECT id, theme, terms, uses FROM visuals "
+                "WHERE type = ? AND size = ? AND created_at >= ? AND uses < ?",
+                (visual_type, size, oldest, self.max_uses)
+            ).fetchall()
+
+            best, best_score = None, 0.0
+            for visual_id, stored_theme, stored_terms, uses in rows:
+                score = jaccard(terms, set(json.loads(stored_terms)))
+                # Prefer the least-used visual among equally similar ones
+                if best is None or score > best_score or (score == best_score and uses < best["uses"]):
+                    best, best_score = {"id": visual_id, "theme": stored_theme, "uses": uses}, score
+
+            if not best or best_score < threshold:
+                return None
+
+            db.execute("UPDATE visuals SET uses = uses + 1, last_used_at = ? WHERE id = ?", (time.time(), best["id"]))
+
+        best.update({"similarity": round(best_score, 3), "url": self.url_for(best["id"])})
+        return best
+
+    def add(self, image: bytes, theme: str, visual_type: str, size: str) -> str:
+        """Store a generated visual and return its library URL."""
+        visual_id = uuid.uuid4().hex[:16]
+        filename = f"{visual_id}.png"
+        (self.directory / filename).write_bytes(image)
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO visuals (id, type, size, theme, terms, filename, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (visual_id, visual_type, size, theme, json.dumps(sorted(theme_terms(theme))), filename, time.time())
+            )
+        return self.url_for(visual_id)
+
+    def owns(self, url: str) -> bool:
+        """True when a URL names an image of this library."""
+        prefix = self.url_prefix + "/"
+        return bool(url) and url.startswith(prefix) and bool(VISUAL_FILE.fullmatch(url[len(prefix):]))
+
+    def read(self, url: str) -> Optional[bytes]:
+        """Image bytes behind a library URL."""
+        path = self.directory / url[len(self.url_prefix) + 1:]
+        return path.read_bytes() if path.exists() else None
+
+    def stats(self) -> dict:
+        """Size and reuse counts of the library."""
+        with self._db() as db:
+            total, served = db.execute("SELECT COUNT(*), COALESCE(SUM(uses), 0) FROM visuals").fetchone()
+        return {"visuals": total, "served_from_library": served}
@@ -17,9 +17,15 @@ print(f"[STARTUP] ANTHROPIC_API_KEY: {os.getenv('ANTHROPIC_API_KEY', 'NOT SET')[
 
 # Now import everything else
 import json
+import re
+import uuid
 import logging
+import threading
+import multiprocessing
+from contextlib import nullcontext
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template_string
+from typing import Optional
+from flask import Flask, request, jsonify, render_template_string, send_from_directory, abort
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,21 +35,31 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "faststrat-magnet-factory")
 
-# Import agents - these will now use the loaded env vars
-from agents.ai_client import AIClient
-from agents.market_intel import MarketIntelAgent
-from agents.product_architect import ProductArchitectAgent
-from agents.creative_director import CreativeDirectorAgent
-from agents.growth_copywriter import GrowthCopywriterAgent
-
-# Initialize AI client and agents
-# Note: AIClient will read fresh env vars on init
-ai_client = AIClient()
-ai_client._refresh_credentials()  # Force refresh after dotenv load
-market_intel = MarketIntelAgent(ai_client)
-product_architect = ProductArchitectAgent(ai_client)
-creative_director = CreativeDirectorAgent(os.getenv("OPENAI_API_KEY", ""))
-growth_copywriter = GrowthCopywriterAgent(ai_client)
+# Import agents and pipelines - these will now use the loaded env vars
+from agents.cancellation import Cancelled, CancelToken, DisconnectWatcher
+from agents.budget import JobBudget
+from agents.load_shedder import overload
+from agents.metrics import metrics
+from agents.job_context import JobContext, job_scope
+from agents.visual_library import VISUAL_FILE
+from agents.idempotency import IdempotencyStore, derive_key
+from agents.stage_graph import stale_stages
+from agents.broker import FINAL_STATES
+from config.settings import Settings
+from rendering.layouts import TITLE_KEYS, RENDER_FORMATS
+from pipelines import (
+    PIPELINES, REUSE_TOPIC_FIELDS, active_jobs, active_jobs_lock, ai_client, archive, archive_job, broker,
+    content_title, creative_director, job_format, job_store, market_intel, post_variants_of, regenerate_stages,
+    render_engine, run_job, tracked_job, trend_prefetcher, visual_library, with_slide_urls
+)
+
+idempotency = (IdempotencyStore(Settings.IDEMPOTENCY_FILE, Settings.IDEMPOTENCY_WINDOW_SECONDS)
+               if Settings.IDEMPOTENCY_ENABLED else None)
+# Only in the main process: render pool workers re-import this module when spawned
+if Settings.TREND_PREFETCH_ENABLED and multiprocessing.parent_process() is None:
+    trend_prefetcher.start()
+# Directory names of renders and composed carousels (uuid4 hex prefixes)
+GENERATED_ID = re.compile(r"[0-9a-f]{12}")
 print(f"[STARTUP] Agents initialized with OPENAI: {os.getenv('OPENAI_API_KEY', '')[:25]}...")
 
 # Store for current production
@@ -537,6 +553,28 @@ DASHBOARD_HTML = """
             if (status === 'complete') badge.classList.add('complete');
         }
 
+        async function postGenerate(params, idempotencyKey) {
+            const response = await fetch('/generate', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
+                body: JSON.stringify(params)
+            });
+            const data = await response.json();
+            return data.queued ? waitForJob(data.status_url) : data;
+        }
+
+        // Queued (or attached to a running) job: poll its status until it finishes
+        async function waitForJob(statusUrl) {
+            while (true) {
+                await new Promise(resolve => setTimeout(resolve, 2000));
+                const job = await (await fetch(statusUrl)).json();
+                if (job.state === 'done') return job.result;
+                if (job.state === 'failed' || job.state === 'cancelled' || job.success === false) {
+                    return { success: false, error: job.error || job.state || 'Job not found' };
+                }
+            }
+        }
+
         async function generateMagnet(route) {
             const outputSection = document.getElementById('output-section');
             outputSection.classList.add('visible');
@@ -566,13 +604,23 @@ DASHBOARD_HTML = """
                 // Start generation
                 updateAgentStatus(1, 'active');
 
-                const response = await fetch('/generate', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(params)
-                });
-
-                const data = await response.json();
+                // One key per click: a retried request attaches to its job, a new click runs a new one
+                const idempotencyKey = Date.now().toString(36) + Math.random().toString(36).slice(2);
+
+                // Offer an archived magnet on the same topic before spending tokens
+                params.reuse = 'check';
+                let data = await postGenerate(params, idempotencyKey);
+                if (data.reuse_offered && data.existing.length) {
+                    const match = data.existing[0];
+                    const created = new Date(match.created_at * 1000).toLocaleDateString();
+                    if (confirm('Ya existe un lead magnet parecido: "' + match.title + '" (' + created + ').\\n' +
+                                '¿Reutilizarlo en vez de generar uno nuevo?')) {
+                        data = await (await fetch('/api/archive/' + match.job_id)).json();
+                    } else {
+                        params.reuse = 'off';
+                        data = await postGenerate(params, idempotencyKey);
+                    }
+                }
 
                 if (data.success) {
                     // Update research
@@ -636,159 +684,323 @@ def generate():
     """
     Main generation endpoint.
     Routes to appropriate production pipeline based on selected route.
+    With BROKER_URL set the job is queued for a worker and 202 is returned
+    with its status URL. Job ids are always assigned here (X-Job-Id); send
+    "Prefer: respond-async" to get the 202 and the id right away, poll
+    /api/jobs/<id> and cancel with /api/jobs/<id>/cancel.
+
+    Submissions are idempotent within IDEMPOTENCY_WINDOW_SECONDS: a repeat
+    with the same Idempotency-Key header (or, with IDEMPOTENCY_BODY_KEYS,
+    the same normalized body) attaches to the job already running or gets
+    its result. Send "force": true to run anyway.
+
+    "reuse": "check" returns the archived magnets on the same topic, if
+    any, instead of generating ("existing"); "reuse": "auto" returns the
+    closest one's result. Default: ARCHIVE_REUSE.
     """
+    job_id = None
+    key = None
     try:
         data = request.get_json()
         route = data.get('route')
-
-        if route == 'trend-jacker':
-            return trend_jacker_pipeline(data)
-        elif route == 'problem-solver':
-            return problem_solver_pipeline(data)
-        elif route == 'data-authority':
-            return data_authority_pipeline(data)
-        else:
+        job_id = uuid.uuid4().hex[:12]
+        if route not in PIPELINES:
             return jsonify({"success": False, "error": "Invalid route"})
+        try:
+            post_variants_of(data)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        existing = reuse_existing(route, data)
+        if existing:
+            return existing
+
+        key = idempotency_key(data)
+        if key:
+            duplicate = claim_idempotency_key(key, job_id)
+            if duplicate:
+                return duplicate
+
+        # Jobs waiting for a worker, or running in this process (gthread worker threads and async jobs)
+        queue_depth = broker.depth("jobs") if broker else len(active_jobs)
+        profile, retry_after = overload.admit(queue_depth) if Settings.OVERLOAD_ENABLED else (frozenset(), 0)
+        if profile is None:
+            release_idempotency_key(key, job_id)
+            logger.warning(f"Rejecting job {job_id}: overloaded, retry after {retry_after}s")
+            response = jsonify({"success": False, "overloaded": True, "retry_after": retry_after,
+                                "error": "Service overloaded, please retry later"})
+            response.headers["Retry-After"] = str(retry_after)
+            return response, 503
+
+        if broker:
+            broker.enqueue("jobs", {"data": data, "profile": sorted(profile)}, task_id=job_id,
+                           max_attempts=Settings.WORKER_MAX_ATTEMPTS)
+            metrics.incr("jobs.queued")
+            return jsonify({"success": True, "queued": True, "job_id": job_id,
+                            "status_url": f"/api/jobs/{job_id}"}), 202
+
+        if 'respond-async' in request.headers.get('Prefer', ''):
+            run_in_background(job_id, data, key, profile)
+            response = jsonify({"success": True, "queued": True, "job_id": job_id,
+                                "status_url": f"/api/jobs/{job_id}"})
+            response.headers["X-Job-Id"] = job_id
+            return response, 202
+
+        # gunicorn and the werkzeug dev server expose the client socket
+        sock = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+        token = CancelToken(Settings.JOB_DEADLINE_SECONDS)
+        with DisconnectWatcher(sock, token) if sock else nullcontext():
+            result = run_job(job_id, data, token, profile)
+        if key and result.get("success"):
+            idempotency.complete(key, job_id, result)
+        else:
+            release_idempotency_key(key, job_id)
+        metrics.incr("jobs.completed")
+        response = jsonify(result)
+        response.headers["X-Job-Id"] = job_id
+        if profile:
+            response.headers["X-Degraded"] = ",".join(sorted(profile))
+        return response
+
+    except Cancelled as e:
+        release_idempotency_key(key, job_id)
+        logger.warning(f"Job {job_id} cancelled: {e.reason}")
+        metrics.incr("jobs.cancelled")
+        metrics.incr(f"cancel_reasons.{e.reason}")
+        return jsonify({"success": False, "cancelled": True, "reason": e.reason, "job_id": job_id}), 499
 
     except Exception as e:
+        release_idempotency_key(key, job_id)
         logger.error(f"Generation error: {e}")
+        metrics.incr("jobs.failed")
         return jsonify({"success": False, "error": str(e)})
 
 
-def trend_jacker_pipeline(data: dict) -> dict:
+def reuse_existing(route: str, data: dict):
     """
-    Route 1: Trend-Jacker Pipeline
-    Scans trends and creates timely lead magnets.
+    Response offering (or, in auto mode, returning) archived magnets of the
+    same route and format on a similar topic; None when the job should run.
     """
-    industry = data.get('industry', 'marketing')
-    format_type = data.get('format', 'carousel')
-
-    logger.info(f"[TREND-JACKER] Starting pipeline for {industry}")
-
-    # Agent 1: Find trending topics
-    logger.info("[Agent 1] Scanning for trends...")
-    trending = market_intel.find_trending_topics()
-
-    if not trending:
-        return jsonify({"success": False, "error": "No trends found"})
-
-    # Pick top trend
-    top_trend = trending[0]
-    research = market_intel.research_trend(top_trend['topic'])
-
-    # Agent 2: Create content based on format
-    logger.info(f"[Agent 2] Creating {format_type} content...")
-    content = product_architect.create_content(format_type, research, title=top_trend['topic'])
-
-    # Agent 3: Create visual
-    logger.info("[Agent 3] Generating visual...")
-    # Extract title from content based on format type
-    title_keys = ['carousel_title', 'guide_title', 'checklist_title', 'cheatsheet_title',
-                  'template_title', 'swipefile_title', 'course_title', 'worksheet_title',
-                  'toolkit_title', 'case_study_title', 'report_title']
-    title = next((content.get(k) for k in title_keys if content.get(k)), top_trend['topic'])
-
-    if format_type == 'carousel':
-        visual = creative_director.generate_carousel_cover(title, research.get('trend_summary', ''))
-    else:
-        visual = creative_director.generate_ebook_cover(title)
-
-    # Agent 4: Write post
-    logger.info("[Agent 4] Writing LinkedIn post...")
-    post = growth_copywriter.write_linkedin_post(content, research)
-
-    return jsonify({
-        "success": True,
-        "route": "trend-jacker",
-        "research": research,
-        "content": content,
-        "visual": visual,
-        "post": post
-    })
-
-
-def problem_solver_pipeline(data: dict) -> dict:
+    mode = data.get('reuse', Settings.ARCHIVE_REUSE)
+    topic = data.get(REUSE_TOPIC_FIELDS.get(route, ""))
+    if not archive or data.get('force') or mode not in ("check", "auto") or not topic:
+        return None
+    matches = archive.similar(route, job_format(route, data), topic, Settings.ARCHIVE_REUSE_THRESHOLD,
+                              Settings.ARCHIVE_REUSE_MAX_AGE_DAYS * 86400)
+    if not matches:
+        return None
+
+    if mode == "auto":
+        metrics.incr("archive.reused")
+        stored = archive.get(matches[0]["job_id"])
+        logger.info(f"Reusing archived job {stored['job_id']} for '{topic}'")
+        response = jsonify({**stored["result"], "reused_from": stored["job_id"]})
+        response.headers["X-Job-Id"] = stored["job_id"]
+        return response
+
+    metrics.incr("archive.reuse_offered")
+    return jsonify({"success": False, "reuse_offered": True, "existing": matches,
+                    "error": "Similar lead magnets already exist; send \"reuse\": \"off\" to generate anyway"})
+
+
+def idempotency_key(data: dict) -> Optional[str]:
     """
-    Route 2: Problem-Solver Pipeline
-    Creates solution-focused lead magnets for specific pain points.
+    Idempotency key of a /generate request: the Idempotency-Key header, or
+    one derived from the body with IDEMPOTENCY_BODY_KEYS; None to always run.
     """
-    pain_point = data.get('pain_point', 'No tengo estrategia de marketing')
-    format_type = data.get('format', 'guide')
+    if not idempotency or data.get('force'):
+        return None
+    explicit = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    if explicit:
+        return f"key:{explicit}"
+    return f"body:{derive_key(data)}" if Settings.IDEMPOTENCY_BODY_KEYS else None
 
-    logger.info(f"[PROBLEM-SOLVER] Starting pipeline for: {pain_point}")
 
-    # Agent 1: Analyze pain point
-    logger.info("[Agent 1] Analyzing pain point...")
-    research = market_intel.analyze_pain_point(pain_point)
-
-    # Agent 2: Create content based on format
-    logger.info(f"[Agent 2] Creating {format_type} solution content...")
-    content = product_architect.create_content(format_type, research)
-
-    # Agent 3: Create visual
-    logger.info("[Agent 3] Generating visual...")
-    # Extract title from content based on format type
-    title_keys = ['guide_title', 'checklist_title', 'carousel_title', 'cheatsheet_title',
-                  'template_title', 'swipefile_title', 'course_title', 'worksheet_title',
-                  'toolkit_title', 'case_study_title']
-    title = next((content.get(k) for k in title_keys if content.get(k)), pain_point)
-
-    if format_type == 'carousel':
-        visual = creative_director.generate_carousel_cover(title, research.get('pain_analysis', ''))
+def claim_idempotency_key(key: str, job_id: str):
+    """
+    None when `job_id` now holds `key` and should run; otherwise the
+    response for a duplicate submission: the earlier job's result (waiting
+    for it when it runs on a web node), or its status URL in broker mode.
+    """
+    # Jobs run by this process die with it; queued ones outlive the web node
+    existing = idempotency.claim(key, job_id, owner_pid=None if broker else os.getpid())
+    if existing and broker and existing["result"] is None:
+        task = broker.get(existing["job_id"])
+        if task and task["state"] == "done" and (task["result"] or {}).get("success"):
+            existing["result"] = task["result"]
+        elif not task or task["state"] in FINAL_STATES:
+            # Like the in-process path, only a successful job is replayed; anything else runs again
+            idempotency.release(key, existing["job_id"])
+            existing = idempotency.claim(key, job_id)
+    if not existing:
+        return None
+
+    original = existing["job_id"]
+    if existing["result"] is None and broker:
+        metrics.incr("idempotency.attached")
+        return jsonify({"success": True, "queued": True, "duplicate": True, "job_id": original,
+                        "status_url": f"/api/jobs/{original}"}), 202
+
+    if existing["result"] is None:
+        logger.info(f"Duplicate of running job {original}, waiting for its result")
+        metrics.incr("idempotency.attached")
+        existing["result"] = idempotency.wait(key, original, Settings.JOB_DEADLINE_SECONDS)
+        if existing["result"] is None:
+            if (idempotency.get(key) or {}).get("job_id") == original:
+                return jsonify({"success": False, "error": "The job for this request is still running",
+                                "job_id": original}), 409
+            # The original failed or was cancelled: this submission runs instead
+            return claim_idempotency_key(key, job_id)
     else:
-        visual = creative_director.generate_ebook_cover(title)
-
-    # Agent 4: Write post
-    logger.info("[Agent 4] Writing LinkedIn post...")
-    post = growth_copywriter.write_linkedin_post(content, research)
+        metrics.incr("idempotency.replayed")
+
+    response = jsonify(existing["result"])
+    response.headers["X-Job-Id"] = original
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def release_idempotency_key(key: Optional[str], job_id: str):
+    """Let the next submission with `key` run again (the job failed, was cancelled or rejected)."""
+    if key:
+        idempotency.release(key, job_id)
+
+
+# State of the latest jobs accepted with "Prefer: respond-async", for /api/jobs/<id>
+background_jobs = {}
+MAX_BACKGROUND_JOBS = 200
+
+
+def run_in_background(job_id: str, data: dict, key: Optional[str], profile=frozenset()):
+    """Run an accepted /generate job on a thread of this process, settling its idempotency claim."""
+    def finish(state: str, **fields):
+        with active_jobs_lock:
+            background_jobs[job_id] = {"state": state, **fields}
+
+    def run():
+        try:
+            result = run_job(job_id, data, CancelToken(Settings.JOB_DEADLINE_SECONDS), profile)
+        except Cancelled as e:
+            release_idempotency_key(key, job_id)
+            logger.warning(f"Job {job_id} cancelled: {e.reason}")
+            metrics.incr("jobs.cancelled")
+            metrics.incr(f"cancel_reasons.{e.reason}")
+            finish("cancelled", error=e.reason)
+            return
+        except Exception as e:
+            release_idempotency_key(key, job_id)
+            logger.error(f"Generation error: {e}")
+            metrics.incr("jobs.failed")
+            finish("failed", error=str(e))
+            return
+        if key and result.get("success"):
+            idempotency.complete(key, job_id, result)
+        else:
+            release_idempotency_key(key, job_id)
+        metrics.incr("jobs.completed")
+        finish("done" if result.get("success") else "failed", error=result.get("error"), result=result)
 
-    return jsonify({
-        "success": True,
-        "route": "problem-solver",
-        "research": research,
-        "content": content,
-        "visual": visual,
-        "post": post
-    })
+    with active_jobs_lock:
+        while len(background_jobs) >= MAX_BACKGROUND_JOBS:
+            background_jobs.pop(next(iter(background_jobs)))
+        background_jobs[job_id] = {"state": "running"}
+    threading.Thread(target=run, name=f"job-{job_id}", daemon=True).start()
 
 
-def data_authority_pipeline(data: dict) -> dict:
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
     """
-    Route 3: Data-Authority Pipeline
-    Creates data-driven reports for authority positioning.
+    Cancel a running /generate job by the id it was given (X-Job-Id, or
+    the 202 of an async submission). Needs a threaded server (see Procfile)
+    to be reachable while a synchronous /generate is running.
     """
-    topic = data.get('topic', 'Estado del Marketing')
-    industry = data.get('industry', 'marketing')
-
-    logger.info(f"[DATA-AUTHORITY] Starting pipeline for: {topic} in {industry}")
-
-    # Agent 1: Gather industry stats
-    logger.info("[Agent 1] Gathering industry statistics...")
-    stats_research = market_intel.gather_industry_stats(industry)
+    with active_jobs_lock:
+        job = active_jobs.get(job_id)
+    if job:
+        job.cancel_token.cancel("cancelled_by_user")
+        return jsonify({"success": True, "job_id": job_id})
+    # Queued or running on a worker: the worker's heartbeat sees the cancellation
+    if broker and broker.cancel(job_id, reason="cancelled_by_user"):
+        return jsonify({"success": True, "job_id": job_id})
+    return jsonify({"success": False, "error": "Job not found or already finished"}), 404
+
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """State and, once finished, result of a /generate job (queued, running, done, failed, cancelled)."""
+    task = broker.get(job_id) if broker else None
+    if task:
+        return jsonify({"job_id": job_id, "state": task["state"], "attempts": task["attempts"],
+                        "error": task["error"], "result": task["result"]})
+    with active_jobs_lock:
+        running = job_id in active_jobs
+        background = background_jobs.get(job_id)
+    if background:
+        return jsonify({"job_id": job_id, "error": None, "result": None, **background})
+    if running:
+        return jsonify({"job_id": job_id, "state": "running"})
+    stored = job_store.get(job_id) if job_store else None
+    if stored:
+        return jsonify({"job_id": job_id, "state": "done", "version": stored["version"],
+                        "result": {"success": True, "route": stored["route"], **stored["outputs"]}})
+    return jsonify({"success": False, "error": "Job not found"}), 404
+
+
+@app.route('/api/jobs/<job_id>/regenerate', methods=['POST'])
+def regenerate_job(job_id):
+    """
+    Edit a stored /generate job and recompute only the stages the edit
+    invalidates (see agents.stage_graph). The body holds the request fields
+    to change (format, pain_point, post_variants...) and/or a new "title".
+    """
+    stored = job_store.get(job_id) if job_store else None
+    if not stored:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    edits = request.get_json() or {}
+    route, data, outputs = stored["route"], stored["request"], stored["outputs"]
+    fixed = [field for field, value in (("route", route), ("job_id", job_id)) if edits.get(field, value) != value]
+    if fixed:
+        return jsonify({"success": False, "error": f"Can't change {', '.join(fixed)} of a job"}), 400
+    fields, edited = set(), set()
+    for field, value in edits.items():
+        if field != "title" and data.get(field) != value:
+            data[field] = value
+            fields.add(field)
 
-    # Agent 2: Create data report
-    logger.info("[Agent 2] Creating data report...")
-    content = product_architect.create_data_report(stats_research, topic)
+    try:
+        post_variants_of(data)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    content = outputs.get("content") or {}
+    if edits.get("title") and edits["title"] != content_title(content):
+        key = next((k for k in TITLE_KEYS if content.get(k)), None)
+        if not key:
+            return jsonify({"success": False, "error": "The stored content has no title to edit"}), 400
+        content[key] = edits["title"]
+        edited.add("title")
+
+    changed = sorted(fields | edited)
+    stale = stale_stages(route, fields, edited)
+    logger.info(f"Regenerating job {job_id}: {changed} changed, rerunning {stale}")
+    try:
+        token = CancelToken(Settings.JOB_DEADLINE_SECONDS)
+        job = JobContext(route=route, research_mode=data.get('research_mode'), job_id=job_id, cancel_token=token,
+                         budget=JobBudget(token))
+        with tracked_job(job), job_scope(job):
+            outputs = regenerate_stages(route, data, outputs, stale)
+    except Cancelled as e:
+        return jsonify({"success": False, "cancelled": True, "reason": e.reason, "job_id": job_id}), 499
+    except Exception as e:
+        logger.error(f"Regeneration error: {e}")
+        return jsonify({"success": False, "error": str(e)})
 
-    # Agent 3: Create visual
-    logger.info("[Agent 3] Generating infographic hero...")
-    visual = creative_director.generate_infographic_hero(
-        content.get('report_title', topic),
-        stats_research.get('key_stats', [])
-    )
-
-    # Agent 4: Write post
-    logger.info("[Agent 4] Writing LinkedIn post...")
-    post = growth_copywriter.write_linkedin_post(content, stats_research)
-
-    return jsonify({
-        "success": True,
-        "route": "data-authority",
-        "research": stats_research,
-        "content": content,
-        "visual": visual,
-        "post": post
-    })
+    version = job_store.update(job_id, data, outputs)
+    if archive:
+        archive_job(job_id, route, data, {"success": True, "route": route, **outputs})
+    return jsonify({"success": True, "route": route, "job_id": job_id, "version": version,
+                    "changed": changed, "regenerated": stale, **outputs})
 
 
 # ============================================================================
@@ -798,8 +1010,8 @@ def data_authority_pipeline(data: dict) -> dict:
 @app.route('/api/trends')
 def api_trends():
     """Get current trending topics."""
-    trends = market_intel.find_trending_topics()
-    return jsonify({"trends": trends})
+    trends = trend_prefetcher.get_trends() or market_intel.find_trending_topics()
+    return jsonify({"trends": trends, "prefetch": trend_prefetcher.snapshot()})
 
 
 @app.route('/api/research', methods=['POST'])
@@ -811,6 +1023,147 @@ def api_research():
     return jsonify({"research": research})
 
 
+@app.route('/api/render', methods=['POST'])
+def api_render():
+    """Render lead magnet JSON to HTML/PDF in the background."""
+    data = request.get_json()
+    format_type = data.get('format', 'guide')
+    content = data.get('content')
+    if not isinstance(content, dict):
+        return jsonify({"success": False, "error": "content must be a JSON object"}), 400
+    if format_type not in RENDER_FORMATS:
+        return jsonify({"success": False, "error": f"Unknown format: {format_type}"}), 400
+    outputs = tuple(o for o in data.get('outputs', ['html', 'pdf']) if o in ('html', 'pdf'))
+    render_id = render_engine.submit(format_type, content, outputs or ('html', 'pdf'))
+    return jsonify({"success": True, "render_id": render_id, "status_url": f"/api/render/{render_id}"}), 202
+
+
+@app.route('/api/render/benchmarks')
+def api_render_benchmarks():
+    """Render-time stats per format."""
+    return jsonify(render_engine.benchmarks())
+
+
+@app.route('/api/render/<render_id>')
+def api_render_status(render_id):
+    """Status of a render, with download URLs once done."""
+    status = render_engine.status(render_id)
+    if status is None:
+        return jsonify({"success": False, "error": "Unknown render"}), 404
+    status["urls"] = {kind: f"/renders/{render_id}/{name}" for kind, name in status.get("files", {}).items()}
+    return jsonify(status)
+
+
+@app.route('/renders/<render_id>/<path:filename>')
+def serve_render(render_id, filename):
+    """Download a rendered file."""
+    if not GENERATED_ID.fullmatch(render_id):
+        abort(404)
+    return send_from_directory(Settings.RENDERS_DIR / render_id, filename)
+
+
+@app.route('/api/carousel/compose', methods=['POST'])
+def api_compose_carousel():
+    """
+    Compose all slides of a carousel locally over one background: a visual
+    library URL (`background_url`), the background of an earlier composition
+    (`background_id`, its carousel id) or, without either, a generated one.
+    Arbitrary URLs are refused so the server never fetches client-chosen hosts.
+    """
+    data = request.get_json() or {}
+    carousel = data.get('carousel') or {}
+    background_url, background_id = data.get('background_url'), data.get('background_id')
+    library = creative_director.library
+
+    background = None
+    if background_url and not (library and library.owns(background_url)):
+        return jsonify({"success": False, "error": "background_url must be a visual library URL"}), 400
+    if background_id:
+        path = Settings.SLIDES_DIR / str(background_id) / "background.png"
+        if not GENERATED_ID.fullmatch(str(background_id)) or not path.exists():
+            return jsonify({"success": False, "error": "Unknown background_id"}), 400
+        background = path.read_bytes()
+
+    try:
+        composed = creative_director.compose_carousel(carousel, background_url=background_url, background=background)
+    except Exception as e:
+        logger.error(f"Carousel composition failed: {e}")
+        return jsonify({"success": False, "error": str(e)})
+    return jsonify(with_slide_urls(composed))
+
+
+@app.route('/slides/<carousel_id>/<path:filename>')
+def serve_slide(carousel_id, filename):
+    """Download a composed slide or carousel PDF."""
+    if not GENERATED_ID.fullmatch(carousel_id):
+        abort(404)
+    return send_from_directory(Settings.SLIDES_DIR / carousel_id, filename)
+
+
+@app.route('/visuals/<filename>')
+def serve_visual(filename):
+    """Serve an image from the brand visual library (only its images, not library.db)."""
+    if not VISUAL_FILE.fullmatch(filename):
+        abort(404)
+    return send_from_directory(Settings.VISUAL_LIBRARY_DIR, filename)
+
+
+@app.route('/api/visuals')
+def api_visuals():
+    """Visual library stats."""
+    return jsonify(visual_library.stats() if visual_library else {"enabled": False})
+
+
+@app.route('/api/archive/search')
+def archive_search():
+    """
+    Full-text search of archived magnets: ?q= words (titles, hooks, topics,
+    body), route, format, since/until (ISO date or unix time), limit.
+    Without q, the latest magnets matching the filters.
+    """
+    if not archive:
+        return jsonify({"success": False, "error": "Archive is disabled"}), 404
+    args = request.args
+    try:
+        since, until = archive_time(args.get('since')), archive_time(args.get('until'))
+        limit = min(int(args.get('limit', 20)), 100)
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid filter: {e}"}), 400
+    results = archive.search(args.get('q'), args.get('route'), args.get('format'), since, until, limit)
+    return jsonify({"success": True, "count": len(results), "results": results})
+
+
+@app.route('/api/archive/<job_id>')
+def archive_entry(job_id):
+    """An archived magnet's full result, as /generate returned it."""
+    stored = archive.get(job_id) if archive else None
+    if not stored:
+        return jsonify({"success": False, "error": "Not in the archive"}), 404
+    return jsonify({**stored["result"], "job_id": job_id, "archived_at": stored["created_at"]})
+
+
+def archive_time(value: Optional[str]) -> Optional[float]:
+    """Unix time of a since/until filter given as unix time or ISO date."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Job, cancellation and pipeline counters."""
+    return jsonify(metrics.snapshot())
+
+
+@app.route('/api/ai-usage')
+def api_ai_usage():
+    """Per-model usage and token sizing stats."""
+    return jsonify(ai_client.get_usage())
+
+
 @app.route('/api/status')
 def api_status():
     """Get current production status."""
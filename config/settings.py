@@ -1,6 +1,6 @@
 """
 Configuration settings for FastStrat Magnet Factory.
-Note: dotenv is loaded in app.py before this module is imported.
+Note: dotenv is loaded in app.py and pipelines.py before this module is imported.
 """
 
 import os
@@ -20,6 +20,155 @@ class Settings:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     PRIMARY_AI = os.getenv("PRIMARY_AI", "openai")
 
+    # Adaptive max_tokens sizing
+    TOKEN_SIZING_FILE = DATA_DIR / "token_sizing.json"
+    TOKEN_SIZING_PERCENTILE = float(os.getenv("TOKEN_SIZING_PERCENTILE", "0.95"))
+    TOKEN_SIZING_MARGIN = float(os.getenv("TOKEN_SIZING_MARGIN", "0.15"))
+    MAX_CONTINUATIONS = int(os.getenv("MAX_CONTINUATIONS", "2"))
+
+    # Research pasted into content prompts is trimmed to this many tokens
+    RESEARCH_TOKEN_BUDGET = int(os.getenv("RESEARCH_TOKEN_BUDGET", "6000"))
+
+    # Tiered model routing (per-tier models: MODEL_<PROVIDER>_<CLASS>)
+    MODEL_ESCALATION = os.getenv("MODEL_ESCALATION", "true").lower() == "true"
+
+    # Background trend prefetcher (Trend-Jacker)
+    TREND_PREFETCH_ENABLED = os.getenv("TREND_PREFETCH_ENABLED", "true").lower() == "true"
+    TREND_PREFETCH_INTERVAL = int(os.getenv("TREND_PREFETCH_INTERVAL", "1800"))
+    TREND_PREFETCH_TOP_K = int(os.getenv("TREND_PREFETCH_TOP_K", "3"))
+    TREND_CACHE_FILE = DATA_DIR / "trend_cache.json"
+
+    # Research without SERPER_API_KEY: inline | fused | per_query
+    SIMULATED_SEARCH_MODE = os.getenv("SIMULATED_SEARCH_MODE", "inline")
+    # Per-route overrides, e.g. "data-authority:fused,trend-jacker:inline"
+    SIMULATED_SEARCH_ROUTE_MODES = {
+        route.strip(): mode.strip() for route, mode in (
+            item.split(":", 1) for item in os.getenv("SIMULATED_SEARCH_ROUTE_MODES", "").split(",") if ":" in item
+        )
+    }
+
+    # Document rendering (HTML/PDF)
+    RENDERS_DIR = DATA_DIR / "renders"
+    RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+    SLIDES_DIR = DATA_DIR / "slides"
+    COMPOSE_CAROUSEL_SLIDES = os.getenv("COMPOSE_CAROUSEL_SLIDES", "true").lower() == "true"
+
+    # Brand visual library (reuse of generated covers)
+    VISUAL_LIBRARY_ENABLED = os.getenv("VISUAL_LIBRARY_ENABLED", "true").lower() == "true"
+    VISUAL_LIBRARY_DIR = DATA_DIR / "visuals"
+    VISUAL_LIBRARY_THRESHOLD = float(os.getenv("VISUAL_LIBRARY_THRESHOLD", "0.5"))
+    VISUAL_LIBRARY_MAX_AGE_DAYS = float(os.getenv("VISUAL_LIBRARY_MAX_AGE_DAYS", "30"))
+    VISUAL_LIBRARY_MAX_USES = int(os.getenv("VISUAL_LIBRARY_MAX_USES", "5"))
+
+    # Provider traffic cassettes: off | record | replay (see agents/cassette.py)
+    CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+    CASSETTE_DIR = DATA_DIR / "cassettes" / os.getenv("CASSETTE_NAME", "default")
+    # Replay timing: 1 = as recorded, 0.1 = ten times faster, 0 = instant
+    CASSETTE_TIMING_FACTOR = float(os.getenv("CASSETTE_TIMING_FACTOR", "1"))
+
+    # Multi-node mode: /generate queues jobs on this broker and worker.py processes run them
+    BROKER_URL = os.getenv("BROKER_URL", "")
+    # A running job not heard from for this long is handed to another worker
+    WORKER_VISIBILITY_TIMEOUT = float(os.getenv("WORKER_VISIBILITY_TIMEOUT", "60"))
+    WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+    WORKER_RETRY_DELAY = float(os.getenv("WORKER_RETRY_DELAY", "10"))
+    WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1"))
+
+    # Local CPU model behind an OpenAI-compatible server (llama-server, Ollama...) for light tasks
+    LOCAL_MODEL_ENABLED = os.getenv("LOCAL_MODEL_ENABLED", "false").lower() == "true"
+    LOCAL_MODEL_URL = os.getenv("LOCAL_MODEL_URL", "http://localhost:8080/v1")
+    LOCAL_MODEL_NAME = os.getenv("LOCAL_MODEL_NAME", "qwen2.5-1.5b-instruct-q4_k_m")
+    LOCAL_MODEL_CONTEXT = int(os.getenv("LOCAL_MODEL_CONTEXT", "8192"))
+    # Task names (as passed to AIClient.generate) served by the local model first
+    LOCAL_MODEL_TASKS = [
+        task.strip() for task in os.getenv(
+            "LOCAL_MODEL_TASKS", "simulated_search,simulated_search_batch,json_repair"
+        ).split(",") if task.strip()
+    ]
+    # Largest malformed output (in characters) sent to the json_repair task; heavy tasks are never repaired
+    JSON_REPAIR_MAX_CHARS = int(os.getenv("JSON_REPAIR_MAX_CHARS", "4000"))
+
+    # Check generated content against its format schema and regenerate only the broken fields
+    SCHEMA_REPAIR_ENABLED = os.getenv("SCHEMA_REPAIR_ENABLED", "true").lower() == "true"
+    SCHEMA_REPAIR_MAX_CALLS = int(os.getenv("SCHEMA_REPAIR_MAX_CALLS", "4"))
+
+    # Stored jobs, for editing and incremental regeneration
+    JOB_STORE_ENABLED = os.getenv("JOB_STORE_ENABLED", "true").lower() == "true"
+    JOB_STORE_FILE = DATA_DIR / "jobs.db"
+
+    # Searchable archive of every generated magnet, and the /generate reuse check (off/check/auto)
+    ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "true").lower() == "true"
+    ARCHIVE_FILE = DATA_DIR / "archive.db"
+    ARCHIVE_REUSE = os.getenv("ARCHIVE_REUSE", "off")
+    # Word overlap of the topics for a magnet to count as existing, and how old it may be
+    ARCHIVE_REUSE_THRESHOLD = float(os.getenv("ARCHIVE_REUSE_THRESHOLD", "0.6"))
+    ARCHIVE_REUSE_MAX_AGE_DAYS = float(os.getenv("ARCHIVE_REUSE_MAX_AGE_DAYS", "30"))
+
+    # Repeated /generate submissions (same Idempotency-Key, or same body when opted in) reuse the first job
+    IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+    IDEMPOTENCY_WINDOW_SECONDS = float(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "600"))
+    # Also dedupe requests without a key by their normalized body (a second "Generate" gets the first result)
+    IDEMPOTENCY_BODY_KEYS = os.getenv("IDEMPOTENCY_BODY_KEYS", "false").lower() == "true"
+    IDEMPOTENCY_FILE = DATA_DIR / "idempotency.db"
+
+    # Write the whole distribution kit (post, DM, emails, landing, carousel intro) per lead magnet
+    DISTRIBUTION_BUNDLE = os.getenv("DISTRIBUTION_BUNDLE", "false").lower() == "true"
+    # LinkedIn post variants generated in one call; the best-ranked one is used
+    POST_VARIANTS = int(os.getenv("POST_VARIANTS", "1"))
+
+    # Stream content and start the visual/post stages as soon as their fields are ready
+    STREAM_STAGES = os.getenv("STREAM_STAGES", "true").lower() == "true"
+
+    # Jobs are cancelled once this old (gunicorn kills the worker at 180s)
+    JOB_DEADLINE_SECONDS = float(os.getenv("JOB_DEADLINE_SECONDS", "170"))
+    # Share of the deadline given to each stage, e.g. "research:0.2,content:0.5,visual:0.15,post:0.15"
+    STAGE_SHARES = {
+        stage: float(share) for stage, share in (
+            item.strip().split(":", 1) for item in os.getenv(
+                "STAGE_SHARES", "research:0.2,content:0.5,visual:0.15,post:0.15"
+            ).split(",") if ":" in item
+        )
+    }
+    # Upper bounds for single provider calls (shortened further by the job budget)
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+    SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "15"))
+    IMAGE_TIMEOUT_SECONDS = float(os.getenv("IMAGE_TIMEOUT_SECONDS", "60"))
+
+    # Overload control: degrade, then reject new jobs under load
+    OVERLOAD_ENABLED = os.getenv("OVERLOAD_ENABLED", "true").lower() == "true"
+    OVERLOAD_DEGRADE_JOBS = int(os.getenv("OVERLOAD_DEGRADE_JOBS", "3"))
+    OVERLOAD_MAX_JOBS = int(os.getenv("OVERLOAD_MAX_JOBS", "6"))
+    OVERLOAD_MAX_INFLIGHT_CALLS = int(os.getenv("OVERLOAD_MAX_INFLIGHT_CALLS", "12"))
+    OVERLOAD_DEGRADE_ERROR_RATE = float(os.getenv("OVERLOAD_DEGRADE_ERROR_RATE", "0.25"))
+    OVERLOAD_SHED_ERROR_RATE = float(os.getenv("OVERLOAD_SHED_ERROR_RATE", "0.6"))
+    OVERLOAD_RETRY_AFTER = int(os.getenv("OVERLOAD_RETRY_AFTER", "30"))
+
+    # Adaptive (AIMD) concurrency of provider calls per endpoint: chat (per provider), image, search
+    CONCURRENCY_ENABLED = os.getenv("CONCURRENCY_ENABLED", "true").lower() == "true"
+    CONCURRENCY_INITIAL = {
+        kind: float(limit) for kind, limit in (
+            item.strip().split(":", 1) for item in os.getenv(
+                "CONCURRENCY_INITIAL", "chat:4,image:2,search:4"
+            ).split(",") if ":" in item
+        )
+    }
+    CONCURRENCY_MAX = {
+        kind: float(limit) for kind, limit in (
+            item.strip().split(":", 1) for item in os.getenv(
+                "CONCURRENCY_MAX", "chat:32,image:8,search:16"
+            ).split(",") if ":" in item
+        )
+    }
+    # Multiplicative cut on 429s, timeouts and latency spikes (latency > factor x baseline)
+    CONCURRENCY_DECREASE = float(os.getenv("CONCURRENCY_DECREASE", "0.5"))
+    CONCURRENCY_LATENCY_FACTOR = float(os.getenv("CONCURRENCY_LATENCY_FACTOR", "2.5"))
+    # Cuts applied in degraded mode: cached_research, light_model, library_visuals, no_extras
+    DEGRADED_PROFILE = [
+        cut.strip() for cut in os.getenv(
+            "DEGRADED_PROFILE", "cached_research,light_model,library_visuals,no_extras"
+        ).split(",") if cut.strip()
+    ]
+
     # Email (Resend)
     RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
     FROM_EMAIL = os.getenv("FROM_EMAIL", "onboarding@resend.dev")
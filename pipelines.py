@@ -0,0 +1,476 @@
+"""
+Lead magnet pipelines and the job plumbing shared by the web process
+(app.py) and the queue workers (worker.py): the agents, the stores, the
+four-agent pipelines of each route, incremental regeneration and run_job().
+Importing it starts nothing in the background.
+"""
+
+import os
+import logging
+import threading
+from pathlib import Path
+
+# Load .env before anything reads the environment (worker.py imports this module first)
+from dotenv import load_dotenv
+load_dotenv(Path(__file__).parent / ".env", override=True)
+
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from agents.ai_client import AIClient
+from agents.cancellation import CancelToken, check_cancelled
+from agents.budget import JobBudget, degrade, stage_scope, staged, time_is_short
+from agents.load_shedder import is_cut, overload
+from agents.metrics import metrics
+from agents.job_context import JobContext, bind_job, job_scope
+from agents.json_stream import JsonFieldStream
+from agents.market_intel import MarketIntelAgent
+from agents.product_architect import ProductArchitectAgent
+from agents.creative_director import CreativeDirectorAgent
+from agents.growth_copywriter import GrowthCopywriterAgent
+from agents.trend_prefetcher import TrendPrefetcher
+from agents.visual_library import VisualLibrary
+from agents.job_store import JobStore
+from agents.archive import Archive
+from agents.broker import broker_from_url
+from config.settings import Settings
+from rendering import RenderEngine, SlideComposer, brand_colors
+from rendering.layouts import TITLE_KEYS, RENDER_FORMATS
+from config.faststrat_context import VISUAL_BRAND_GUIDELINES
+
+logger = logging.getLogger(__name__)
+
+# Initialize AI client and agents
+# Note: AIClient will read fresh env vars on init
+ai_client = AIClient()
+ai_client._refresh_credentials()  # Force refresh after dotenv load
+market_intel = MarketIntelAgent(ai_client)
+product_architect = ProductArchitectAgent(ai_client)
+slide_composer = SlideComposer(Settings.SLIDES_DIR, colors=brand_colors(VISUAL_BRAND_GUIDELINES))
+visual_library = VisualLibrary(
+    Settings.VISUAL_LIBRARY_DIR,
+    threshold=Settings.VISUAL_LIBRARY_THRESHOLD,
+    max_age_days=Settings.VISUAL_LIBRARY_MAX_AGE_DAYS,
+    max_uses=Settings.VISUAL_LIBRARY_MAX_USES
+) if Settings.VISUAL_LIBRARY_ENABLED else None
+job_store = JobStore(Settings.JOB_STORE_FILE) if Settings.JOB_STORE_ENABLED else None
+archive = Archive(Settings.ARCHIVE_FILE) if Settings.ARCHIVE_ENABLED else None
+# With a broker, /generate only queues jobs and worker.py processes run them
+broker = broker_from_url(Settings.BROKER_URL) if Settings.BROKER_URL else None
+creative_director = CreativeDirectorAgent(
+    os.getenv("OPENAI_API_KEY", ""), slide_composer=slide_composer, library=visual_library
+)
+growth_copywriter = GrowthCopywriterAgent(ai_client)
+# Started by the web process only (see app.py); workers read the cache file it keeps
+trend_prefetcher = TrendPrefetcher(
+    market_intel,
+    top_k=Settings.TREND_PREFETCH_TOP_K,
+    interval_seconds=Settings.TREND_PREFETCH_INTERVAL,
+    path=Settings.TREND_CACHE_FILE
+)
+render_engine = RenderEngine(Settings.RENDERS_DIR, max_workers=Settings.RENDER_WORKERS)
+
+
+# Request field naming a magnet's topic before any research (trend-jacker's topic comes from the trend scan)
+REUSE_TOPIC_FIELDS = {"problem-solver": "pain_point", "data-authority": "topic"}
+
+
+def run_job(job_id: str, data: dict, token: CancelToken, profile=frozenset()) -> dict:
+    """
+    Run one /generate job in this process (web node or worker) and return
+    its result, storing it when successful. Raises Cancelled.
+    """
+    route = data.get('route')
+    job = JobContext(route=route, research_mode=data.get('research_mode'), job_id=job_id, cancel_token=token,
+                     budget=JobBudget(token), profile=profile)
+    with tracked_job(job), job_scope(job):
+        result = PIPELINES[route](data)
+    if job_store and result.get("success"):
+        job_store.save(job_id, route, data, {k: v for k, v in result.items() if k not in ("success", "route")})
+    if archive and result.get("success"):
+        archive_job(job_id, route, data, result)
+    return result
+
+
+# Jobs running in this process, by id, so they can be cancelled explicitly
+active_jobs = {}
+active_jobs_lock = threading.Lock()
+
+
+@contextmanager
+def tracked_job(job: JobContext):
+    """Register a job as active for the duration of the block."""
+    metrics.incr("jobs.started")
+    started = time.time()
+    with active_jobs_lock:
+        active_jobs[job.job_id] = job
+        metrics.set("jobs.active", len(active_jobs))
+    try:
+        yield job
+    finally:
+        with active_jobs_lock:
+            active_jobs.pop(job.job_id, None)
+            metrics.set("jobs.active", len(active_jobs))
+        overload.job_finished(time.time() - started)
+
+
+def archive_job(job_id: str, route: str, data: dict, result: dict):
+    """Add a finished job's artifacts to the archive (again, after a regeneration)."""
+    content = result.get("content") or {}
+    post = result.get("post") if isinstance(result.get("post"), dict) else {}
+    hook = content.get("hook") or post.get("hook") or content.get("subtitle")
+    archive.add(job_id, route, job_format(route, data), result.get("topic") or "",
+                content_title(content, result.get("topic")), hook, result)
+
+
+def regenerate_stages(route: str, data: dict, outputs: dict, stale: list) -> dict:
+    """Recompute the `stale` stages of a stored job, reusing every other output."""
+    outputs = dict(outputs)
+    for stage in stale:
+        metrics.incr(f"regenerated.{stage}")
+
+    research, topic = outputs.get("research"), outputs.get("topic")
+    # A topic given in the request (data-authority) may have been edited without staling the research
+    topic_field = REUSE_TOPIC_FIELDS.get(route)
+    if topic_field and data.get(topic_field):
+        topic = outputs["topic"] = data[topic_field]
+    if "research" in stale:
+        research, topic = research_stage(route, data)
+        if not topic:
+            raise ValueError("No trends found")
+        outputs.update(research=research, topic=topic)
+
+    create, make_visual = route_stages(route, data, research, topic)
+    format_type = job_format(route, data)
+    if "content" in stale:
+        logger.info(f"[Agent 2] Recreating {format_type} content...")
+        outputs["content"] = staged("content", create)(None)
+    content = outputs["content"]
+
+    # Cover and post do not depend on each other
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        visual = post = None
+        if "visual" in stale:
+            visual = pool.submit(bind_job(staged("visual", make_visual)), content_title(content, topic))
+        if "post" in stale:
+            post = pool.submit(bind_job(staged("post", write_distribution)), data, content, research)
+        if visual:
+            outputs["visual"] = visual.result()
+        if post:
+            outputs["post"], outputs["distribution"] = post.result()
+
+    if "slides" in stale and format_type == 'carousel' and isinstance(outputs.get("visual"), dict):
+        outputs["visual"]["slides"] = compose_slides(data, content, outputs["visual"])
+    if "render" in stale:
+        outputs["render"] = submit_render(data, format_type, content)
+    return outputs
+
+
+def submit_render(data: dict, format_type: str, content: dict):
+    """Queue HTML/PDF rendering of the content when the request asks for it."""
+    if not data.get('render') or not content or content.get('error') or format_type not in RENDER_FORMATS:
+        return None
+    check_cancelled("stage")
+    render_id = render_engine.submit(format_type, content)
+    return {"render_id": render_id, "status_url": f"/api/render/{render_id}"}
+
+
+def compose_slides(data: dict, content: dict, cover: dict):
+    """Typeset the carousel slides locally over the cover just generated."""
+    if not data.get('compose_slides', Settings.COMPOSE_CAROUSEL_SLIDES) or not content.get('slides'):
+        return None
+    check_cancelled("stage")
+    composed = creative_director.compose_carousel(content, background_url=cover.get("image_url"))
+    return with_slide_urls(composed)
+
+
+def with_slide_urls(composed: dict) -> dict:
+    """Add download URLs to a composed carousel."""
+    if composed.get("success"):
+        base = f"/slides/{composed['carousel_id']}"
+        composed["slide_urls"] = [f"{base}/{name}" for name in composed["slides"]]
+        composed["pdf_url"] = f"{base}/{composed['pdf']}"
+    return composed
+
+
+# Most LinkedIn post variants a job may ask for (each one is a full post generation)
+MAX_POST_VARIANTS = 5
+
+
+def post_variants_of(data: dict) -> int:
+    """`post_variants` of a request clamped to 1..MAX_POST_VARIANTS; ValueError when it is not a number."""
+    value = data.get('post_variants', Settings.POST_VARIANTS)
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        return min(MAX_POST_VARIANTS, max(1, int(value)))
+    except (TypeError, ValueError):
+        raise ValueError(f"post_variants must be an integer, got {value!r}") from None
+
+
+def write_distribution(data: dict, content: dict, research: dict):
+    """
+    Agent 4: the LinkedIn post (best of `post_variants` when more than one),
+    plus the full distribution bundle when requested.
+    """
+    post_variants = post_variants_of(data)
+    bundle = data.get('distribution_bundle', Settings.DISTRIBUTION_BUNDLE)
+    if (bundle or post_variants > 1) and is_cut("no_extras"):
+        metrics.incr("overload.extras_skipped")
+        bundle, post_variants = False, 1
+    if (bundle or post_variants > 1) and time_is_short("post"):
+        degrade("extras_skipped", "post")
+        bundle, post_variants = False, 1
+    if bundle:
+        logger.info("[Agent 4] Writing distribution bundle...")
+        bundle = growth_copywriter.write_distribution_bundle(content, research, post_variants=post_variants)
+        return bundle["linkedin_post"], bundle
+    if post_variants > 1:
+        logger.info(f"[Agent 4] Writing {post_variants} LinkedIn post variants...")
+        return growth_copywriter.write_best_post(content, research, post_variants), None
+    logger.info("[Agent 4] Writing LinkedIn post...")
+    return growth_copywriter.write_linkedin_post(content, research), None
+
+
+def content_title(content: dict, default: str = None) -> str:
+    """Title of a lead magnet, whatever its format."""
+    return next((content.get(k) for k in TITLE_KEYS if content.get(k)), default)
+
+
+def run_stages(data: dict, research: dict, create, make_visual, default_title: str):
+    """
+    Agents 2-4: content, visual and post.
+
+    With STREAM_STAGES the content is streamed through a JsonFieldStream: the
+    visual starts as soon as the title is complete, and the post (unless the
+    full distribution bundle is requested) as soon as the leading fields
+    (title, hook, subtitle...) are, overlapping the tail of content generation.
+
+    `create(on_text)` writes the content; `make_visual(title)` the visual.
+    Each runs in its stage of the job's time budget.
+    Returns (content, visual, post, distribution).
+    """
+    create = staged("content", create)
+    make_visual = staged("visual", make_visual)
+    write_post = staged("post", write_distribution)
+
+    check_cancelled("stage")
+    if not data.get('stream_stages', Settings.STREAM_STAGES):
+        content = create(None)
+        check_cancelled("stage")
+        logger.info("[Agent 3] Generating visual...")
+        visual = make_visual(content_title(content, default_title))
+        check_cancelled("stage")
+        post, distribution = write_post(data, content, research)
+        return content, visual, post, distribution
+
+    early_post = not data.get('distribution_bundle', Settings.DISTRIBUTION_BUNDLE)
+    started = {}
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        def on_field(key, value):
+            if key in TITLE_KEYS and value and "visual" not in started:
+                logger.info("[Agent 3] Title ready, generating visual while content streams...")
+                started["visual"] = pool.submit(bind_job(make_visual), value)
+
+        def on_header(fields):
+            if early_post and content_title(fields) and "post" not in started:
+                logger.info("[Agent 4] Leading fields ready, writing post while content streams...")
+                started["post"] = pool.submit(bind_job(write_post), data, fields, research)
+
+        content = create(JsonFieldStream(on_field, on_header).feed)
+
+        check_cancelled("stage")
+        if "visual" not in started:
+            logger.info("[Agent 3] Generating visual...")
+            started["visual"] = pool.submit(bind_job(make_visual), content_title(content, default_title))
+        if "post" not in started:
+            started["post"] = pool.submit(bind_job(write_post), data, content, research)
+        visual = started["visual"].result()
+        post, distribution = started["post"].result()
+
+    return content, visual, post, distribution
+
+
+DEFAULT_FORMATS = {"trend-jacker": "carousel", "problem-solver": "guide", "data-authority": "datareport"}
+
+
+def job_format(route: str, data: dict) -> str:
+    """Lead magnet format a job produces."""
+    if route == 'data-authority':
+        return "datareport"
+    return data.get('format', DEFAULT_FORMATS.get(route, 'guide'))
+
+
+def research_stage(route: str, data: dict) -> tuple:
+    """
+    Agent 1 for a route: (research, topic). `topic` is the trend or pain
+    point the magnet is about, or None when no trends were found.
+    """
+    if route == 'trend-jacker':
+        # Warm cache from the prefetcher when available
+        trending = trend_prefetcher.get_trends()
+        research = None
+        if trending:
+            logger.info("[Agent 1] Using prefetched trends")
+            research = trend_prefetcher.get_research(trending[0]['topic'])
+        else:
+            logger.info("[Agent 1] Scanning and researching trends...")
+            with stage_scope("research"):
+                scan = market_intel.scan_and_research_top_trend()
+            trending, research = scan["trending"], scan["research"]
+
+        if not trending:
+            return None, None
+
+        # Pick top trend
+        topic = trending[0]['topic']
+        if research is None:
+            with stage_scope("research"):
+                research = market_intel.research_trend(topic)
+        return research, topic
+
+    if route == 'problem-solver':
+        logger.info("[Agent 1] Analyzing pain point...")
+        pain_point = data.get('pain_point', 'No tengo estrategia de marketing')
+        with stage_scope("research"):
+            return market_intel.analyze_pain_point(pain_point), pain_point
+
+    logger.info("[Agent 1] Gathering industry statistics...")
+    with stage_scope("research"):
+        research = market_intel.gather_industry_stats(data.get('industry', 'marketing'))
+    return research, data.get('topic', 'Estado del Marketing')
+
+
+def route_stages(route: str, data: dict, research: dict, topic: str) -> tuple:
+    """
+    Agents 2 and 3 for a route: (create(on_text), make_visual(title)),
+    shared by the pipelines and by incremental regeneration.
+    """
+    format_type = job_format(route, data)
+
+    if route == 'data-authority':
+        def create(on_text):
+            return product_architect.create_content("datareport", research, title=topic, on_text=on_text)
+
+        def make_visual(title):
+            return creative_director.generate_infographic_hero(title, research.get('key_stats', []))
+        return create, make_visual
+
+    summary_key = 'trend_summary' if route == 'trend-jacker' else 'pain_analysis'
+    extra = {"title": topic} if route == 'trend-jacker' else {}
+
+    def create(on_text):
+        return product_architect.create_content(format_type, research, on_text=on_text, **extra)
+
+    def make_visual(title):
+        if format_type == 'carousel':
+            return creative_director.generate_carousel_cover(title, research.get(summary_key, ''))
+        return creative_director.generate_ebook_cover(title)
+    return create, make_visual
+
+
+def trend_jacker_pipeline(data: dict) -> dict:
+    """
+    Route 1: Trend-Jacker Pipeline
+    Scans trends and creates timely lead magnets.
+    """
+    industry = data.get('industry', 'marketing')
+    format_type = job_format('trend-jacker', data)
+
+    logger.info(f"[TREND-JACKER] Starting pipeline for {industry}")
+
+    # Agent 1: Find trending topics
+    research, topic = research_stage('trend-jacker', data)
+    if not topic:
+        return {"success": False, "error": "No trends found"}
+
+    # Agents 2-4: content, visual and post
+    logger.info(f"[Agent 2] Creating {format_type} content...")
+    create, make_visual = route_stages('trend-jacker', data, research, topic)
+    content, visual, post, distribution = run_stages(data, research, create, make_visual, topic)
+    if format_type == 'carousel':
+        visual["slides"] = compose_slides(data, content, visual)
+
+    return {
+        "success": True,
+        "route": "trend-jacker",
+        "topic": topic,
+        "research": research,
+        "content": content,
+        "visual": visual,
+        "post": post,
+        "distribution": distribution,
+        "render": submit_render(data, format_type, content)
+    }
+
+
+def problem_solver_pipeline(data: dict) -> dict:
+    """
+    Route 2: Problem-Solver Pipeline
+    Creates solution-focused lead magnets for specific pain points.
+    """
+    pain_point = data.get('pain_point', 'No tengo estrategia de marketing')
+    format_type = job_format('problem-solver', data)
+
+    logger.info(f"[PROBLEM-SOLVER] Starting pipeline for: {pain_point}")
+
+    # Agent 1: Analyze pain point
+    research, _ = research_stage('problem-solver', data)
+
+    # Agents 2-4: content, visual and post
+    logger.info(f"[Agent 2] Creating {format_type} solution content...")
+    create, make_visual = route_stages('problem-solver', data, research, pain_point)
+    content, visual, post, distribution = run_stages(data, research, create, make_visual, pain_point)
+    if format_type == 'carousel':
+        visual["slides"] = compose_slides(data, content, visual)
+
+    return {
+        "success": True,
+        "route": "problem-solver",
+        "topic": pain_point,
+        "research": research,
+        "content": content,
+        "visual": visual,
+        "post": post,
+        "distribution": distribution,
+        "render": submit_render(data, format_type, content)
+    }
+
+
+def data_authority_pipeline(data: dict) -> dict:
+    """
+    Route 3: Data-Authority Pipeline
+    Creates data-driven reports for authority positioning.
+    """
+    topic = data.get('topic', 'Estado del Marketing')
+    industry = data.get('industry', 'marketing')
+
+    logger.info(f"[DATA-AUTHORITY] Starting pipeline for: {topic} in {industry}")
+
+    # Agent 1: Gather industry stats
+    stats_research, topic = research_stage('data-authority', data)
+
+    # Agents 2-4: data report, infographic hero and post
+    logger.info("[Agent 2] Creating data report...")
+    create, make_visual = route_stages('data-authority', data, stats_research, topic)
+    content, visual, post, distribution = run_stages(data, stats_research, create, make_visual, topic)
+
+    return {
+        "success": True,
+        "route": "data-authority",
+        "topic": topic,
+        "research": stats_research,
+        "content": content,
+        "visual": visual,
+        "post": post,
+        "distribution": distribution,
+        "render": submit_render(data, "datareport", content)
+    }
+
+
+PIPELINES = {
+    "trend-jacker": trend_jacker_pipeline,
+    "problem-solver": problem_solver_pipeline,
+    "data-authority": data_authority_pipeline
+}
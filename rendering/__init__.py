@@ -0,0 +1,3 @@
+from .engine import RenderEngine, render_document
+from .layouts import build_document
+from .slides import SlideComposer, brand_colors
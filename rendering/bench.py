@@ -0,0 +1,73 @@
+"""
+Render-time benchmark per format.
+Usage: python -m rendering.bench [iterations]
+"""
+
+import sys
+import json
+import tempfile
+from .engine import RenderEngine
+
+SAMPLE_SECTION = "Contenido de ejemplo para medir el tiempo de render. " * 20
+
+SAMPLES = {
+    "guide": {
+        "guide_title": "Guía de Marketing Estratégico", "subtitle": "De Spaghetti Marketing a un sistema",
+        "sections": [{"section_number": i, "title": f"Sección {i}", "content": SAMPLE_SECTION,
+                      "key_takeaway": "Estrategia antes de tácticas"} for i in range(1, 8)],
+        "bonus_checklist": [f"Acción {i}" for i in range(1, 11)], "cta_text": "Prueba FastStrat"
+    },
+    "checklist": {
+        "checklist_title": "Checklist de Marketing", "subtitle": "20 puntos",
+        "categories": [{"category_name": f"Categoría {c}",
+                        "items": [{"item": f"Item {c}.{i}", "why_important": "Porque importa", "metric": "KPI"}
+                                  for i in range(1, 6)]} for c in range(1, 5)],
+        "cta": "Prueba FastStrat"
+    },
+    "datareport": {
+        "report_title": "Estado del Marketing 2026", "executive_summary": SAMPLE_SECTION, "methodology": "Fuentes",
+        "sections": [{"section_title": f"Hallazgo {i}", "key_stat": "73% de PyMEs", "source": "HubSpot",
+                      "analysis": SAMPLE_SECTION, "implication": "Actuar ya"} for i in range(1, 5)],
+        "recommendations": [{"recommendation": f"Rec {i}", "priority": "alta", "how_faststrat_helps": "Automatiza"}
+                            for i in range(1, 6)],
+        "conclusion": "Conclusión"
+    },
+    "worksheet": {
+        "worksheet_title": "Worksheet de Diagnóstico", "introduction": SAMPLE_SECTION, "estimated_time": "30 min",
+        "exercises": [{"exercise_number": i, "title": f"Ejercicio {i}", "instructions": "Responde",
+                       "questions": [{"question": f"Pregunta {q}", "example_answer": "Ejemplo"} for q in range(1, 4)],
+                       "key_insight": "Insight"} for i in range(1, 7)],
+        "next_steps": "Siguientes pasos"
+    },
+    "toolkit": {
+        "toolkit_title": "Toolkit de Growth", "description": "Kit", "quick_start": "Empieza aquí",
+        "tools": [{"tool_name": f"Herramienta {i}", "description": "Sirve para", "content": SAMPLE_SECTION}
+                  for i in range(1, 7)],
+        "advanced_tips": ["Tip 1", "Tip 2"]
+    },
+    "cheatsheet": {
+        "cheatsheet_title": "Cheat Sheet de LinkedIn",
+        "sections": [{"section_name": f"Sección {i}", "format": "bullets",
+                      "content": [{"item": f"Item {j}", "detail": "Detalle breve"} for j in range(1, 7)]}
+                     for i in range(1, 5)],
+        "key_formulas": [{"name": "PASTOR", "formula": "P+A+S+T+O+R", "example": "Post"}],
+        "quick_reference_table": {"headers": ["Métrica", "Meta"], "rows": [["CTR", "2%"], ["ER", "5%"]]}
+    }
+}
+
+
+def run(iterations: int = 5) -> dict:
+    """Render every sample `iterations` times and return the engine's benchmarks."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = RenderEngine(tmp)
+        try:
+            ids = [engine.submit(fmt, content) for _ in range(iterations) for fmt, content in SAMPLES.items()]
+            for render_id in ids:
+                engine.wait(render_id)
+            return engine.benchmarks()
+        finally:
+            engine.shutdown()
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(int(sys.argv[1]) if len(sys.argv) > 1 else 5), indent=2))
@@ -0,0 +1,201 @@
+"""
+Rendering engine.
+Turns ProductArchitect JSON into HTML and PDF files in a process pool,
+so renders stay off the request thread.
+"""
+
+import json
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from .layouts import build_document, RENDER_FORMATS
+from .templates import get_template
+from .pdf import write_pdf
+
+logger = logging.getLogger(__name__)
+
+OUTPUTS = ("html", "pdf")
+
+
+def render_document(format_type: str, content: dict, out_dir: str, outputs: tuple = OUTPUTS) -> dict:
+    """
+    Render one document into `out_dir` (document.html, document.pdf). Runs
+    inside the pool workers. Files are streamed to a temporary name and
+    renamed when complete.
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    result = {"files": {}, "timings": {}, "errors": {}}
+
+    started = time.perf_counter()
+    document = build_document(format_type, content)
+    result["timings"]["layout"] = time.perf_counter() - started
+
+    if "html" in outputs:
+        started = time.perf_counter()
+        target = out / "document.html"
+        tmp = target.with_suffix(".html.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for chunk in get_template(format_type).generate(doc=document):
+                f.write(chunk)
+        tmp.replace(target)
+        result["files"]["html"] = target.name
+        result["timings"]["html"] = time.perf_counter() - started
+
+    if "pdf" in outputs:
+        started = time.perf_counter()
+        target = out / "document.pdf"
+        tmp = target.with_suffix(".pdf.tmp")
+        try:
+            write_pdf(document, str(tmp))
+            tmp.replace(target)
+            result["files"]["pdf"] = target.name
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            result["errors"]["pdf"] = str(e)
+        result["timings"]["pdf"] = time.perf_counter() - started
+
+    return result
+
+
+class RenderEngine:
+    """
+    Submits renders to a process pool and tracks their status and timings.
+    Each render writes into its own directory under `output_dir`, with its
+    status in status.json, so any process sharing the directory (the web
+    node, for renders started by a queue worker) can report it.
+    """
+
+    def __init__(self, output_dir: Path, max_workers: int = 2, history_size: int = 200):
+        self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
+        self.history_size = history_size
+        self._executor = None
+        self._renders = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Create the pool lazily; spawn avoids forking the web process's threads."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def submit(self, format_type: str, content: dict, outputs: tuple = OUTPUTS) -> str:
+        """Queue a render and return its id. Raises ValueError for an unknown format."""
+        if format_type not in RENDER_FORMATS:
+            raise ValueError(f"Unknown format: {format_type}. Available: {sorted(RENDER_FORMATS)}")
+        render_id = uuid.uuid4().hex[:12]
+        out_dir = self.output_dir / render_id
+        future = self._pool().submit(render_document, format_type, content, str(out_dir), tuple(outputs))
+        with self._lock:
+            self._renders[render_id] = {
+                "render_id": render_id,
+                "format": format_type,
+                "status": "rendering",
+                "submitted_at": time.time(),
+                "future": future
+            }
+            self._write_status(self._renders[render_id])
+        future.add_done_callback(lambda f: self._finish(render_id, f))
+        return render_id
+
+    def _finish(self, render_id: str, future):
+        """Record the outcome and per-format timings of a render."""
+        with self._lock:
+            render = self._renders.get(render_id)
+            if render is None:
+                return
+            render.pop("future", None)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Render {render_id} failed: {e}")
+                render.update({"status": "failed", "error": str(e)})
+                self._write_status(render)
+                return
+            render.update({
+                "status": "done",
+                "files": result["files"],
+                "errors": result["errors"],
+                "timings": result["timings"],
+                "total_seconds": time.time() - render["submitted_at"]
+            })
+            self._write_status(render)
+            by_output = self._timings.setdefault(render["format"], {})
+            for output, seconds in result["timings"].items():
+                history = by_output.setdefault(output, [])
+                history.append(seconds)
+                del history[:-self.history_size]
+
+    def status(self, render_id: str) -> Optional[dict]:
+        """Public status of a render, or None if unknown."""
+        with self._lock:
+            render = self._renders.get(render_id)
+            if render:
+                return {k: v for k, v in render.items() if k != "future"}
+        # Started by another process sharing output_dir
+        path = self.output_dir / render_id / "status.json"
+        if not render_id.isalnum() or not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_status(self, render: dict):
+        """Persist the public status of a render next to its files. Caller must hold the lock."""
+        out_dir = self.output_dir / render["render_id"]
+        try:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            tmp = out_dir / "status.json.tmp"
+            tmp.write_text(json.dumps({k: v for k, v in render.items() if k != "future"}))
+            tmp.replace(out_dir / "status.json")
+        except OSError as e:
+            logger.warning(f"Could not save status of render {render['render_id']}: {e}")
+
+    def wait(self, render_id: str, timeout: float = None) -> Optional[dict]:
+        """Block until a render finishes (or the timeout expires) and return its status."""
+        with self._lock:
+            render = self._renders.get(render_id)
+            future = render.get("future") if render else None
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+            # The done callback may still be running on the pool's thread
+            deadline = time.time() + 1
+            while time.time() < deadline and (self.status(render_id) or {}).get("status") == "rendering":
+                time.sleep(0.01)
+        return self.status(render_id)
+
+    def benchmarks(self) -> dict:
+        """Render-time stats per format and output, in milliseconds."""
+        with self._lock:
+            stats = {}
+            for format_type, by_output in self._timings.items():
+                stats[format_type] = {}
+                for output, history in by_output.items():
+                    ordered = sorted(history)
+                    stats[format_type][output] = {
+                        "count": len(ordered),
+                        "avg_ms": round(1000 * sum(ordered) / len(ordered), 1),
+                        "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 1)
+                    }
+            return stats
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
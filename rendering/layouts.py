@@ -0,0 +1,216 @@
+"""
+Document layouts.
+Map each ProductArchitect JSON schema to a flat list of blocks that both
+the HTML templates and the PDF builder know how to draw.
+
+Block types:
+- heading:   {"type": "heading", "text": str, "level": 1|2|3}
+- paragraph: {"type": "paragraph", "text": str}
+- bullets:   {"type": "bullets", "items": [str]}
+- checklist: {"type": "checklist", "items": [str]}
+- table:     {"type": "table", "headers": [str], "rows": [[str]]}
+- callout:   {"type": "callout", "text": str}
+"""
+
+
+def _text(value) -> str:
+    """Best-effort string for a schema value."""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_text(v) for v in value)
+    if isinstance(value, dict):
+        return " — ".join(_text(v) for v in value.values() if v)
+    return str(value)
+
+
+def _heading(text, level: int = 2) -> list:
+    return [{"type": "heading", "text": _text(text), "level": level}] if text else []
+
+
+def _paragraph(text) -> list:
+    return [{"type": "paragraph", "text": _text(text)}] if text else []
+
+
+def _bullets(items) -> list:
+    items = [_text(i) for i in (items or []) if i]
+    return [{"type": "bullets", "items": items}] if items else []
+
+
+def _callout(text) -> list:
+    return [{"type": "callout", "text": _text(text)}] if text else []
+
+
+def guide_blocks(content: dict) -> list:
+    blocks = _paragraph(content.get("target_audience") and f"Para: {content['target_audience']}")
+    for section in content.get("sections", []):
+        blocks += _heading(section.get("title"))
+        blocks += _paragraph(section.get("content"))
+        blocks += _callout(section.get("key_takeaway"))
+    if content.get("bonus_checklist"):
+        blocks += _heading("Checklist de implementación")
+        blocks.append({"type": "checklist", "items": [_text(i) for i in content["bonus_checklist"]]})
+    blocks += _callout(content.get("cta_text"))
+    return blocks
+
+
+def checklist_blocks(content: dict) -> list:
+    blocks = _paragraph(content.get("estimated_completion_time")
+                        and f"Tiempo estimado: {content['estimated_completion_time']}")
+    for category in content.get("categories", []):
+        blocks += _heading(category.get("category_name"))
+        items = []
+        for item in category.get("items", []):
+            line = _text(item.get("item")) if isinstance(item, dict) else _text(item)
+            if isinstance(item, dict) and item.get("why_important"):
+                line += f" — {item['why_important']}"
+            if isinstance(item, dict) and item.get("metric"):
+                line += f" (Métrica: {item['metric']})"
+            items.append(line)
+        if items:
+            blocks.append({"type": "checklist", "items": items})
+    blocks += _callout(content.get("cta"))
+    return blocks
+
+
+def datareport_blocks(content: dict) -> list:
+    blocks = _heading("Resumen ejecutivo") + _paragraph(content.get("executive_summary"))
+    blocks += _heading("Metodología") + _paragraph(content.get("methodology"))
+    for section in content.get("sections", []):
+        blocks += _heading(section.get("section_title"))
+        if section.get("key_stat"):
+            source = f" ({section['source']})" if section.get("source") else ""
+            blocks += _callout(f"{section['key_stat']}{source}")
+        blocks += _paragraph(section.get("analysis"))
+        blocks += _paragraph(section.get("implication") and f"Implicación: {section['implication']}")
+    recommendations = content.get("recommendations", [])
+    if recommendations:
+        blocks += _heading("Recomendaciones")
+        blocks.append({
+            "type": "table",
+            "headers": ["Recomendación", "Prioridad", "Cómo ayuda FastStrat"],
+            "rows": [[_text(r.get("recommendation")), _text(r.get("priority")), _text(r.get("how_faststrat_helps"))]
+                     for r in recommendations if isinstance(r, dict)]
+        })
+    blocks += _heading("Conclusión") + _paragraph(content.get("conclusion"))
+    return blocks
+
+
+def worksheet_blocks(content: dict) -> list:
+    blocks = _paragraph(content.get("introduction"))
+    blocks += _paragraph(content.get("estimated_time") and f"Tiempo estimado: {content['estimated_time']}")
+    for exercise in content.get("exercises", []):
+        number = exercise.get("exercise_number")
+        blocks += _heading(f"Ejercicio {number}: {exercise.get('title', '')}" if number else exercise.get("title"))
+        blocks += _paragraph(exercise.get("instructions"))
+        for question in exercise.get("questions", []):
+            if isinstance(question, dict):
+                blocks += _heading(question.get("question"), level=3)
+                blocks += _paragraph(question.get("example_answer")
+                                     and f"Ejemplo: {question['example_answer']}")
+                blocks.append({"type": "paragraph", "text": "_" * 60})
+            else:
+                blocks += _heading(question, level=3)
+        blocks += _callout(exercise.get("key_insight"))
+    blocks += _heading("Interpretación") + _paragraph(content.get("scoring_guide"))
+    blocks += _heading("Siguientes pasos") + _paragraph(content.get("next_steps"))
+    blocks += _callout(content.get("faststrat_connection"))
+    return blocks
+
+
+def toolkit_blocks(content: dict) -> list:
+    blocks = _paragraph(content.get("description"))
+    blocks += _callout(content.get("problem_solved") and f"Problema que resuelve: {content['problem_solved']}")
+    blocks += _heading("Empieza en 5 minutos") + _paragraph(content.get("quick_start"))
+    for tool in content.get("tools", []):
+        blocks += _heading(tool.get("tool_name"))
+        blocks += _paragraph(tool.get("description"))
+        blocks += _paragraph(tool.get("when_to_use") and f"Cuándo usarla: {tool['when_to_use']}")
+        blocks += _paragraph(tool.get("content"))
+        blocks += _paragraph(tool.get("instructions") and f"Cómo usarla: {tool['instructions']}")
+    blocks += _heading("Orden de implementación") + _paragraph(content.get("implementation_order"))
+    if content.get("advanced_tips"):
+        blocks += _heading("Tips avanzados") + _bullets(content["advanced_tips"])
+    blocks += _callout(content.get("faststrat_upgrade"))
+    return blocks
+
+
+def cheatsheet_blocks(content: dict) -> list:
+    blocks = []
+    for section in content.get("sections", []):
+        blocks += _heading(section.get("section_name"))
+        items = [f"{_text(i.get('item'))}: {_text(i.get('detail'))}" if isinstance(i, dict) else _text(i)
+                 for i in section.get("content", [])]
+        block_type = "checklist" if section.get("format") == "checklist" else "bullets"
+        if items:
+            blocks.append({"type": block_type, "items": items})
+    formulas = content.get("key_formulas", [])
+    if formulas:
+        blocks += _heading("Fórmulas clave")
+        blocks.append({
+            "type": "table",
+            "headers": ["Framework", "Fórmula", "Ejemplo"],
+            "rows": [[_text(f.get("name")), _text(f.get("formula")), _text(f.get("example"))]
+                     for f in formulas if isinstance(f, dict)]
+        })
+    table = content.get("quick_reference_table") or {}
+    if table.get("rows"):
+        blocks += _heading("Referencia rápida")
+        blocks.append({"type": "table", "headers": [_text(h) for h in table.get("headers", [])],
+                       "rows": [[_text(c) for c in row] for row in table["rows"]]})
+    if content.get("common_mistakes"):
+        blocks += _heading("Errores comunes") + _bullets(content["common_mistakes"])
+    if content.get("pro_tips"):
+        blocks += _heading("Tips pro") + _bullets(content["pro_tips"])
+    blocks += _callout(content.get("footer_cta"))
+    return blocks
+
+
+def generic_blocks(content: dict, level: int = 2) -> list:
+    """Fallback layout that walks any JSON document."""
+    blocks = []
+    for key, value in content.items():
+        if key in TITLE_KEYS or key == "subtitle":
+            continue
+        label = key.replace("_", " ").capitalize()
+        if isinstance(value, dict):
+            blocks += _heading(label, level) + generic_blocks(value, min(level + 1, 3))
+        elif isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+            blocks += _heading(label, level)
+            for item in value:
+                blocks += generic_blocks(item, min(level + 1, 3))
+        elif isinstance(value, list):
+            blocks += _heading(label, level) + _bullets(value)
+        else:
+            blocks += _heading(label, 3) + _paragraph(value)
+    return blocks
+
+
+TITLE_KEYS = ['guide_title', 'checklist_title', 'carousel_title', 'cheatsheet_title',
+              'template_title', 'swipefile_title', 'course_title', 'worksheet_title',
+              'toolkit_title', 'case_study_title', 'report_title']
+
+LAYOUTS = {
+    "guide": guide_blocks,
+    "checklist": checklist_blocks,
+    "datareport": datareport_blocks,
+    "worksheet": worksheet_blocks,
+    "toolkit": toolkit_blocks,
+    "cheatsheet": cheatsheet_blocks
+}
+
+# Formats that can be rendered: the ones with their own layout, plus the
+# lead magnet formats laid out by generic_blocks
+RENDER_FORMATS = frozenset(LAYOUTS) | {"carousel", "template", "minicourse", "swipefile", "casestudy"}
+
+
+def build_document(format_type: str, content: dict) -> dict:
+    """Turn a ProductArchitect JSON document into {"title", "subtitle", "blocks"}."""
+    title = next((content.get(k) for k in TITLE_KEYS if content.get(k)), "FastStrat")
+    layout = LAYOUTS.get(format_type, generic_blocks)
+    return {
+        "format": format_type,
+        "title": _text(title),
+        "subtitle": _text(content.get("subtitle", "")),
+        "blocks": layout(content)
+    }
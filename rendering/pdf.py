@@ -0,0 +1,108 @@
+"""
+PDF builder.
+Draws a layout document (see layouts.py) with reportlab, in FastStrat colours.
+"""
+
+from xml.sax.saxutils import escape
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import (ListFlowable, ListItem, PageBreak, Paragraph, SimpleDocTemplate,
+                                    Spacer, Table, TableStyle)
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+PRIMARY = "#6366F1"
+SECONDARY = "#10B981"
+DARK = "#1F2937"
+
+
+def _styles() -> dict:
+    """Paragraph styles for the document."""
+    base = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle("FSTitle", parent=base["Title"], textColor=colors.HexColor(PRIMARY),
+                                fontSize=28, leading=34, alignment=0),
+        "subtitle": ParagraphStyle("FSSubtitle", parent=base["Normal"], textColor=colors.HexColor(DARK),
+                                   fontSize=14, leading=18),
+        1: ParagraphStyle("FSH1", parent=base["Heading1"], textColor=colors.HexColor(PRIMARY)),
+        2: ParagraphStyle("FSH2", parent=base["Heading2"], textColor=colors.HexColor(PRIMARY)),
+        3: ParagraphStyle("FSH3", parent=base["Heading3"], textColor=colors.HexColor(DARK)),
+        "body": ParagraphStyle("FSBody", parent=base["BodyText"], fontSize=10.5, leading=15),
+        "callout": ParagraphStyle("FSCallout", parent=base["BodyText"], fontSize=11, leading=15,
+                                  backColor=colors.HexColor("#EEF2FF"), borderPadding=8,
+                                  leftIndent=8, rightIndent=8, spaceBefore=8, spaceAfter=12),
+        "cell": ParagraphStyle("FSCell", parent=base["BodyText"], fontSize=9, leading=12)
+    }
+
+
+def _flowables(document: dict, styles: dict) -> list:
+    """Convert layout blocks into reportlab flowables."""
+    story = [
+        Spacer(1, 40 * mm),
+        Paragraph(escape(document["title"]), styles["title"]),
+        Spacer(1, 6 * mm)
+    ]
+    if document.get("subtitle"):
+        story.append(Paragraph(escape(document["subtitle"]), styles["subtitle"]))
+    story.append(PageBreak())
+
+    for block in document["blocks"]:
+        kind = block["type"]
+        if kind == "heading":
+            story.append(Paragraph(escape(block["text"]), styles[block.get("level", 2)]))
+        elif kind == "paragraph":
+            story.append(Paragraph(escape(block["text"]).replace("\n", "<br/>"), styles["body"]))
+        elif kind == "callout":
+            story.append(Paragraph(escape(block["text"]), styles["callout"]))
+        elif kind in ("bullets", "checklist"):
+            bullet = "□" if kind == "checklist" else "•"
+            story.append(ListFlowable(
+                [ListItem(Paragraph(escape(item), styles["body"]), value=bullet) for item in block["items"]],
+                bulletType="bullet", start=bullet, leftIndent=14
+            ))
+        elif kind == "table":
+            rows = [[Paragraph(escape(str(cell)), styles["cell"]) for cell in row] for row in block["rows"]]
+            if block.get("headers"):
+                rows.insert(0, [Paragraph(f"<b>{escape(h)}</b>", styles["cell"]) for h in block["headers"]])
+            if not rows:
+                continue
+            table = Table(rows, repeatRows=1 if block.get("headers") else 0)
+            table.setStyle(TableStyle([
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#EEF2FF")),
+                ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#E5E7EB")),
+                ("VALIGN", (0, 0), (-1, -1), "TOP")
+            ]))
+            story.append(table)
+        story.append(Spacer(1, 3 * mm))
+    return story
+
+
+def _decorate_page(canvas, doc):
+    """Brand band and footer on every page."""
+    width, height = A4
+    canvas.saveState()
+    canvas.setFillColor(colors.HexColor(PRIMARY))
+    canvas.rect(0, height - 8 * mm, width, 8 * mm, stroke=0, fill=1)
+    canvas.setFillColor(colors.HexColor(SECONDARY))
+    canvas.rect(0, height - 10 * mm, width, 2 * mm, stroke=0, fill=1)
+    canvas.setFillColor(colors.HexColor("#6B7280"))
+    canvas.setFont("Helvetica", 8)
+    canvas.drawString(18 * mm, 10 * mm, "FastStrat · Departamento de Marketing IA")
+    canvas.drawRightString(width - 18 * mm, 10 * mm, str(doc.page))
+    canvas.restoreState()
+
+
+def write_pdf(document: dict, path: str):
+    """Write the document as a PDF to `path`."""
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError("PDF rendering requires reportlab (pip install reportlab)")
+    pdf = SimpleDocTemplate(
+        path, pagesize=A4, title=document["title"], author="FastStrat",
+        leftMargin=18 * mm, rightMargin=18 * mm, topMargin=20 * mm, bottomMargin=20 * mm
+    )
+    pdf.build(_flowables(document, _styles()), onFirstPage=_decorate_page, onLaterPages=_decorate_page)
@@ -0,0 +1,224 @@
+"""
+Local carousel slide compositor.
+Typesets every slide of a carousel over one brand background, producing a
+1080x1350 PNG per slide plus a carousel PDF, with slides rendered in parallel.
+"""
+
+import io
+import os
+import re
+import time
+import uuid
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SLIDE_SIZE = (1080, 1350)
+MARGIN = 96
+
+DEFAULT_COLORS = {
+    "primary": "#6366F1",
+    "secondary": "#10B981",
+    "accent": "#F59E0B",
+    "dark": "#1F2937",
+    "light": "#F9FAFB"
+}
+
+FONT_CANDIDATES = {
+    "bold": ["/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", "/Library/Fonts/Arial Bold.ttf", "arialbd.ttf"],
+    "regular": ["/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/Library/Fonts/Arial.ttf", "arial.ttf"]
+}
+
+
+def brand_colors(guidelines: str) -> dict:
+    """Extract the palette from VISUAL_BRAND_GUIDELINES ("- Primary: #6366F1 ...")."""
+    colors = dict(DEFAULT_COLORS)
+    for name, value in re.findall(r"-\s*(\w+):\s*(#[0-9A-Fa-f]{6})", guidelines or ""):
+        colors[name.lower()] = value
+    return colors
+
+
+def _font(weight: str, size: int):
+    """Load a TrueType font (SLIDE_FONT_PATH / SLIDE_FONT_BOLD_PATH first), else Pillow's default."""
+    override = os.getenv("SLIDE_FONT_BOLD_PATH" if weight == "bold" else "SLIDE_FONT_PATH")
+    for path in ([override] if override else []) + FONT_CANDIDATES[weight]:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def _hex(color: str) -> tuple:
+    color = color.lstrip("#")
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _wrap(draw, text: str, font, max_width: int) -> list:
+    """Greedy word wrap to a pixel width."""
+    lines = []
+    for paragraph in (text or "").split("\n"):
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}".strip()
+            if draw.textlength(candidate, font=font) <= max_width or not line:
+                line = candidate
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+
+def _gradient_background(colors: dict):
+    """Brand gradient used when no generated background is available."""
+    width, height = SLIDE_SIZE
+    start, end = _hex(colors["primary"]), _hex(colors["secondary"])
+    column = Image.new("RGB", (1, height))
+    for y in range(height):
+        t = y / (height - 1)
+        column.putpixel((0, y), tuple(int(start[i] + (end[i] - start[i]) * t) for i in range(3)))
+    return column.resize(SLIDE_SIZE)
+
+
+def _cover_crop(image):
+    """Scale and center-crop an image to fill the slide."""
+    width, height = SLIDE_SIZE
+    scale = max(width / image.width, height / image.height)
+    resized = image.resize((int(image.width * scale) + 1, int(image.height * scale) + 1))
+    left = (resized.width - width) // 2
+    top = (resized.height - height) // 2
+    return resized.crop((left, top, left + width, top + height))
+
+
+def compose_slide(slide: dict, total: int, background_path: Optional[str], out_path: str, colors: dict) -> str:
+    """Render one slide to a PNG. Runs inside the pool workers."""
+    if background_path and Path(background_path).exists():
+        base = _cover_crop(Image.open(background_path).convert("RGB"))
+    else:
+        base = _gradient_background(colors)
+
+    # Darken the background so text stays legible on any generated image
+    overlay = Image.new("RGBA", SLIDE_SIZE, _hex(colors["dark"]) + (170,))
+    image = Image.alpha_composite(base.convert("RGBA"), overlay)
+    draw = ImageDraw.Draw(image)
+    width, height = SLIDE_SIZE
+    text_width = width - 2 * MARGIN
+    number = slide.get("slide_number") or 1
+
+    title_font = _font("bold", 78 if number == 1 else 64)
+    body_font = _font("regular", 40)
+    small_font = _font("bold", 28)
+
+    draw.rectangle([MARGIN, MARGIN, MARGIN + 120, MARGIN + 10], fill=_hex(colors["secondary"]))
+
+    y = MARGIN + 60
+    for line in _wrap(draw, slide.get("title", ""), title_font, text_width):
+        draw.text((MARGIN, y), line, font=title_font, fill=_hex(colors["light"]))
+        y += int(title_font.size * 1.2)
+
+    y += 40
+    for line in _wrap(draw, slide.get("body", ""), body_font, text_width):
+        if y > height - MARGIN - 120:
+            break
+        draw.text((MARGIN, y), line, font=body_font, fill=_hex(colors["light"]))
+        y += int(body_font.size * 1.45)
+
+    footer_y = height - MARGIN - small_font.size
+    draw.text((MARGIN, footer_y), "FastStrat", font=small_font, fill=_hex(colors["secondary"]))
+    counter = f"{number}/{total}"
+    draw.text((width - MARGIN - draw.textlength(counter, font=small_font), footer_y), counter,
+              font=small_font, fill=_hex(colors["light"]))
+    if number < total:
+        arrow = "→"
+        draw.text((width // 2 - draw.textlength(arrow, font=small_font) // 2, footer_y), arrow,
+                  font=small_font, fill=_hex(colors["accent"]))
+
+    image.convert("RGB").save(out_path, "PNG", optimize=True)
+    return out_path
+
+
+class SlideComposer:
+    """
+    Composes carousel slides locally in a process pool.
+    Each carousel gets its own directory under `output_dir`.
+    """
+
+    def __init__(self, output_dir: Path, colors: dict = None, max_workers: int = None):
+        self.output_dir = Path(output_dir)
+        self.colors = colors or dict(DEFAULT_COLORS)
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Create the pool lazily; spawn avoids forking the web process's threads."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def compose(self, slides: list, background: bytes = None) -> dict:
+        """
+        Render every slide over `background` (image bytes, or the brand
+        gradient when None) and bundle them into a PDF.
+        """
+        if not PIL_AVAILABLE:
+            return {"success": False, "error": "Slide composition requires Pillow (pip install Pillow)"}
+        if not slides:
+            return {"success": False, "error": "No slides to compose"}
+
+        started = time.perf_counter()
+        carousel_id = uuid.uuid4().hex[:12]
+        out_dir = self.output_dir / carousel_id
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        background_path = None
+        if background:
+            try:
+                background_path = out_dir / "background.png"
+                Image.open(io.BytesIO(background)).convert("RGB").save(background_path, "PNG")
+            except Exception as e:
+                logger.warning(f"Unusable background image, using brand gradient: {e}")
+                background_path = None
+
+        # Number slides by position; the model's slide_number is not always an int
+        slides = [dict(slide, slide_number=i) for i, slide in enumerate(slides, 1)]
+        futures = [
+            self._pool().submit(compose_slide, slide, len(slides),
+                                str(background_path) if background_path else None,
+                                str(out_dir / f"slide_{slide['slide_number']:02d}.png"), self.colors)
+            for slide in slides
+        ]
+        try:
+            paths = [Path(f.result()) for f in futures]
+            pages = [Image.open(path).convert("RGB") for path in paths]
+            pdf_path = out_dir / "carousel.pdf"
+            pages[0].save(pdf_path, "PDF", save_all=True, append_images=pages[1:], resolution=150)
+        except Exception as e:
+            logger.error(f"Slide composition of {carousel_id} failed: {e}")
+            return {"success": False, "error": f"Slide composition failed: {e}"}
+
+        return {
+            "success": True,
+            "carousel_id": carousel_id,
+            "slides": [path.name for path in paths],
+            "pdf": pdf_path.name,
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
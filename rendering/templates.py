@@ -0,0 +1,97 @@
+"""
+HTML templates per lead magnet format.
+Templates are compiled once per process and cached.
+"""
+
+from functools import lru_cache
+from jinja2 import DictLoader, Environment, select_autoescape
+
+BASE_HTML = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="UTF-8">
+<title>{{ doc.title }}</title>
+<style>
+    body { font-family: 'Helvetica Neue', Arial, sans-serif; color: #1F2937; background: #F9FAFB; margin: 0; }
+    .page { max-width: 820px; margin: 0 auto; background: #fff; padding: 56px 64px; }
+    .cover { background: linear-gradient(135deg, #6366F1, {% block accent %}#10B981{% endblock %});
+             color: #fff; padding: 72px 64px; }
+    .cover h1 { font-size: 2.4em; margin: 0 0 12px; }
+    .cover p { font-size: 1.2em; opacity: 0.9; margin: 0; }
+    .tag { text-transform: uppercase; letter-spacing: 2px; font-size: 0.8em; opacity: 0.8; }
+    h2 { color: #6366F1; margin-top: 1.8em; }
+    h3 { color: #1F2937; margin-top: 1.2em; }
+    p { line-height: 1.6; }
+    .callout { border-left: 4px solid {{ self.accent() }}; background: #EEF2FF; padding: 12px 16px; margin: 16px 0; }
+    ul.checklist { list-style: none; padding-left: 0; }
+    ul.checklist li::before { content: "\\2610  "; color: #6366F1; }
+    table { border-collapse: collapse; width: 100%; margin: 16px 0; }
+    th { background: #6366F1; color: #fff; text-align: left; }
+    th, td { padding: 8px 10px; border: 1px solid #E5E7EB; vertical-align: top; }
+    footer { text-align: center; color: #6B7280; font-size: 0.85em; padding: 24px; }
+    {% block extra_style %}{% endblock %}
+</style>
+</head>
+<body>
+<div class="cover">
+    <div class="tag">{% block label %}FastStrat{% endblock %}</div>
+    <h1>{{ doc.title }}</h1>
+    {% if doc.subtitle %}<p>{{ doc.subtitle }}</p>{% endif %}
+</div>
+<div class="page">
+{% for block in doc.blocks %}
+    {% if block.type == "heading" %}
+    <h{{ block.level }}>{{ block.text }}</h{{ block.level }}>
+    {% elif block.type == "paragraph" %}
+    <p>{{ block.text }}</p>
+    {% elif block.type == "callout" %}
+    <div class="callout">{{ block.text }}</div>
+    {% elif block.type in ("bullets", "checklist") %}
+    <ul class="{{ block.type }}">{% for item in block["items"] %}<li>{{ item }}</li>{% endfor %}</ul>
+    {% elif block.type == "table" %}
+    <table>
+        {% if block.headers %}<tr>{% for h in block.headers %}<th>{{ h }}</th>{% endfor %}</tr>{% endif %}
+        {% for row in block.rows %}<tr>{% for cell in row %}<td>{{ cell }}</td>{% endfor %}</tr>{% endfor %}
+    </table>
+    {% endif %}
+{% endfor %}
+</div>
+<footer>FastStrat · Departamento de Marketing IA</footer>
+</body>
+</html>
+"""
+
+FORMAT_TEMPLATES = {
+    "guide.html": """{% extends "base.html" %}{% block label %}Guía FastStrat{% endblock %}""",
+    "checklist.html": """{% extends "base.html" %}{% block label %}Checklist{% endblock %}
+{% block extra_style %}ul.checklist li { padding: 6px 0; border-bottom: 1px dashed #E5E7EB; }{% endblock %}""",
+    "datareport.html": """{% extends "base.html" %}{% block label %}Reporte de Datos{% endblock %}
+{% block accent %}#F59E0B{% endblock %}
+{% block extra_style %}.callout { font-size: 1.3em; font-weight: bold; }{% endblock %}""",
+    "worksheet.html": """{% extends "base.html" %}{% block label %}Worksheet{% endblock %}
+{% block extra_style %}h3 { border-top: 1px solid #E5E7EB; padding-top: 12px; }{% endblock %}""",
+    "toolkit.html": """{% extends "base.html" %}{% block label %}Toolkit{% endblock %}""",
+    "cheatsheet.html": """{% extends "base.html" %}{% block label %}Cheat Sheet{% endblock %}
+{% block extra_style %}.page { padding: 32px 40px; font-size: 0.92em; } h2 { margin-top: 1.2em; }{% endblock %}""",
+    "generic.html": """{% extends "base.html" %}"""
+}
+
+
+@lru_cache(maxsize=1)
+def get_environment() -> Environment:
+    """Jinja environment holding every format template (one per process)."""
+    return Environment(
+        loader=DictLoader({"base.html": BASE_HTML, **FORMAT_TEMPLATES}),
+        autoescape=select_autoescape(default=True),
+        trim_blocks=True,
+        lstrip_blocks=True
+    )
+
+
+@lru_cache(maxsize=None)
+def get_template(format_type: str):
+    """Compiled template for a format, falling back to the generic one."""
+    name = f"{format_type}.html"
+    if name not in FORMAT_TEMPLATES:
+        name = "generic.html"
+    return get_environment().get_template(name)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Run from anywhere: the agents package lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
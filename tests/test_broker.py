@@ -0,0 +1,98 @@
+import pytest
+
+from agents.broker import SQLiteBroker, broker_from_url
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return SQLiteBroker(tmp_path / "broker.db")
+
+
+def test_reserve_hides_task_until_ack(broker):
+    task_id = broker.enqueue("jobs", {"topic": "AI"})
+    task = broker.reserve("jobs", visibility_timeout=60)
+    assert task["id"] == task_id
+    assert task["payload"] == {"topic": "AI"}
+    assert task["state"] == "running" and task["attempts"] == 1
+    assert broker.reserve("jobs", visibility_timeout=60) is None
+    assert broker.depth("jobs") == 1
+
+    broker.ack(task_id, {"success": True})
+    task = broker.get(task_id)
+    assert task["state"] == "done" and task["result"] == {"success": True}
+    assert broker.depth("jobs") == 0
+
+
+def test_queues_are_separate(broker):
+    broker.enqueue("other", {})
+    assert broker.reserve("jobs", visibility_timeout=60) is None
+
+
+def test_nack_requeues_after_delay(broker):
+    task_id = broker.enqueue("jobs", {})
+    broker.reserve("jobs", visibility_timeout=60)
+    broker.nack(task_id, "boom", retry_delay=60)
+    assert broker.get(task_id)["state"] == "queued"
+    assert broker.reserve("jobs", visibility_timeout=60) is None
+
+    task_id = broker.enqueue("retry", {})
+    broker.reserve("retry", visibility_timeout=60)
+    broker.nack(task_id, "boom")
+    task = broker.reserve("retry", visibility_timeout=60)
+    assert task["id"] == task_id and task["attempts"] == 2 and task["error"] == "boom"
+
+
+def test_nack_on_last_attempt_fails(broker):
+    task_id = broker.enqueue("jobs", {}, max_attempts=1)
+    broker.reserve("jobs", visibility_timeout=60)
+    broker.nack(task_id, "boom")
+    assert broker.get(task_id)["state"] == "failed"
+    assert broker.reserve("jobs", visibility_timeout=60) is None
+
+
+def test_expired_reservation_is_redelivered(broker):
+    task_id = broker.enqueue("jobs", {})
+    broker.reserve("jobs", visibility_timeout=0)
+    task = broker.reserve("jobs", visibility_timeout=60)
+    assert task["id"] == task_id and task["attempts"] == 2
+
+
+def test_expired_reservation_on_last_attempt_fails(broker):
+    task_id = broker.enqueue("jobs", {}, max_attempts=1)
+    broker.reserve("jobs", visibility_timeout=0)
+    assert broker.reserve("jobs", visibility_timeout=60) is None
+    task = broker.get(task_id)
+    assert task["state"] == "failed" and task["error"] == "Worker lost on last attempt"
+
+
+def test_extend_keeps_running_task_hidden(broker):
+    task_id = broker.enqueue("jobs", {})
+    broker.reserve("jobs", visibility_timeout=0)
+    assert broker.extend(task_id, 60)
+    assert broker.reserve("jobs", visibility_timeout=60) is None
+    broker.ack(task_id, {})
+    assert not broker.extend(task_id, 60)
+
+
+def test_cancel_stops_queued_and_running_tasks(broker):
+    queued = broker.enqueue("jobs", {})
+    assert broker.cancel(queued, reason="cancelled_by_user")
+    assert broker.get(queued)["state"] == "cancelled"
+    assert broker.get(queued)["error"] == "cancelled_by_user"
+    assert broker.reserve("jobs", visibility_timeout=60) is None
+
+    running = broker.enqueue("jobs", {})
+    broker.reserve("jobs", visibility_timeout=60)
+    assert broker.cancel(running)
+    # A late ack or nack from the worker does not revive it
+    broker.ack(running, {"success": True})
+    broker.nack(running, "boom")
+    assert broker.get(running)["state"] == "cancelled"
+    assert not broker.cancel(running)
+    assert not broker.extend(running, 60)
+
+
+def test_broker_from_url(tmp_path):
+    assert isinstance(broker_from_url(f"sqlite://{tmp_path / 'b.db'}"), SQLiteBroker)
+    with pytest.raises(ValueError):
+        broker_from_url("redis://localhost")
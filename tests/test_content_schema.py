@@ -0,0 +1,109 @@
+import copy
+
+from agents.content_schema import validate, repair_plan, renumber, path_str, example, SCHEMAS
+
+
+def carousel(slides=8):
+    return {
+        "carousel_title": "Title",
+        "hook": "Hook",
+        "slides": [{"slide_number": i + 1, "title": f"Slide {i + 1}", "body": "Body"} for i in range(slides)],
+        "comment_trigger": "GUIDE"
+    }
+
+
+def kinds(problems):
+    return {(path_str(p.path), p.kind) for p in problems}
+
+
+def test_valid_document_has_no_problems():
+    assert validate("carousel", carousel()) == []
+
+
+def test_undeclared_format_is_not_checked():
+    assert validate("unknown", {}) == []
+
+
+def test_numbers_count_as_text():
+    content = {
+        "case_study_title": "T", "key_takeaway": "K",
+        "company_profile": {"type": "SaaS", "industry": "B2B", "initial_situation": "..."},
+        "challenge": {"main_problem": "..."},
+        "solution": {"approach": "...", "steps": [{"action": "a", "rationale": "r"}] * 3},
+        "results": {"metrics": [{"metric": "MRR", "before": 120, "after": 340.5}] * 2},
+        "lessons_learned": [{"lesson": "l", "application": "a"}] * 2
+    }
+    assert validate("casestudy", content) == []
+
+
+def test_reports_missing_invalid_and_list_sizes():
+    content = carousel(13)
+    del content["hook"]
+    content["comment_trigger"] = ["not", "text"]
+    content["slides"][2]["body"] = "   "
+    assert kinds(validate("carousel", content)) == {
+        ("hook", "missing"),
+        ("comment_trigger", "invalid"),
+        ("slides[2].body", "invalid"),
+        ("slides", "too_many"),
+    }
+    assert kinds(validate("carousel", carousel(3))) == {("slides", "too_few")}
+
+
+def test_repair_plan_regenerates_only_broken_fields():
+    content = carousel()
+    del content["hook"]
+    del content["comment_trigger"]
+    assert repair_plan("carousel", content, validate("carousel", content)) == [
+        ("fields", (), ["hook", "comment_trigger"])
+    ]
+
+
+def test_repair_plan_replaces_broken_items_and_adds_missing_ones():
+    content = carousel(6)
+    content["slides"][1]["title"] = ""
+    content["slides"][4] = "not an object"
+    assert repair_plan("carousel", content, validate("carousel", content)) == [
+        ("items", ("slides",), [1, 4], 2)
+    ]
+
+
+def test_repair_plan_trims_long_lists():
+    content = carousel(14)
+    assert repair_plan("carousel", content, validate("carousel", content)) == [("trim", ("slides",), 12)]
+
+
+def test_repair_plan_skips_problems_inside_replaced_items():
+    content = {
+        "checklist_title": "T", "cta": "C",
+        "categories": [
+            {"category_name": "A", "items": [{"item": "i", "why_important": "w"}] * 4},
+            {"category_name": "", "items": [{"item": "i"}] * 9},
+            {"category_name": "C", "items": [{"item": "i", "why_important": "w"}] * 4},
+        ]
+    }
+    # The second category is replaced whole, so its own fields and list sizes are not repaired
+    assert repair_plan("checklist", content, validate("checklist", content)) == [
+        ("items", ("categories",), [1], 0)
+    ]
+
+
+def test_renumber_rewrites_positions_in_place():
+    content = carousel()
+    content["slides"].insert(0, {"title": "New", "body": "Body"})
+    content["slides"][5]["slide_number"] = 42
+    renumber("carousel", content)
+    assert [slide["slide_number"] for slide in content["slides"]] == list(range(1, 10))
+
+
+def test_renumber_leaves_undeclared_formats_alone():
+    content = {"slides": [{"slide_number": 7}]}
+    before = copy.deepcopy(content)
+    renumber("unknown", content)
+    assert content == before
+
+
+def test_example_includes_number_key():
+    assert example(SCHEMAS["minicourse"]["emails"]) == [
+        {"day": 1, "subject": "...", "content": "...", "action_item": "..."}
+    ]
@@ -0,0 +1,48 @@
+from agents.context_packer import pack_search_results, resolve_references
+
+
+def result(link, title, snippet):
+    return {"link": link, "title": title, "snippet": snippet, "source": "Google Search"}
+
+
+def test_duplicate_urls_are_dropped():
+    text, refs = pack_search_results([
+        result("https://www.example.com/ai-agents/", "AI agents in B2B", "Agents take over lead qualification."),
+        result("http://example.com/ai-agents?utm=x#top", "AI agents (copy)", "A different snippet about pricing pages."),
+    ], "ai agents")
+    assert len(refs) == 1
+    assert "(copy)" not in text
+
+
+def test_near_identical_snippets_are_dropped():
+    snippet = "Marketing teams adopt AI agents to qualify leads and write follow-up emails in minutes"
+    _, refs = pack_search_results([
+        result("https://a.com/1", "AI agents", snippet),
+        result("https://b.com/2", "AI agents", snippet + "."),
+        result("https://c.com/3", "Pricing", "Usage-based pricing is replacing seats across SaaS companies"),
+    ], "ai agents")
+    assert [source["url"] for source in refs.values()] == ["https://a.com/1", "https://c.com/3"]
+
+
+def test_results_are_ranked_by_topic_overlap():
+    text, refs = pack_search_results([
+        result("https://a.com", "Weather today", "Sunny with clouds in the afternoon"),
+        result("https://b.com", "AI agents for marketing", "How AI agents change marketing teams"),
+    ], "ai agents marketing")
+    assert refs["S1"]["url"] == "https://b.com"
+    assert text.splitlines()[0].startswith("[S1] AI agents for marketing")
+    assert refs["S1"]["source"] == "b.com"
+
+
+def test_token_budget_keeps_at_least_one_result():
+    results = [result(f"https://site{i}.com", f"AI agents {i}", f"Snippet number {i} " * 30) for i in range(5)]
+    _, refs = pack_search_results(results, "ai agents", token_budget=10)
+    assert len(refs) == 1
+
+
+def test_resolve_references_fills_urls():
+    refs = {"S1": {"url": "https://a.com/x", "source": "a.com"}}
+    data = {"stats": [{"stat": "40%", "ref": " S1 "}, {"stat": "12%", "ref": "S9"}]}
+    resolve_references(data, refs)
+    assert data["stats"][0]["url"] == "https://a.com/x" and data["stats"][0]["source"] == "a.com"
+    assert "url" not in data["stats"][1]
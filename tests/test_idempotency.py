@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from agents.idempotency import IdempotencyStore, derive_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(tmp_path / "idempotency.db")
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_first_claim_wins(store):
+    assert store.claim("k", "job1", owner_pid=os.getpid()) is None
+    assert store.claim("k", "job2") == {"key": "k", "job_id": "job1", "result": None}
+
+
+def test_completed_claim_replays_result(store):
+    store.claim("k", "job1")
+    store.complete("k", "job1", {"success": True, "title": "T"})
+    assert store.claim("k", "job2")["result"] == {"success": True, "title": "T"}
+    assert store.wait("k", "job1", timeout=1) == {"success": True, "title": "T"}
+
+
+def test_complete_ignores_other_jobs(store):
+    store.claim("k", "job1")
+    store.complete("k", "job2", {"success": True})
+    assert store.get("k")["result"] is None
+
+
+def test_released_claim_can_be_claimed_again(store):
+    store.claim("k", "job1")
+    store.release("k", "job1")
+    assert store.get("k") is None
+    assert store.wait("k", "job1", timeout=1) is None
+    assert store.claim("k", "job2") is None
+
+
+def test_claim_of_dead_process_is_dropped(store):
+    store.claim("k", "job1", owner_pid=dead_pid())
+    assert store.claim("k", "job2", owner_pid=os.getpid()) is None
+    assert store.get("k")["job_id"] == "job2"
+
+
+def test_completed_claim_of_dead_process_is_kept(store):
+    store.claim("k", "job1", owner_pid=dead_pid())
+    store.complete("k", "job1", {"success": True})
+    assert store.claim("k", "job2")["job_id"] == "job1"
+
+
+def test_queued_claim_without_owner_is_kept(store):
+    store.claim("k", "job1")
+    assert store.claim("k", "job2")["job_id"] == "job1"
+
+
+def test_claims_expire_after_window(tmp_path):
+    store = IdempotencyStore(tmp_path / "idempotency.db", window_seconds=0.05)
+    store.claim("k", "job1")
+    time.sleep(0.1)
+    assert store.get("k") is None
+    assert store.claim("k", "job2") is None
+
+
+def test_derive_key_normalizes_body():
+    a = derive_key({"topic": "AI  Agents", "format": "guide", "job_id": "1", "notes": ""})
+    b = derive_key({"topic": "ai agents", "format": "Guide", "job_id": "2"})
+    assert a == b
+    assert a != derive_key({"topic": "ai agents", "format": "carousel"})
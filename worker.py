@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Pipeline worker for multi-node mode.
+Pulls /generate jobs from the broker at BROKER_URL and runs them. Start as
+many as needed next to the web process:
+
+    BROKER_URL=sqlite://data/broker.db python worker.py
+
+The built-in SQLite broker, the job store and the archive are files under
+data/, so workers must run on the same host as the web process (not as a
+separate Railway/Heroku service) until a networked broker is registered.
+"""
+
+import os
+import sys
+import signal
+import socket
+import logging
+import threading
+
+from pipelines import broker, run_job
+from agents.cancellation import Cancelled, CancelToken
+from agents.metrics import metrics
+from config.settings import Settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("worker")
+
+
+class Heartbeat:
+    """
+    Keeps a reserved job invisible to other workers while it runs, and
+    cancels it when the job is cancelled through the broker.
+    """
+
+    def __init__(self, task_id: str, token: CancelToken):
+        self.task_id = task_id
+        self.token = token
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="heartbeat")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(Settings.WORKER_VISIBILITY_TIMEOUT / 3):
+            if not broker.extend(self.task_id, Settings.WORKER_VISIBILITY_TIMEOUT):
+                task = broker.get(self.task_id)
+                if task and task["state"] == "cancelled":
+                    self.token.cancel("cancelled_by_user")
+                return
+
+
+def process(task: dict):
+    """Run one reserved job and acknowledge it, or release it for a retry."""
+    job_id = task["id"]
+    payload = task["payload"]
+    logger.info(f"Job {job_id} reserved (attempt {task['attempts']}/{task['max_attempts']})")
+    token = CancelToken(Settings.JOB_DEADLINE_SECONDS)
+    try:
+        with Heartbeat(job_id, token):
+            result = run_job(job_id, payload["data"], token, frozenset(payload.get("profile") or ()))
+        if not result.get("success"):
+            # Only successful jobs are "done": duplicates of a failed one must run again, not replay it
+            raise RuntimeError(result.get("error") or "Job failed")
+    except Cancelled as e:
+        logger.warning(f"Job {job_id} cancelled: {e.reason}")
+        metrics.incr("jobs.cancelled")
+        broker.cancel(job_id, reason=e.reason)
+        return
+    except Exception as e:
+        delay = Settings.WORKER_RETRY_DELAY * 2 ** (task["attempts"] - 1)
+        logger.error(f"Job {job_id} failed: {e}, retrying in {delay:.0f}s")
+        metrics.incr("jobs.failed")
+        broker.nack(job_id, str(e), retry_delay=delay)
+        return
+    metrics.incr("jobs.completed")
+    broker.ack(job_id, result)
+
+
+def main():
+    if not broker:
+        sys.exit("BROKER_URL is not set; workers need a broker shared with the web nodes")
+
+    stopping = threading.Event()
+    # Finish the current job on SIGTERM (deploys, scale-in) instead of dropping it
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+    logger.info(f"Worker {socket.gethostname()}-{os.getpid()} polling {Settings.BROKER_URL}")
+    while not stopping.is_set():
+        task = broker.reserve("jobs", Settings.WORKER_VISIBILITY_TIMEOUT)
+        if task:
+            process(task)
+        else:
+            stopping.wait(Settings.WORKER_POLL_SECONDS)
+    logger.info("Worker stopped")
+
+
+if __name__ == '__main__':
+    main()